@@ -0,0 +1,211 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+# 챗봇 답변을 SQLite 파일에 저장하는 답변 캐시입니다.
+# 예시 질문 팝오버(render_example_popover)는 같은 고정 질문을 계속 보내므로 매번 RAG 검색과 Gemini 호출을 하지 않고
+# 저장된 답변을 바로 돌려줍니다.
+# - 정확히 같은 질문: 정규화한 질문(normalize_question) + 모드('rag' / 'gemini')를 키로 조회
+# - 거의 같은 질문: 질문 임베딩의 코사인 유사도가 SIMILAR_THRESHOLD 이상인 답변을 재사용
+# - TTL_S가 지난 답변은 쓰지 않고, 'rag' 답변은 Chroma 컬렉션 지문(collection_fingerprint)이 바뀌면 무효가 됩니다
+#   (문서를 다시 넣으면 예전 근거로 만든 답변을 보여주지 않도록).
+# - 파일 기반이라 여러 세션과 여러 프로세스(streamlit 워커)가 같은 캐시를 공유합니다.
+
+ANSWER_DB_PATH = os.path.join('cache', 'answers.sqlite3')
+TTL_S = 7 * 24 * 3600
+MAX_ENTRIES = 5000
+SIMILAR_THRESHOLD = 0.95     # 이보다 낮으면 표현만 비슷한 다른 질문일 가능성이 큼
+
+_PUNCT_RE = re.compile(r'[\s?!.,~·:;"\'()\[\]]+')
+
+
+def normalize_question(question) -> str:
+    """캐시 키로 사용할 질문 문자열 (문장부호/공백 차이, 영문 대소문자 무시)."""
+    if question is None:
+        return ''
+    return _PUNCT_RE.sub(' ', str(question)).strip().lower()
+
+
+def collection_fingerprint(vectordb):
+    """Chroma 컬렉션의 문서 id 목록으로 만든 지문. 문서가 추가/삭제/교체되면 달라집니다."""
+    ids = vectordb.get(include=[]).get('ids') or []
+    h = hashlib.sha1()
+    for doc_id in sorted(ids):
+        h.update(str(doc_id).encode('utf-8'))
+        h.update(b'\0')
+    return f'{len(ids)}:{h.hexdigest()[:16]}'
+
+
+class AnswerCache:
+    """(모드, 정규화된 질문) -> 답변 SQLite 캐시 + 임베딩 유사도 조회."""
+
+    def __init__(self, db_path=ANSWER_DB_PATH, ttl_s=TTL_S, max_entries=MAX_ENTRIES, similar_threshold=SIMILAR_THRESHOLD):
+        self.db_path = db_path
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.similar_threshold = similar_threshold
+        self._lock = threading.Lock()
+        self._vectors = {}     # (mode, fingerprint) -> (max rowid, [answer], 정규화된 행렬, 저장 시각)
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        parent = os.path.dirname(db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        with self._lock:
+            # WAL 모드: 다른 프로세스가 쓰는 동안에도 읽기가 막히지 않습니다.
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS answers ('
+                ' mode TEXT NOT NULL,'
+                ' q_key TEXT NOT NULL,'
+                ' fingerprint TEXT NOT NULL,'
+                ' answer TEXT NOT NULL,'
+                ' embedding BLOB,'
+                ' updated_at REAL NOT NULL,'
+                ' PRIMARY KEY (mode, q_key))'
+            )
+            self._conn.commit()
+
+    def get(self, question, mode='rag', fingerprint=''):
+        """정확히 같은(정규화 기준) 질문의 답변. 없거나 만료/무효면 None."""
+        key = normalize_question(question)
+        if not key:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT answer, fingerprint, updated_at FROM answers WHERE mode = ? AND q_key = ?', (mode, key)
+            ).fetchone()
+        if row is None or row[1] != fingerprint or time.time() - row[2] > self.ttl_s:
+            return None
+        return row[0]
+
+    def _load_vectors(self, mode, fingerprint):
+        with self._lock:
+            max_rowid = self._conn.execute('SELECT MAX(rowid) FROM answers').fetchone()[0]
+            cached = self._vectors.get((mode, fingerprint))
+            if cached is not None and cached[0] == max_rowid:
+                return cached[1], cached[2], cached[3]
+            rows = self._conn.execute(
+                'SELECT answer, embedding, updated_at FROM answers'
+                ' WHERE mode = ? AND fingerprint = ? AND embedding IS NOT NULL',
+                (mode, fingerprint),
+            ).fetchall()
+        answers = [r[0] for r in rows]
+        updated = np.array([r[2] for r in rows], dtype=float)
+        if rows:
+            matrix = np.vstack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+            matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        with self._lock:
+            self._vectors[(mode, fingerprint)] = (max_rowid, answers, matrix, updated)
+        return answers, matrix, updated
+
+    def get_similar(self, embedding, mode='rag', fingerprint=''):
+        """질문 임베딩과 코사인 유사도가 기준 이상인 가장 비슷한 답변. (답변, 유사도) 또는 None."""
+        answers, matrix, updated = self._load_vectors(mode, fingerprint)
+        if not answers:
+            return None
+        q = np.asarray(embedding, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        sims = matrix @ q
+        sims[time.time() - updated > self.ttl_s] = -1.0
+        best = int(np.argmax(sims))
+        if sims[best] < self.similar_threshold:
+            return None
+        return answers[best], round(float(sims[best]), 4)
+
+    def lookup(self, question, mode='rag', fingerprint='', embed_fn=None):
+        """정확히 같은 질문 -> (embed_fn이 있으면) 비슷한 질문 순서로 찾습니다.
+
+        반환: (답변 또는 None, 'exact' / 'similar' / None, 질문 임베딩 또는 None)
+        임베딩은 정확히 같은 질문이 없을 때만 계산하며, 미스일 때 put에 그대로 넘기면 됩니다.
+        """
+        answer = self.get(question, mode, fingerprint)
+        if answer is not None:
+            self.exact_hits += 1
+            return answer, 'exact', None
+        embedding = None
+        if embed_fn is not None:
+            try:
+                embedding = embed_fn(question)
+                found = self.get_similar(embedding, mode, fingerprint)
+            except Exception as e:
+                print(f'answer_cache: 유사 질문 조회 실패: {e}')
+                found = None
+            if found is not None:
+                self.similar_hits += 1
+                return found[0], 'similar', embedding
+        self.misses += 1
+        return None, None, embedding
+
+    def put(self, question, answer, mode='rag', fingerprint='', embedding=None):
+        key = normalize_question(question)
+        if not key or not answer:
+            return
+        blob = None if embedding is None else np.asarray(embedding, dtype=np.float32).tobytes()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO answers (mode, q_key, fingerprint, answer, embedding, updated_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (mode, key, fingerprint, answer, blob, time.time()),
+            )
+            self._conn.commit()
+
+    def purge(self, fingerprint=None):
+        """만료된 답변과 (fingerprint가 주어지면) 다른 컬렉션 지문의 'rag' 답변을 지우고,
+        MAX_ENTRIES를 넘는 오래된 답변을 정리합니다. 삭제된 행 수를 반환합니다."""
+        removed = 0
+        with self._lock:
+            cur = self._conn.execute('DELETE FROM answers WHERE updated_at < ?', (time.time() - self.ttl_s,))
+            removed += cur.rowcount
+            if fingerprint is not None:
+                cur = self._conn.execute(
+                    "DELETE FROM answers WHERE mode = 'rag' AND fingerprint != ?", (fingerprint,)
+                )
+                removed += cur.rowcount
+            cur = self._conn.execute(
+                'DELETE FROM answers WHERE rowid NOT IN '
+                '(SELECT rowid FROM answers ORDER BY updated_at DESC LIMIT ?)', (self.max_entries,)
+            )
+            removed += cur.rowcount
+            self._conn.commit()
+            self._vectors.clear()
+        return removed
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM answers').fetchone()[0]
+
+    def stats(self):
+        total = self.exact_hits + self.similar_hits + self.misses
+        return {
+            'entries': len(self),
+            'exact_hits': self.exact_hits,
+            'similar_hits': self.similar_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.exact_hits + self.similar_hits) / total, 3) if total else 0.0,
+        }
+
+
+_ANSWER_CACHE = None
+_ANSWER_CACHE_LOCK = threading.Lock()
+
+
+def get_answer_cache():
+    """프로세스 전역 AnswerCache를 반환합니다. 처음 만들 때 만료된 답변을 정리합니다."""
+    global _ANSWER_CACHE
+    with _ANSWER_CACHE_LOCK:
+        if _ANSWER_CACHE is None:
+            cache = AnswerCache()
+            cache.purge()
+            _ANSWER_CACHE = cache
+        return _ANSWER_CACHE
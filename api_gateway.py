@@ -0,0 +1,405 @@
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import requests
+
+
+# 외부 API(카카오 지오코딩, 공공데이터포털 복지/버스도착 API) 호출을 한 곳으로 모읍니다.
+# - API 키별 토큰 버킷으로 초당 호출 수와 일일 호출 한도를 관리합니다.
+# - 5xx/네트워크 오류는 지터(jitter)가 섞인 지수 백오프로 재시도합니다.
+#   429는 일일 한도가 있는 키에서 재시도해도 계속 실패하므로 재시도하지 않고 바로 서킷을 엽니다.
+# - 연속 실패가 쌓이면 서킷을 열어 잠시 동안 호출 자체를 막습니다(쿼터 낭비 방지).
+#   half_open 상태에서는 시험 호출 하나만 보내고 나머지는 결과가 나올 때까지 막습니다.
+# - 엔드포인트별 호출 수, 오류 수, 지연 시간을 집계합니다(get_stats).
+# 토큰 버킷/서킷/카운터는 프로세스 전역이라 Streamlit의 모든 세션이 공유하고,
+# 일일 호출 수는 SQLite 파일(cache/api_quota.sqlite3)에 저장해 여러 프로세스와 재시작 사이에도 공유합니다.
+
+# 엔드포인트별 기본 설정
+# - rate: 초당 허용 호출 수, capacity: 순간 최대 호출 수(버킷 크기)
+# - daily_quota: 하루 최대 호출 수(공공데이터포털 개발계정은 보통 1,000건/일)
+ENDPOINT_LIMITS = {
+    'kakao_geocode': {'rate': 10.0, 'capacity': 10, 'daily_quota': 100000},
+    'welfare_news': {'rate': 5.0, 'capacity': 5, 'daily_quota': 1000},
+    'bus_arrival': {'rate': 5.0, 'capacity': 5, 'daily_quota': 1000},
+}
+DEFAULT_LIMIT = {'rate': 5.0, 'capacity': 5, 'daily_quota': 1000}
+
+QUOTA_DB_PATH = os.path.join('cache', 'api_quota.sqlite3')
+RETRYABLE_STATUS = (500, 502, 503, 504)
+MAX_RETRIES = 2
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 4.0
+TOKEN_WAIT_S = 1.0            # 토큰이 없을 때 기다리는 최대 시간
+FAILURE_THRESHOLD = 5         # 서킷을 여는 연속 실패 횟수
+RESET_TIMEOUT_S = 30.0        # 서킷이 열린 뒤 다시 시험 호출을 허용하기까지의 시간
+
+
+class GatewayError(Exception):
+    """게이트웨이가 호출을 막았거나 재시도 후에도 실패했을 때 발생합니다.
+
+    reason: 'rate_limited' | 'quota_exceeded' | 'circuit_open' | 'upstream_error'
+    """
+
+    def __init__(self, reason, endpoint, message=''):
+        super().__init__(message or f'{endpoint}: {reason}')
+        self.reason = reason
+        self.endpoint = endpoint
+
+
+class QuotaStore:
+    """(버킷 키, 날짜) -> 사용 횟수 SQLite 카운터. 한도 확인과 증가를 한 UPDATE 문으로 처리해 프로세스 간에도 원자적입니다."""
+
+    def __init__(self, db_path=QUOTA_DB_PATH):
+        parent = os.path.dirname(db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS quota ('
+                ' bucket TEXT NOT NULL,'
+                ' day TEXT NOT NULL,'
+                ' used INTEGER NOT NULL,'
+                ' PRIMARY KEY (bucket, day))'
+            )
+            self._conn.commit()
+
+    def try_consume(self, bucket, day, limit):
+        """사용 횟수가 limit 미만이면 1 늘리고 True, 이미 한도면 False."""
+        with self._lock:
+            self._conn.execute('INSERT OR IGNORE INTO quota (bucket, day, used) VALUES (?, ?, 0)', (bucket, day))
+            cur = self._conn.execute(
+                'UPDATE quota SET used = used + 1 WHERE bucket = ? AND day = ? AND used < ?', (bucket, day, limit)
+            )
+            self._conn.commit()
+            return cur.rowcount == 1
+
+    def used(self, bucket, day):
+        with self._lock:
+            row = self._conn.execute('SELECT used FROM quota WHERE bucket = ? AND day = ?', (bucket, day)).fetchone()
+        return row[0] if row else 0
+
+
+class TokenBucket:
+    """초당 rate개씩 채워지는 토큰 버킷과 일일 호출 한도.
+
+    quota_store가 있으면 일일 호출 수를 파일에 저장해 다른 프로세스와 공유하고, 없으면 이 객체 안에서만 셉니다.
+    """
+
+    def __init__(self, rate, capacity, daily_quota=None, quota_store=None, quota_key=''):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.daily_quota = daily_quota
+        self.quota_store = quota_store
+        self.quota_key = quota_key
+        self.day = time.strftime('%Y%m%d')
+        self.used_today = 0
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        today = time.strftime('%Y%m%d')
+        if today != self.day:
+            self.day = today
+            self.used_today = 0
+
+    def _used(self):
+        if self.quota_store is not None:
+            return self.quota_store.used(self.quota_key, self.day)
+        return self.used_today
+
+    def _consume_quota(self):
+        """일일 한도 안이면 1건 사용하고 True (self._lock 안에서 호출)."""
+        if self.daily_quota is None:
+            return True
+        if self.quota_store is not None:
+            return self.quota_store.try_consume(self.quota_key, self.day, self.daily_quota)
+        if self.used_today >= self.daily_quota:
+            return False
+        self.used_today += 1
+        return True
+
+    def quota_left(self):
+        with self._lock:
+            self._refill()
+            if self.daily_quota is None:
+                return None
+            return max(0, self.daily_quota - self._used())
+
+    def acquire(self, max_wait=TOKEN_WAIT_S):
+        """토큰과 일일 한도 1건을 함께 얻습니다.
+
+        성공하면 None, 실패하면 이유('quota_exceeded' | 'rate_limited')를 반환합니다.
+        한도 확인과 차감을 같은 잠금 안에서 하므로 동시에 호출해도 한도를 넘지 않습니다.
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    if not self._consume_quota():
+                        return 'quota_exceeded'
+                    self.tokens -= 1
+                    return None
+                wait = (1 - self.tokens) / self.rate if self.rate > 0 else max_wait
+            if time.monotonic() + wait > deadline:
+                return 'rate_limited'
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """연속 실패가 threshold에 도달하면 reset_timeout 동안 호출을 차단합니다."""
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT_S):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return 'half_open'
+            return 'open'
+
+    def allow(self):
+        # half_open 상태에서는 시험 호출 하나만 허용하고, 결과(record_success / record_failure)가
+        # 나올 때까지 다른 호출은 막습니다.
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+            return True
+
+    def release_probe(self):
+        """시험 호출을 보내지 못했을 때(한도/속도 제한) 다른 호출이 시험할 수 있게 풀어줍니다."""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            # 시험 호출이 실패하면 바로 다시 엽니다.
+            if self.failures >= self.threshold or self.probe_in_flight:
+                self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def trip(self):
+        """실패 횟수와 상관없이 바로 서킷을 엽니다 (429 등 지금 다시 호출해도 소용없는 응답)."""
+        with self._lock:
+            self.failures = max(self.failures, self.threshold)
+            self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+
+class EndpointStats:
+    """엔드포인트별 호출/오류/지연 시간 카운터."""
+
+    def __init__(self):
+        self.calls = 0
+        self.successes = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_status = None
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms, status=None, error=False):
+        with self._lock:
+            self.calls += 1
+            self.total_ms += latency_ms
+            self.max_ms = max(self.max_ms, latency_ms)
+            self.last_status = status
+            if error:
+                self.errors += 1
+            else:
+                self.successes += 1
+
+    def count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'successes': self.successes,
+                'errors': self.errors,
+                'retries': self.retries,
+                'rejected': self.rejected,
+                'avg_ms': round(self.total_ms / self.calls, 1) if self.calls else 0.0,
+                'max_ms': round(self.max_ms, 1),
+                'last_status': self.last_status,
+            }
+
+
+# 모듈 레벨 상태: 프로세스 안의 모든 세션이 공유
+_BUCKETS = {}
+_BREAKERS = {}
+_STATS = {}
+_STATE_LOCK = threading.Lock()
+_QUOTA_STORE = None
+
+
+def _get_quota_store():
+    """공유 일일 한도 저장소. 파일을 열 수 없으면 None (프로세스 안에서만 셈)."""
+    global _QUOTA_STORE
+    if _QUOTA_STORE is None:
+        try:
+            _QUOTA_STORE = QuotaStore()
+        except Exception as e:
+            print(f'api_gateway: 일일 한도 파일을 열 수 없어 프로세스 안에서만 셉니다: {e}')
+            _QUOTA_STORE = False
+    return _QUOTA_STORE or None
+
+
+def _get_bucket(endpoint, api_key):
+    key = (endpoint, api_key or '')
+    with _STATE_LOCK:
+        if key not in _BUCKETS:
+            conf = ENDPOINT_LIMITS.get(endpoint, DEFAULT_LIMIT)
+            # API 키는 해시만 저장합니다.
+            quota_key = endpoint + ':' + hashlib.sha1((api_key or '').encode('utf-8')).hexdigest()[:16]
+            _BUCKETS[key] = TokenBucket(conf['rate'], conf['capacity'], conf.get('daily_quota'),
+                                        quota_store=_get_quota_store(), quota_key=quota_key)
+        return _BUCKETS[key]
+
+
+def _get_breaker(endpoint):
+    with _STATE_LOCK:
+        if endpoint not in _BREAKERS:
+            _BREAKERS[endpoint] = CircuitBreaker()
+        return _BREAKERS[endpoint]
+
+
+def _get_stats(endpoint):
+    with _STATE_LOCK:
+        if endpoint not in _STATS:
+            _STATS[endpoint] = EndpointStats()
+        return _STATS[endpoint]
+
+
+def _backoff_delay(attempt, response=None):
+    """Retry-After 헤더가 있으면 따르고, 없으면 full-jitter 지수 백오프 값을 반환합니다."""
+    if response is not None:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and str(retry_after).isdigit():
+            return min(BACKOFF_MAX_S, float(retry_after))
+    return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** attempt)))
+
+
+def request(endpoint, url, params=None, headers=None, api_key=None, method='GET',
+            timeout=5, max_retries=MAX_RETRIES):
+    """게이트웨이를 거쳐 외부 API를 호출하고 requests.Response를 반환합니다.
+
+    429나 재시도 후에도 5xx이면 마지막 응답을 그대로 반환하므로 호출 측의 상태 코드 처리는
+    그대로 동작합니다(429는 재시도하지 않고 서킷을 엽니다). 호출 자체가 막히거나(한도/서킷)
+    네트워크 오류가 계속되면 GatewayError를 발생시킵니다.
+    """
+    breaker = _get_breaker(endpoint)
+    stats = _get_stats(endpoint)
+    bucket = _get_bucket(endpoint, api_key)
+
+    if not breaker.allow():
+        stats.count('rejected')
+        raise GatewayError('circuit_open', endpoint)
+
+    response = None
+    last_exc = None
+    for attempt in range(max_retries + 1):
+        rejected = bucket.acquire()
+        if rejected:
+            stats.count('rejected')
+            if attempt == 0:
+                breaker.release_probe()
+            else:
+                breaker.record_failure()
+            raise GatewayError(rejected, endpoint)
+
+        start = time.perf_counter()
+        try:
+            response = requests.request(method, url, params=params, headers=headers, timeout=timeout)
+            last_exc = None
+        except requests.RequestException as e:
+            response = None
+            last_exc = e
+        latency_ms = (time.perf_counter() - start) * 1000
+        status = response.status_code if response is not None else None
+        failed = response is None or status == 429 or status in RETRYABLE_STATUS
+        stats.record(latency_ms, status, error=failed)
+
+        if status == 429:
+            # 일일/분당 한도 초과: 재시도하면 한도만 더 쓰므로 서킷을 열고 바로 돌려줍니다.
+            breaker.trip()
+            return response
+        if not failed:
+            breaker.record_success()
+            return response
+        if attempt < max_retries:
+            stats.count('retries')
+            time.sleep(_backoff_delay(attempt, response))
+
+    breaker.record_failure()
+    if response is not None:
+        return response
+    raise GatewayError('upstream_error', endpoint, str(last_exc)) from last_exc
+
+
+def quota_left(endpoint, api_key=None):
+    """endpoint / api_key 버킷의 오늘 남은 호출 수 (한도가 없으면 None)."""
+    return _get_bucket(endpoint, api_key).quota_left()
+
+
+def describe_error(err):
+    """GatewayError를 사용자에게 보여줄 한국어 문구로 변환합니다."""
+    reason = getattr(err, 'reason', '')
+    if reason in ('rate_limited', 'circuit_open'):
+        return '요청이 많아 잠시 쉬고 있습니다. 잠시 후 다시 시도해 주세요.'
+    if reason == 'quota_exceeded':
+        return '오늘 사용할 수 있는 조회 횟수를 모두 사용했습니다. 내일 다시 시도해 주세요.'
+    return '외부 서비스에 연결할 수 없습니다. 잠시 후 다시 시도해 주세요.'
+
+
+def get_stats():
+    """엔드포인트별 카운터와 서킷 상태를 딕셔너리로 반환합니다."""
+    with _STATE_LOCK:
+        endpoints = set(_STATS) | set(_BREAKERS)
+    out = {}
+    for ep in sorted(endpoints):
+        snap = _get_stats(ep).snapshot()
+        snap['circuit'] = _get_breaker(ep).state
+        out[ep] = snap
+    return out
+
+
+def reset():
+    """모든 버킷/서킷/카운터를 초기화합니다(벤치마크·수동 점검용)."""
+    with _STATE_LOCK:
+        _BUCKETS.clear()
+        _BREAKERS.clear()
+        _STATS.clear()
@@ -1,8 +1,8 @@
-import os
 import pandas as pd
 import streamlit as st
 from app_location import run_location
 from geopy.distance import geodesic
+from data_provider import get_data
 from define import _find_lat_lon_cols, _ensure_coord_aliases, _standardize_restaurant_columns, _standardize_leisure_columns
 
 
@@ -14,15 +14,9 @@ from define import _find_lat_lon_cols, _ensure_coord_aliases, _standardize_resta
 # 이 코드는 인천광역시의 맛집과 여가시설 데이터를 기반으로 
 # 사용자의 현재 위치에서 가까운 장소를 추천해주는 화면입니다. 
 
-# 인천광역시의 식당 및 시설 정보를 CSV 파일에서 불러옵니다.
+# 인천광역시의 식당 및 시설 정보는 data_provider가 CSV 파일에서 처음 필요할 때 불러옵니다.
 # 각각 다른 인코딩(euc-kr, CP949)을 사용해 한글 데이터를 안정적으로 읽습니다.
 
-# 맛집/시설 데이터
-data_path = os.path.join('data', 'restaurant category.csv')
-맛집_df = pd.read_csv(data_path, dtype=str, encoding='euc-kr')
-data_path = os.path.join('data', 'leisure location.csv')
-시설_df = pd.read_csv(data_path, dtype=str, encoding='CP949')
-
 # 좌표 컬럼 자동 탐색
 # 데이터프레임에서 위도/경도 컬럼명을 자동으로 찾아냅니다.
 # 다양한 이름(예: 'lat', '위도', 'latitude', 'lon', '경도', 'longitude')을 고려하여 유연하게 처리합니다.
@@ -46,6 +40,7 @@ def around_restaurant(facilities_location):
 	except Exception:
 		return pd.DataFrame()
 
+	맛집_df = get_data('restaurants')
 	if 맛집_df is None or 맛집_df.empty:
 		return pd.DataFrame()
 
@@ -100,6 +95,7 @@ def around_leisure(facilities_location):
 	except Exception:
 		return pd.DataFrame()
 
+	시설_df = get_data('leisure')
 	if 시설_df is None or 시설_df.empty:
 		return pd.DataFrame()
 
@@ -1,11 +1,11 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 from sklearn.neighbors import NearestNeighbors
 import streamlit as st
 import numpy as np
-import requests
 import xmltodict
 import os
+import api_gateway
+from data_provider import get_data
 
 
 
@@ -15,13 +15,13 @@ import os
 # 사용자 근처 가장 가까운 정류장 5개와 시설에서 가장 가까운 정류장 5개를 딕셔너리 형태로 반환합니다.
 # 반환 정보 = 'user_nearby' and 'facility_nearby'
 
-data_path = os.path.join('data', 'bus stop.csv')
-bus_stops_df = pd.read_csv(data_path)
+# 정류장 데이터는 data_provider가 처음 필요할 때 읽습니다('bus_stops').
 
 
 def bus_stop_recommendation(user_location, facilities_location, n_neighbors=10):
 
     user_stops, facility_stops = [], []
+    bus_stops_df = get_data('bus_stops')
 
     # --- 컬럼명 탐색 ---
     cols = bus_stops_df.columns.tolist()
@@ -120,24 +120,31 @@ def bus_stop_recommendation(user_location, facilities_location, n_neighbors=10):
     return {'user_nearby': user_df, 'facility_nearby': fac_df}
 
 
-API_KEY = st.secrets.get("INCHEON_BUS_API_KEY")
+def _get_api_key():
+    """버스 도착 정보 API 키. secrets.toml이 없으면 INCHEON_BUS_API_KEY 환경변수를 사용합니다."""
+    try:
+        key = st.secrets.get("INCHEON_BUS_API_KEY")
+    except Exception:
+        key = None
+    return key or os.environ.get("INCHEON_BUS_API_KEY")
 
-# 노선ID-노선명 매핑 테이블 로딩 (한 번만 로드)
-data_path = os.path.join('data', 'incheon bus route.csv')
-route_df = pd.read_csv(data_path, dtype=str, encoding='euc-kr')
-route_dict = dict(zip(route_df['노선아이디'].str.strip(), route_df['노선명'].str.strip()))
 
 def get_bus_arrival_info(stop_info):
     bstop_id = stop_info.get('정류장ID') if isinstance(stop_info, dict) else stop_info['정류장ID']
+    api_key = _get_api_key()
 
     url = "http://apis.data.go.kr/6280000/busArrivalService/getAllRouteBusArrivalList"
     params = {
-        'serviceKey': API_KEY,
+        'serviceKey': api_key,
         'pageNo': '1',
         'numOfRows': '10',
         'bstopId': bstop_id
     }
-    resp = requests.get(url, params=params)
+    try:
+        resp = api_gateway.request('bus_arrival', url, params=params, api_key=api_key)
+    except api_gateway.GatewayError as e:
+        st.warning(api_gateway.describe_error(e))
+        return None
 
     if resp.status_code != 200:
         st.error(f"API 요청 실패: 상태 코드 {resp.status_code}")
@@ -161,7 +168,8 @@ def get_bus_arrival_info(stop_info):
         if isinstance(items, dict):
             items = [items]
 
-        # 노선ID -> 노선명 변환 적용
+        # 노선ID -> 노선명 변환 적용 (매핑 테이블은 처음 필요할 때 한 번만 로드)
+        route_dict = get_data('bus_route_names')
         for item in items:
             route_id = item.get('ROUTEID', '').strip()
             item['ROUTEID'] = route_dict.get(route_id, route_id)  # 매핑 없으면 기존 ID 유지
@@ -6,22 +6,21 @@ from google.generativeai import types
 
 from define import (
     load_allowed_corpus,
-    build_tfidf_index,
+    load_tfidf_index,
     retrieve_tfidf_contexts,
     build_system_prompt,
 )
 
 
 DATA_DIR = Path(__file__).parent.joinpath('data')
+INDEX_DIR = Path(__file__).parent.joinpath('pdf_index_storage_openai', 'tfidf_chunks')
 
 
-@st.cache_data(show_spinner=False)
+@st.cache_resource(show_spinner=False)
 def _load_and_index():
-    docs = load_allowed_corpus(str(DATA_DIR))
-    if not docs:
-        return None
-    idx = build_tfidf_index(docs)
-    return idx
+    # 문단 단위 색인을 디스크에서 mmap으로 엽니다 (자료가 바뀌었을 때만 다시 생성).
+    # cache_data는 반환값을 매번 복사하므로 메모리 맵 색인은 cache_resource로 공유합니다.
+    return load_tfidf_index(str(DATA_DIR), str(INDEX_DIR))
 
 
 def _parse_genai_response(resp):
@@ -71,7 +70,7 @@ def run_chatbot():
             st.warning('질문을 입력해 주세요.')
             return
 
-        # 검색(상위 문서 추출)
+        # 검색(상위 문단 추출)
         contexts = []
         if idx is not None:
             try:
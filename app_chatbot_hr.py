@@ -8,11 +8,8 @@ import re
 import os
 from pypdf import PdfReader
 
-# 데이터 파일 불러오기
-data_path = os.path.join('data', 'incheon health institutions.csv')
-health_institutions = pd.read_csv(data_path, dtype=str, encoding='cp949', sep='\t')
-data_path = os.path.join('data', 'health check data.csv')
-health_check_data = pd.read_csv(data_path, dtype=str, encoding="cp949")
+# 데이터 파일은 data_provider가 처음 필요할 때 불러옵니다 (검진기관: 'health_institutions')
+from data_provider import get_data
 
 # --- RAG(CHROMA) 통합: app_testchatbot의 캐시된 벡터스토어/체인을 사용 ---
 # app_testchatbot.py에 정의된 load_vectorstore, make_rag_chain를 재사용합니다.
@@ -25,6 +22,8 @@ from chatbot_hr_define import (
     ask_with_fallback,
     gemini_answer,
     post_user_and_respond,
+    respond_pending,
+    write_streamed_answer,
 )
 
 # --- 메인 함수 ---
@@ -72,15 +71,19 @@ def run_chatbot_hhr():
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
 
+    # 예시 질문 버튼(post_user_and_respond)으로 남겨진 질문이 있으면 답변을 토큰 단위로 바로 그립니다.
+    respond_pending(chat_container)
+
     
     # --- 3. 예시 질문 팝오버 렌더링 (별도 모듈로 분리) ---
     # 긴 UI 블록을 `chatbot_hr_define.render_example_popover`로 분리하여
     # app 파일을 간결하게 유지합니다. 내부 동작(입력값, 세션키 등)은
     # 원본과 동일하게 동작하도록 콜백과 데이터프레임을 전달합니다.
+    health_institutions = get_data('health_institutions')
     render_example_popover(post_user_and_respond, health_institutions, calculate_bmi, get_bmi_category, get_health_tip)
     
     # --- 4. [수정] 하단 고정 채팅 입력창 ---
-    # (이 로직은 이미 실시간 응답을 지원하므로 수정이 필요 없습니다)
+    # (답변은 write_streamed_answer가 스트리밍으로 표시합니다)
     
     if prompt := st.chat_input("다른 궁금하신 점을 말씀해 주세요 !"):
         
@@ -92,25 +95,9 @@ def run_chatbot_hhr():
             with st.chat_message("user"):
                 st.markdown(prompt)
 
-        # 3. RAG + LLM 답변 생성 (기존 로직 재활용)
-        try:
-            with st.spinner("잠시만 기다려 주세요..."):
-                answer = ask_with_fallback(prompt, prompt) 
-            
-            # 4. 챗봇 답변을 채팅 기록에 추가
-            st.session_state.messages.append({"role": "assistant", "content": answer})
-            
-            # 5. 채팅 기록 컨테이너에 챗봇 답변을 *즉시* 표시
-            with chat_container:
-                with st.chat_message("assistant"):
-                    st.markdown(answer)
-            
-        except Exception as e:
-            error_message = f"챗봇 응답 생성 중 오류가 발생했어요: {str(e)}."
-            st.session_state.messages.append({"role": "assistant", "content": error_message})
-            with chat_container:
-                with st.chat_message("assistant"):
-                    st.markdown(error_message)
+        # 3. RAG + LLM 답변을 토큰 단위로 채팅 기록 컨테이너에 표시하고 채팅 기록에 추가
+        #    (검색 후 첫 토큰부터 바로 보이므로 스피너 없이 스트리밍합니다)
+        write_streamed_answer(chat_container, prompt)
 
 
 if __name__ == "__main__":
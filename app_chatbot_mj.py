@@ -14,11 +14,25 @@ def _get_client():
     genai.configure(api_key=api_key)
     return genai.GenerativeModel(LLM_MODEL)
 
-def _generate_reply(client, contents):
-    response = client.generate_content(
-        contents=contents
-    )
-    return getattr(response, "text", str(response))
+def _stream_reply(client, contents):
+    """응답 조각을 도착하는 대로 내보냅니다 (st.write_stream용)."""
+    for chunk in client.generate_content(contents=contents, stream=True):
+        text = getattr(chunk, "text", "")
+        if text:
+            yield text
+
+def _write_reply(client, prompt, error_prefix):
+    """assistant 말풍선에 답변을 st.write_stream으로 그리고 완성된 문자열을 반환합니다."""
+    try:
+        with st.chat_message("assistant"):
+            reply = st.write_stream(_stream_reply(client, prompt))
+        if not isinstance(reply, str):
+            reply = "".join(str(part) for part in reply)
+        return reply
+    except Exception as e:
+        reply_text = f'{error_prefix}{e}'
+        st.chat_message("assistant").write(reply_text)
+        return reply_text
 
 def looks_like_food_request(text: str) -> bool:
     t = text.lower()
@@ -105,11 +119,8 @@ def run_chatbot_app():
                     )
                     prompt = system_instruction + "\n식당 목록:\n" + context_text + "\n\n질문: " + user_input
 
-                    with st.spinner('추천 기반으로 응답 생성 중...'):
-                        try:
-                            reply_text = _generate_reply(client, prompt)
-                        except Exception as e:
-                            reply_text = f'응답 생성 중 오류가 발생했습니다: {e}'
+                    st.chat_message("user").write(user_input)
+                    reply_text = _write_reply(client, prompt, '응답 생성 중 오류가 발생했습니다: ')
 
                     st.session_state[MESSAGE_KEY].append({"role": "assistant", "content": reply_text})
 
@@ -128,11 +139,8 @@ def run_chatbot_app():
             conversation_text = "\n".join([f"{m['role']}: {m['content']}" for m in st.session_state.get(MESSAGE_KEY, [])])
             prompt = system_instruction + "\n\n" + conversation_text
 
-            with st.spinner("검색 응답 생성 중..."):
-                try:
-                    reply_text = _generate_reply(client, prompt)
-                except Exception as e:
-                    reply_text = f"오류가 발생했습니다: {e}"
+            st.chat_message("user").write(user_input)
+            reply_text = _write_reply(client, prompt, "오류가 발생했습니다: ")
 
             # append assistant reply to this bot's messages
             if MESSAGE_KEY not in st.session_state:
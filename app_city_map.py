@@ -0,0 +1,52 @@
+import streamlit as st
+
+from map_component import MAP_COMPONENT_AVAILABLE, client_view, render_incremental_map, marker_layer, tile_layer
+from map_layers import poi_tile_layer, tile_layer_available
+from poi_cluster import get_poi_index, poi_types, bounds_around
+
+# 인천 전체 시설 지도 파트입니다.
+# 선택한 유형의 노인복지시설(그리고 원하면 정류장/여가시설) 전체를 도시 단위로 보여줍니다.
+# 점이 수천 개이므로 poi_cluster에서 줌 레벨별로 묶고, 지도에 보이는 영역 안의 것만 보냅니다.
+# 지도를 움직이면 컴포넌트가 새 화면 영역을 알려주고, 바뀐 레이어만 다시 전송됩니다.
+# 정류장/여가시설은 미리 그린 타일(tools/build_poi_tiles.py)이 있으면 타일 레이어로 표시해
+# 지도를 움직여도 서버에서 다시 계산하거나 보낼 것이 없습니다.
+
+INCHEON_CENTER = (37.4563, 126.7052)
+CITY_ZOOM = 11
+
+# 레이어 이름 -> (poi_cluster 레이어, 마커 카테고리)
+EXTRA_LAYERS = {
+    '정류장': ('bus_stop', 'bus_user'),
+    '여가시설': ('leisure', 'leisure'),
+}
+
+
+def run_city_map():
+    st.subheader('인천 전체 시설 지도🗺️')
+
+    if not MAP_COMPONENT_AVAILABLE:
+        st.error('지도 컴포넌트를 불러올 수 없습니다.')
+        return
+
+    type_list = ['전체'] + poi_types('facility')
+    selected_type = st.selectbox('시설 유형을 선택해주세요.', type_list)
+    extras = st.multiselect('함께 표시할 정보', list(EXTRA_LAYERS.keys()))
+
+    # 컴포넌트가 마지막으로 알려준 화면 영역 (처음에는 중심/줌으로 추정)
+    viewport = client_view('city_map')
+    if viewport:
+        bounds, zoom = viewport['bounds'], viewport['zoom']
+    else:
+        bounds, zoom = bounds_around(INCHEON_CENTER, CITY_ZOOM), CITY_ZOOM
+
+    facility_index = get_poi_index('facility', selected_type)
+    layers = {'facility': marker_layer(facility_index.query(bounds, zoom), 'facility')}
+    for label in extras:
+        layer, category = EXTRA_LAYERS[label]
+        if tile_layer_available(layer):
+            layers[layer] = tile_layer(*poi_tile_layer(layer))
+            continue
+        layers[layer] = marker_layer(get_poi_index(layer).query(bounds, zoom), category, popup_width=200)
+
+    st.caption(f'{selected_type} 시설 {len(facility_index)}곳 - 숫자가 표시된 원을 누르면 확대됩니다.')
+    render_incremental_map(INCHEON_CENTER, layers, key='city_map', zoom=CITY_ZOOM, height=680, report_view=True)
@@ -1,7 +1,9 @@
 import os
 import streamlit as st
-import pandas as pd
-import requests
+import api_gateway
+from geocode_cache import get_geocode_cache
+from local_geocoder import get_local_geocoder
+from data_provider import get_data
 
 
 
@@ -12,8 +14,52 @@ import requests
 # 입력한 값을 리턴값으로 넣어서 메인에서 받습니다.
 # 지도 없이 , 사용자 도로명 주소 입력 => 위도, 경도 , 도로명 주소 받아서 리스트로
 # 시설유형 선택 => 리스트로 
-data_path = os.path.join('data', 'incheon senior welfare facility final.csv')
-df= pd.read_csv(data_path, dtype=str, encoding='euc-kr')
+# 시설유형 목록은 data_provider의 'facilities_final' 데이터에서 가져옵니다(처음 필요할 때 로드).
+
+
+def _get_kakao_api_key():
+    """secrets.toml에 저장된 카카오 키. secrets.toml이 없으면 KAKAO_API_KEY 환경변수를 사용합니다."""
+    try:
+        key = st.secrets.get("KAKAO_API_KEY")
+    except Exception:
+        key = None
+    return key or os.environ.get("KAKAO_API_KEY")
+
+
+# kakao api도 상세 주소, 건물명 만으로는 검색 x
+# 1) 번들 CSV 주소로 만든 로컬 지오코더 -> 2) geocode_cache(SQLite) -> 3) 카카오 API 순으로 찾습니다.
+# 카카오 조회 결과는 캐시에 저장되어 모든 세션이 함께 사용합니다.
+def get_lat_lon_kakao(address):
+    local_hit = get_local_geocoder().lookup(address)
+    if local_hit is not None:
+        return local_hit[0], local_hit[1]
+
+    cache = get_geocode_cache()
+    cached = cache.get(address)
+    if cached is not None:
+        return cached
+
+    url = "https://dapi.kakao.com/v2/local/search/address.json"
+    kakao_api_key = _get_kakao_api_key()
+    headers = {"Authorization": f"KakaoAK {kakao_api_key}"}
+    params = {"query": address}
+    try:
+        response = api_gateway.request('kakao_geocode', url, params=params, headers=headers, api_key=kakao_api_key)
+    except api_gateway.GatewayError as e:
+        st.warning(api_gateway.describe_error(e))
+        return None, None
+
+    if response.status_code == 200:
+        data = response.json()
+        if data.get("documents"):
+            top_result = data["documents"][0]
+            lat = float(top_result["y"])
+            lon = float(top_result["x"])
+            cache.put(address, lat, lon)
+            return lat, lon
+        # 검색 결과가 없는 주소도 기록해 같은 입력을 반복 조회하지 않습니다.
+        cache.put_miss(address)
+    return None, None
 
 
 def run_location():
@@ -21,25 +67,9 @@ def run_location():
 
     address = st.text_input("도로명 주소를 입력하세요 : (예 : 인천 서구 서곶로 284)")
 
-    # kakao api도 상세 주소, 건물명 만으로는 검색 x 
-    def get_lat_lon_kakao(address):
-        url = "https://dapi.kakao.com/v2/local/search/address.json"
-        kakao_api_key = st.secrets.get("KAKAO_API_KEY")  # secrets.toml에 저장된 키 읽기
-        headers = {"Authorization": f"KakaoAK {kakao_api_key}"}
-        params = {"query": address}
-        response = requests.get(url, headers=headers, params=params)
-
-        if response.status_code == 200:
-                data = response.json()
-                if data.get("documents"):
-                    top_result = data["documents"][0]
-                    lat = float(top_result["y"])
-                    lon = float(top_result["x"])
-                return lat, lon
-        return None, None
-
     # 2. 주소가 입력된 경우에만 시설유형 선택 UI 표시
 
+    df = get_data('facilities_final')
     facility_types = df['시설유형'].dropna().unique()
     selected_type = st.selectbox('시설유형을 선택하세요', facility_types)
     
@@ -1,10 +1,25 @@
+import importlib
 import os
 import streamlit as st
-from app_home import run_home
-from app_map import run_map
-from app_chatbot_hr import run_chatbot_hhr
-from app_news import run_news
 from define import set_sidebar_background 
+from data_provider import preload_in_background
+
+# 페이지 이름 -> (모듈, 함수)
+# 페이지 모듈(app_map, app_chatbot_hr 등)은 folium, st_aggrid, sklearn, 챗봇/벡터DB와 여러 CSV를 불러오므로
+# 앱 시작 시가 아니라 해당 페이지로 처음 이동할 때 import합니다. (측정: python tools/import_time_report.py)
+PAGES = {
+    "홈": ('app_home', 'run_home'),
+    "시니어 시설 추천 받기": ('app_map', 'run_map'),
+    "인천 전체 시설 지도": ('app_city_map', 'run_city_map'),
+    "시니어 건강 상담사": ('app_chatbot_hr', 'run_chatbot_hhr'),
+}
+
+
+def load_page(page):
+    """페이지 함수를 반환합니다. 모듈은 처음 호출될 때 한 번만 import됩니다."""
+    module_name, func_name = PAGES[page]
+    module = importlib.import_module(module_name)
+    return getattr(module, func_name)
 
 # --- 🚀 메인 함수 ---
 def main():
@@ -41,6 +56,8 @@ def main():
             st.session_state.page = "홈"
         if st.button("시니어 시설 추천 받기", key="map", use_container_width=True):
             st.session_state.page = "시니어 시설 추천 받기"
+        if st.button("인천 전체 시설 지도", key="city_map_page", use_container_width=True):
+            st.session_state.page = "인천 전체 시설 지도"
         if st.button("시니어 건강 상담사", key="chatbot", use_container_width=True):
             st.session_state.page = "시니어 건강 상담사"
 
@@ -48,12 +65,13 @@ def main():
     if "page" not in st.session_state:
         st.session_state.page = "홈"
 
-    if st.session_state.page == "홈":
-        run_home()
-    elif st.session_state.page == "시니어 시설 추천 받기":
-        run_map()
-    elif st.session_state.page == "시니어 건강 상담사":
-        run_chatbot_hhr()
+    if st.session_state.page in PAGES:
+        with st.spinner('페이지를 불러오는 중...'):
+            run_page = load_page(st.session_state.page)
+        run_page()
+
+    # 첫 화면을 그린 뒤 다른 페이지에서 쓸 데이터를 백그라운드에서 미리 읽어 둡니다 (프로세스당 한 번).
+    preload_in_background()
 
 
     # menu_list = ['홈', '시니어 시설 추천 받기', '건강 상담사']
@@ -5,7 +5,14 @@ from app_bus_route import check_bus_route
 from app_around_leisure_restaurant import around_leisure
 from app_around_leisure_restaurant import around_restaurant
 from app_location import run_location
-from define import find_nearest_facilities, make_popup, draw_route_on_map, to_pylist, normalize_routes_output, extract_stop_list, _haversine_m
+from define import find_nearest_facilities, compute_route_coords, draw_route_on_map, to_pylist, normalize_routes_output, extract_stop_list, _haversine_m
+
+from map_layers import TILE_LABELS, add_feature_layer, add_poi_tile_layers, available_poi_tile_layers, user_features, facility_features, restaurant_features, leisure_features, bus_stop_features
+from map_component import MAP_COMPONENT_AVAILABLE, render_incremental_map, marker_layer, polyline_layer, tile_layer
+from route_cache import encode_polyline
+from map_render_cache import get_map_render_cache, map_state_key
+from nearest_cache import ERROR_TTL_S, cell_key, get_nearest_cache
+from data_provider import get_data
 
 from app_chatbot_mj import run_chatbot_app
 import numpy as np
@@ -15,17 +22,15 @@ from streamlit.components.v1 import html as st_html
 import math
 from html import escape
 
-# 도로 기반 라우팅에 사용되는 선택적(무거운) 의존성
-try:
-    import osmnx as ox
-    import networkx as nx
-    OSMNX_AVAILABLE = True
-except Exception:
-    OSMNX_AVAILABLE = False
+# 도로 기반 라우팅에 사용되는 선택적(무거운) 의존성(osmnx/networkx)은 define에서 필요할 때 불러옵니다.
 
 # 그래프 캐시 파일 이름
 GRAPH_CACHE_PATH = './incheon_graph.pkl'
 
+# True면 지도를 incremental_map 컴포넌트로 표시하고(바뀐 레이어만 전송),
+# 컴포넌트를 쓸 수 없으면 folium HTML(+ map_render_cache)로 표시합니다.
+USE_INCREMENTAL_MAP = True
+
 # 가장 복잡한 파트입니다.
 # 만약 유저 위치가 입력받지 않았다면 에러 문구를
 # 입력 받았다면 기능을 동작합니다.
@@ -34,7 +39,6 @@ GRAPH_CACHE_PATH = './incheon_graph.pkl'
 # 만약 사용자가 근처 맛집이나 가는 버스를 알고싶다면 멀티셀렉트를 이용하여 해당 기능을 지도에 표시합니다.
 # 이후 각각의 부분에서 받아온 함수를 상황에 맞게 동작시켜서 정보를 받은 후, 해당 정보를 출력합니다.
 
-import os
 import pickle
 
 
@@ -57,6 +61,150 @@ import pickle
 
 
 
+# run_map은 그리드에서 행을 선택할 때마다 처음부터 다시 실행되므로 단계별로 캐시합니다.
+# - 데이터 로드: 한 번만 읽음
+# - 후보 순위: (위치 격자 칸, 시설유형)별로 세션 간 공유 캐시(nearest_cache)에서 재사용
+# - 경로 / 부가 정보(맛집, 여가시설, 정류장): 선택된 시설 좌표별로 캐시
+@st.cache_resource(show_spinner=False)
+def _load_facilities():
+    """시설 데이터와 (lat 컬럼, lon 컬럼, 유형 컬럼)을 반환합니다.
+
+    cache_resource: 호출할 때마다 DataFrame을 복사하지 않고 모든 세션이 같은 객체를 씁니다 (읽기 전용으로만 사용).
+    """
+    df = get_data('facilities')
+    cols = [c for c in df.columns]
+    lat_col = next((c for c in cols if 'lat' in c.lower()), None)
+    lon_col = next((c for c in cols if 'lon' in c.lower() or 'lot' in c.lower()), None)
+    type_col = '시설유형' if '시설유형' in df.columns else df.columns[0]
+    return df, lat_col, lon_col, type_col
+
+
+def _rank_candidates(ulat, ulon, selected_type):
+    """사용자 위치에서 가까운 시설 5개를 (결과 DataFrame, 오류 문구)로 반환합니다.
+
+    결과는 (위치 격자 칸, 시설유형)별로 nearest_cache에 저장되어 모든 세션이 함께 씁니다.
+    같은 칸의 결과를 재사용할 때는 직선 거리만 현재 위치 기준으로 다시 계산합니다.
+    """
+    key = cell_key(ulat, ulon, selected_type)
+    # (None, 오류) 결과는 짧게만 보관합니다 (ERROR_TTL_S).
+    road_results, error = get_nearest_cache().get_or_compute(
+        key, lambda: _compute_rank(ulat, ulon, selected_type),
+        ttl_for=lambda value: ERROR_TTL_S if value[0] is None else None)
+    if road_results is None:
+        return None, error
+    _, lat_col, lon_col, _ = _load_facilities()
+    road_results = road_results.copy()
+    road_results['straight_dist_m'] = [
+        _haversine_m((ulat, ulon), (lat, lon)) for lat, lon in zip(road_results[lat_col], road_results[lon_col])
+    ]
+    return road_results, None
+
+
+def _compute_rank(ulat, ulon, selected_type):
+    """_rank_candidates의 실제 계산 (직선 거리 필터 -> 도로 거리 순위)."""
+    노인복지시설_df, lat_col, lon_col, type_col = _load_facilities()
+
+    if selected_type and selected_type != '전체':
+        candidates = 노인복지시설_df[노인복지시설_df[type_col] == selected_type].copy()
+    else:
+        candidates = 노인복지시설_df.copy()
+
+    candidates = candidates.dropna(subset=[lat_col, lon_col])
+    candidates[lat_col] = candidates[lat_col].astype(float)
+    candidates[lon_col] = candidates[lon_col].astype(float)
+    if candidates.shape[0] == 0:
+        return None, '선택된 유형의 시설이 없습니다.'
+
+    # 직선 거리 10km로 필터링
+    candidates['straight_dist_m'] = candidates.apply(
+        lambda row: _haversine_m((ulat, ulon), (row[lat_col], row[lon_col])), axis=1
+    )
+    candidates = candidates[candidates['straight_dist_m'] <= 10000]
+    if candidates.shape[0] == 0:
+        return None, '직선 거리 10km 이내의 시설이 없습니다.'
+
+    # 거리 계산 및 최적 시설 선택
+    road_results = find_nearest_facilities((ulat, ulon), candidates, return_count=5, candidate_prefilter=10, graph_cache_path=GRAPH_CACHE_PATH)
+    if road_results is None or road_results.shape[0] == 0:
+        return None, '10km 이내의 시설이 없습니다.'
+
+    # 도로 거리 10km로 필터링
+    if 'road_dist_m' in road_results.columns:
+        road_results = road_results[road_results['road_dist_m'] <= 10000]
+        if road_results.shape[0] == 0:
+            return None, '도로 거리 10km 이내의 시설이 없습니다.'
+    return road_results, None
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _route_stage(ulat, ulon, tlat, tlon):
+    """사용자 -> 선택된 시설 경로 (osmnx 그래프가 있으면 도로, 없으면 직선)."""
+    return compute_route_coords(ulat, ulon, tlat, tlon, graph_cache_path=GRAPH_CACHE_PATH)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _restaurant_stage(lat, lon):
+    return around_restaurant((lat, lon))
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _leisure_stage(lat, lon):
+    return around_leisure((lat, lon))
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _bus_stop_stage(ulat, ulon, flat, flon):
+    return bus_stop_recommendation((ulat, ulon), (flat, flon))
+
+
+# 지도 부가 레이어 이름 -> 레이어 제목
+OVERLAY_LABELS = {
+    'restaurant': '맛집',
+    'leisure': '여가시설',
+    'bus_user': '사용자 근처 정류장',
+    'bus_facility': '시설 근처 정류장',
+}
+
+
+def _overlay_collections(selection, facilities_location, user_df, fac_df):
+    """선택된 부가 정보를 {레이어 이름: (FeatureCollection, 카테고리, 팝업 너비)}로 만듭니다.
+
+    반환: (overlays, failed) - failed는 하나라도 불러오지 못한 오버레이가 있으면 True (경고는 이미 표시됨)
+    """
+    overlays = {}
+    failed = False
+    # 맛집 마커
+    if '맛집' in selection:
+        try:
+            temp_restaurant = _restaurant_stage(float(facilities_location[0]), float(facilities_location[1]))
+            if isinstance(temp_restaurant, pd.DataFrame) and not temp_restaurant.empty:
+                overlays['restaurant'] = (restaurant_features(temp_restaurant), 'restaurant', 240)
+        except Exception:
+            st.warning('맛집 정보를 불러오는 중 오류가 발생했습니다.')
+            failed = True
+
+    # 여가시설 마커
+    if '여가시설' in selection:
+        try:
+            temp_leisure = _leisure_stage(float(facilities_location[0]), float(facilities_location[1]))
+            if isinstance(temp_leisure, pd.DataFrame) and not temp_leisure.empty:
+                overlays['leisure'] = (leisure_features(temp_leisure), 'leisure', 240)
+        except Exception:
+            st.warning('여가시설 정보를 불러오는 중 오류가 발생했습니다.')
+            failed = True
+
+    # 정류장 마커
+    try:
+        if user_df is not None and hasattr(user_df, 'iterrows') and not user_df.empty:
+            overlays['bus_user'] = (bus_stop_features(user_df, 'dist_user_m'), 'bus_user', 200)
+        if fac_df is not None and hasattr(fac_df, 'iterrows') and not fac_df.empty:
+            overlays['bus_facility'] = (bus_stop_features(fac_df, 'dist_fac_m'), 'bus_facility', 200)
+    except Exception:
+        st.warning('정류장 마커 표시 중 오류가 발생했습니다.')
+        failed = True
+    return overlays, failed
+
+
 def run_map():
     """메인 Streamlit 진입점: 지도, 근처 시설 및 추가 오버레이를 표시합니다."""
     st.subheader('내 위치 찾기🔎')
@@ -78,61 +226,27 @@ def run_map():
         st.error('전달된 사용자 위치 정보 형식이 잘못되었습니다. [lat, lon, ...] 형식을 전달하세요.')
         return
 
-    # 2) 시설 데이터 로드 및 필터링
-    data_path = os.path.join('data', 'incheon senior welfare facility.csv')
-    노인복지시설_df = pd.read_csv(data_path, dtype=str, encoding='euc-kr')
-    cols = [c for c in 노인복지시설_df.columns]
-    lat_col = next((c for c in cols if 'lat' in c.lower()), None)
-    lon_col = next((c for c in cols if 'lon' in c.lower() or 'lot' in c.lower()), None)
+    # 2) 시설 데이터 로드 (캐시: 파일이 바뀌지 않는 한 한 번만 읽음)
+    노인복지시설_df, lat_col, lon_col, type_col = _load_facilities()
     if lat_col is None or lon_col is None:
-        st.error('데이터에 lat/lon 컬럼이 없습니다. 파일 컬럼: ' + ','.join(cols))
+        st.error('데이터에 lat/lon 컬럼이 없습니다. 파일 컬럼: ' + ','.join(노인복지시설_df.columns))
         return
 
     selected_type = None
     if isinstance(user_location, (list, tuple)) and len(user_location) > 3:
         selected_type = user_location[3]
 
-    type_col = '시설유형' if '시설유형' in 노인복지시설_df.columns else 노인복지시설_df.columns[0]
     if '시설유형' not in 노인복지시설_df.columns:
         st.warning("'시설유형' 컬럼이 없어 자동으로 첫 번째 컬럼을 사용합니다.")
 
-    if selected_type and selected_type != '전체':
-        candidates = 노인복지시설_df[노인복지시설_df[type_col] == selected_type].copy()
-    else:
-        candidates = 노인복지시설_df.copy()
-
-    candidates = candidates.dropna(subset=[lat_col, lon_col])
-    candidates[lat_col] = candidates[lat_col].astype(float)
-    candidates[lon_col] = candidates[lon_col].astype(float)
-    if candidates.shape[0] == 0:
-        st.error('선택된 유형의 시설이 없습니다.')
+    # 3)~5) 후보 순위 계산 (캐시: 같은 위치 칸과 시설유형이면 그리드 선택이 바뀌어도, 다른 세션이어도 재사용)
+    road_results, rank_error = _rank_candidates(ulat, ulon, selected_type)
+    if rank_error:
+        st.error(rank_error)
         return
-    
- # 3) 직선 거리 10km로 필터링
-    candidates['straight_dist_m'] = candidates.apply(
-        lambda row: _haversine_m((ulat, ulon), (row[lat_col], row[lon_col])), axis=1
-    )
-    candidates = candidates[candidates['straight_dist_m'] <= 10000]
-    if candidates.shape[0] == 0:
-        st.error('직선 거리 10km 이내의 시설이 없습니다.')
-        return
-
-    # 4) 거리 계산 및 최적 시설 선택
-    road_results = find_nearest_facilities((ulat, ulon), candidates, return_count=5, candidate_prefilter=10, graph_cache_path=GRAPH_CACHE_PATH)
-    if road_results is None or road_results.shape[0] == 0:
-        st.error('10km 이내의 시설이 없습니다.')
-        return
-
 
-    # 5) 도로 거리 10km로 필터링
-    if 'road_dist_m' in road_results.columns:
-        road_results = road_results[road_results['road_dist_m'] <= 10000]
-        if road_results.shape[0] == 0:
-            st.error('도로 거리 10km 이내의 시설이 없습니다.')
-            return
-        
     best = road_results.iloc[0] if not road_results.empty else None
-    best5 = road_results.head(5)
+    best5 = road_results.head(5).copy()
     best5['거리'] = best5['road_dist_m'].apply(lambda d: f"{d:.1f} m" if d < 1000 else f"{d/1000:.2f} km")
     st.write('\n')
     st.write('시설명을 선택 하시면 경로가 갱신됩니다.🚌💨💨')
@@ -195,41 +309,7 @@ def run_map():
         except Exception:
             st.write('선택 정보를 표시할 수 없습니다.')
 
-  # 6) 기본 지도 생성 및 표시
-    fmap = folium.Map(location=[ulat, ulon], zoom_start=14)  # 1km에 맞게 확대
-    try:
-        st.session_state['fmap'] = fmap
-    except Exception:
-        pass
-
-
-    # 사용자 위치 마커
-    folium.Marker(
-        [ulat, ulon],
-        popup=make_popup('사용자 위치'),
-        icon=folium.Icon(color='blue', icon='user', prefix='fa')
-    ).add_to(fmap)
-
-
-    # 5개 시설 모두 마커 표시
-    for _, row in best5.iterrows():
-        title = str(row.get(노인복지시설_df.columns[0], '이름'))+ '<br>' +str(row.get(type_col, '시설'))
-        folium.Marker(
-            [row[lat_col], row[lon_col]],
-            popup=make_popup(title),
-            icon=folium.Icon(color='red', icon='flag')
-        ).add_to(fmap)
-
-
-    # 5) 경로 그리기 (osmnx 그래프가 있으면 시도, 없으면 직선 폴백)
-    draw_route_on_map(fmap, ulat, ulon, best[lat_col], best[lon_col], graph_cache_path=GRAPH_CACHE_PATH)
-
-    # 6) 부가 정보(맛집/여가시설/정류장) 표시
-    try:
-        fmap = st.session_state.get('fmap', fmap)
-    except Exception:
-        pass
-
+    # 6) 부가 정보(맛집/여가시설/정류장) 선택
     select_list = ['맛집', '여가시설', '정류장']
     selection = st.multiselect('추가적으로 사용하실 정보를 입력해주세요.', select_list)
     facilities_location = (best[lat_col], best[lon_col])
@@ -239,111 +319,78 @@ def run_map():
         pass
     facilities_location = st.session_state.get('facilities_location', facilities_location)
 
+    # 경로 계산 (osmnx 그래프가 있으면 시도, 없으면 직선 폴백)
+    route = _route_stage(ulat, ulon, float(best[lat_col]), float(best[lon_col]))
+
+    # 정류장 테이블은 지도 캐시와 관계없이 필요하므로 먼저 준비
     user_df = None
     fac_df = None
-
-
-    # 맛집 마커
-    if '맛집' in selection:
-        try:
-            temp_restaurant = around_restaurant(facilities_location)
-            if isinstance(temp_restaurant, pd.DataFrame) and not temp_restaurant.empty:
-                for _, r in temp_restaurant.head(20).iterrows():
-                    try:
-                        latv = float(r.get(lat_col, r.get('lat')))
-                        lonv = float(r.get(lon_col, r.get('lon')))
-                        label = r.get('상호', '맛집')
-                        extra = ''
-                        for c in ['주소','도로명 주소','소재지','상세주소']:
-                            if c in r and pd.notna(r[c]):
-                                extra = r[c]
-                                break
-                        popup_text = label if not extra else f"{label}<br>{extra}"
-                        # 눈에 띄는 마커로 변경
-                        folium.Marker(
-                            [latv, lonv],
-                            popup=make_popup(popup_text),
-                            icon=folium.Icon(color='orange', icon='cutlery', prefix='fa')
-                        ).add_to(fmap)
-                    except Exception:
-                        continue
-        except Exception:
-            st.warning('맛집 정보를 불러오는 중 오류가 발생했습니다.')
-
-
-    # 여가시설 마커
-    if '여가시설' in selection:
-        try:
-            temp_leisure = around_leisure(facilities_location)
-            if isinstance(temp_leisure, pd.DataFrame) and not temp_leisure.empty:
-                for _, r in temp_leisure.head(20).iterrows():
-                    try:
-                        latv = float(r.get(lat_col, r.get('lat')))
-                        lonv = float(r.get(lon_col, r.get('lon')))
-                        label = r.get('이름', '여가')
-                        extra = ''
-                        for c in ['주소','위치','설명','도로명 주소','시설분류']:
-                            if c in r and pd.notna(r[c]):
-                                extra = r[c]
-                                break
-                        popup_text = label if not extra else f"{label}<br>{extra}"
-                        # 눈에 띄는 마커로 변경
-                        folium.Marker(
-                            [latv, lonv],
-                            popup=make_popup(popup_text),
-                            icon=folium.Icon(color='purple', icon='star', prefix='fa')
-                        ).add_to(fmap)
-                    except Exception:
-                        continue
-        except Exception:
-            st.warning('여가시설 정보를 불러오는 중 오류가 발생했습니다.')
-
-        
-    # 정류장 마커 및 테이블 준비
     bus_request = False
+    bus_failed = False
     if '정류장' in selection:
         bus_request = True
         try:
-            temp_bus_stop = bus_stop_recommendation((ulat,ulon), facilities_location)
+            temp_bus_stop = _bus_stop_stage(ulat, ulon, float(facilities_location[0]), float(facilities_location[1]))
         except Exception as e:
             st.warning('정류장 추천 모듈 호출 중 오류가 발생했습니다: ' + str(e))
             temp_bus_stop = None
+            bus_failed = True
 
         if isinstance(temp_bus_stop, dict):
             user_df = temp_bus_stop.get('user_nearby')
             fac_df = temp_bus_stop.get('facility_nearby')
-            # 지도에 그리기
-            try:
-                if user_df is not None and hasattr(user_df, 'iterrows') and not user_df.empty:
-                    for _, r in user_df.iterrows():
-                        try:
-                            folium.Marker(
-                                [float(r['lat']), float(r['lon'])],
-                                popup=make_popup(f"{r.get('정류장명','정류장')}<br>정류장 번호:  {str(r.get('정류소번호', 'N/A')).split('.')[0]}<br>{int(r.get('dist_user_m',0))}m", width=200),
-                                icon=folium.Icon(color='green', icon='bus', prefix='fa')
-                            ).add_to(fmap)
-                        except Exception:
-                            continue
-                if fac_df is not None and hasattr(fac_df, 'iterrows') and not fac_df.empty:
-                    for _, r in fac_df.iterrows():
-                        try:
-                            folium.Marker(
-                                [float(r['lat']), float(r['lon'])],
-                                popup=make_popup(f"{r.get('정류장명','정류장')}<br>정류장 번호:  {str(r.get('정류소번호', 'N/A')).split('.')[0]}<br>{int(r.get('dist_fac_m',0))}m", width=200),
-                                icon=folium.Icon(color='darkgreen', icon='bus', prefix='fa')
-                            ).add_to(fmap)
-                        except Exception:
-                            continue
-            except Exception:
-                st.warning('정류장 마커 표시 중 오류가 발생했습니다.')
         else:
             st.warning('정류장 정보를 불러오지 못했습니다. 모듈이 placeholder 상태일 수 있습니다.')
+            bus_failed = True
 
-    # 7) 지도 렌더링 및 테이블/버튼 표시
-    fmap_html = fmap._repr_html_()
-    # 전체 너비로 지도를 표시합니다 (데이터프레임/선택카드 아래).
+    # 7) 지도 표시
+    name_col = 노인복지시설_df.columns[0]
     st.markdown('### 지도🗺️')
-    st_html(fmap_html, height=680)
+    if USE_INCREMENTAL_MAP and MAP_COMPONENT_AVAILABLE:
+        # 지도는 클라이언트에 유지하고 바뀐 레이어(경로/맛집/여가시설/정류장)만 diff로 보냅니다.
+        layers = {
+            'user': marker_layer(user_features(ulat, ulon), 'user'),
+            'facility': marker_layer(facility_features(best5, name_col, type_col, lat_col, lon_col), 'facility'),
+            'route': polyline_layer(encode_polyline(route[0]), route[1]),
+        }
+        # 미리 그린 전체 시설/정류장/여가시설 타일. 레이어 선택 메뉴에 꺼진 상태로 들어가고 사용자가 켠 것만 그려집니다.
+        for tile_name, url, options in available_poi_tile_layers():
+            layers['tiles_' + tile_name] = tile_layer(url, options, TILE_LABELS.get(tile_name, tile_name))
+        overlays, _ = _overlay_collections(selection, facilities_location, user_df, fac_df)
+        for name, (fc, category, popup_width) in overlays.items():
+            layers[name] = marker_layer(fc, category, popup_width=popup_width)
+        render_incremental_map((ulat, ulon), layers, key='run_map_incremental_map', height=680)
+    else:
+        # 지도 상태가 같으면 이전에 만든 HTML을 재사용하고, 없을 때만 folium 지도를 만듭니다.
+        facility_points = [(row.get(name_col, ''), row[lat_col], row[lon_col]) for _, row in best5.iterrows()]
+        tile_names = [tile_name for tile_name, _, _ in available_poi_tile_layers()]
+        render_key = map_state_key((ulat, ulon), selected_type, facility_points, facilities_location, selection, route[0],
+                                   tile_names)
+        render_cache = get_map_render_cache()
+        fmap_html = render_cache.get(render_key)
+        if fmap_html is None:
+            fmap = folium.Map(location=[ulat, ulon], zoom_start=14)  # 1km에 맞게 확대
+
+            # 사용자 위치 / 5개 시설 마커 (카테고리별 GeoJSON 레이어 하나씩)
+            add_feature_layer(fmap, user_features(ulat, ulon), 'user', name='사용자 위치')
+            add_feature_layer(fmap, facility_features(best5, name_col, type_col, lat_col, lon_col), 'facility', name='추천 시설')
+
+            draw_route_on_map(fmap, ulat, ulon, best[lat_col], best[lon_col], route=route)
+
+            overlays, overlay_failed = _overlay_collections(selection, facilities_location, user_df, fac_df)
+            for name, (fc, category, popup_width) in overlays.items():
+                add_feature_layer(fmap, fc, category, name=OVERLAY_LABELS.get(name, name), popup_width=popup_width)
+
+            # 미리 그린 전체 시설/정류장/여가시설 타일 (레이어 컨트롤에서 켜기)
+            add_poi_tile_layers(fmap)
+
+            fmap_html = fmap._repr_html_()
+            # 불러오지 못한 오버레이가 있으면 빠진 지도를 캐시하지 않습니다 (다음 요청에서 다시 시도하고 경고도 다시 표시).
+            if not (overlay_failed or bus_failed):
+                render_cache.put(render_key, fmap_html)
+
+        # 전체 너비로 지도를 표시합니다 (데이터프레임/선택카드 아래).
+        st_html(fmap_html, height=680)
 
     if '맛집' in selection:
         run_chatbot_app()
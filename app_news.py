@@ -1,10 +1,31 @@
 import streamlit as st
-import requests
 import xml.etree.ElementTree as ET
 from datetime import datetime
-
-def get_welfare_news(service_key, page_no=1, num_of_rows=10, age=None, ctpv_nm=None, search_wrd=None):
-    base_url = "https://apis.data.go.kr/B554287/LocalGovernmentWelfareInformations/LcgvWelfarelist"
+import api_gateway
+from news_cache import get_news_cache
+from welfare_index import get_welfare_index
+
+BASE_URL = "https://apis.data.go.kr/B554287/LocalGovernmentWelfareInformations/LcgvWelfarelist"
+
+# 앱이 처음 뜰 때 백그라운드로 채워둘 조회 조건: (지역, 검색어, 페이지당 건수, 페이지)
+COMMON_QUERIES = [
+    ('', '', 10, 1),
+    ('인천', '', 10, 1),
+    ('인천', '노인', 10, 1),
+]
+# 남은 일일 호출 한도가 이보다 적으면 미리 채우기(warm)를 하지 않습니다.
+WARM_MIN_QUOTA = 200
+
+
+def _request_welfare_list(service_key, page_no=1, num_of_rows=10, age=None, ctpv_nm=None, search_wrd=None):
+    """복지 서비스 목록을 조회해 (결과 리스트, 상태)를 반환합니다.
+
+    상태는 성공 시 None, 그 외에는 (종류, 메시지)입니다.
+    - 'warning': 검색 결과 없음 (news_cache에 저장 가능)
+    - 'unavailable': 한도 초과/서킷 차단/네트워크 오류 등 일시적인 호출 실패 (저장하지 않음)
+    - 'error': 그 밖의 오류 응답
+    streamlit을 호출하지 않으므로 백그라운드 스레드(news_cache)에서도 사용할 수 있습니다.
+    """
     params = {
         'serviceKey': service_key,
         'pageNo': str(page_no),
@@ -17,35 +38,53 @@ def get_welfare_news(service_key, page_no=1, num_of_rows=10, age=None, ctpv_nm=N
     if search_wrd:
         params['searchWrd'] = search_wrd
 
-    response = requests.get(base_url, params=params)
     news_list = []
+    try:
+        response = api_gateway.request('welfare_news', BASE_URL, params=params, api_key=service_key)
+    except api_gateway.GatewayError as e:
+        # 한도 초과/서킷 차단 시에는 오류 대신 안내 문구만 보여줍니다.
+        return news_list, ('unavailable', api_gateway.describe_error(e))
 
     if response.status_code == 429:
-        st.error("데이터 호출 제한에 도달했습니다. 잠시 후 다시 시도해 주세요.")
-    elif response.status_code == 200:
-        try:
-            root = ET.fromstring(response.content)
-            result_code = root.findtext('.//resultCode')
-            result_msg = root.findtext('.//resultMessage')
-            if result_code == '0':
-                for serv in root.findall('.//servList'):
-                    news_list.append({
-                        'servNm': serv.findtext('servNm', default='N/A'),
-                        'servDgst': serv.findtext('servDgst', default='설명없음'),
-                        'servDtlLink': serv.findtext('servDtlLink', default=''),
-                        'bizChrDeptNm': serv.findtext('bizChrDeptNm', default=''),
-                        'ctpvNm': serv.findtext('ctpvNm', default=''),
-                        'lastModYmd': serv.findtext('lastModYmd', default=''),
-                    })
-            elif result_code == '40':
-                st.warning('검색된 데이터가 없습니다.')
-            else:
-                st.error(f'오류 발생 - 코드: {result_code}, 메시지: {result_msg}')
-        except Exception as e:
-            st.error(f"XML 파싱 중 오류 발생: {e}")
+        return news_list, ('unavailable', "데이터 호출 제한에 도달했습니다. 잠시 후 다시 시도해 주세요.")
+    if response.status_code != 200:
+        return news_list, ('error', f'데이터 요청 실패, 상태 코드: {response.status_code}')
+
+    try:
+        root = ET.fromstring(response.content)
+        result_code = root.findtext('.//resultCode')
+        result_msg = root.findtext('.//resultMessage')
+        if result_code == '0':
+            for serv in root.findall('.//servList'):
+                news_list.append({
+                    'servNm': serv.findtext('servNm', default='N/A'),
+                    'servDgst': serv.findtext('servDgst', default='설명없음'),
+                    'servDtlLink': serv.findtext('servDtlLink', default=''),
+                    'bizChrDeptNm': serv.findtext('bizChrDeptNm', default=''),
+                    'ctpvNm': serv.findtext('ctpvNm', default=''),
+                    'lastModYmd': serv.findtext('lastModYmd', default=''),
+                })
+            return news_list, None
+        elif result_code == '40':
+            return news_list, ('warning', '검색된 데이터가 없습니다.')
+        return news_list, ('error', f'오류 발생 - 코드: {result_code}, 메시지: {result_msg}')
+    except Exception as e:
+        return news_list, ('error', f"XML 파싱 중 오류 발생: {e}")
+
+
+def _show_status(status):
+    if status is None:
+        return
+    kind, msg = status
+    if kind in ('warning', 'unavailable'):
+        st.warning(msg)
     else:
-        st.error(f'데이터 요청 실패, 상태 코드: {response.status_code}')
+        st.error(msg)
+
 
+def get_welfare_news(service_key, page_no=1, num_of_rows=10, age=None, ctpv_nm=None, search_wrd=None):
+    news_list, status = _request_welfare_list(service_key, page_no, num_of_rows, age, ctpv_nm, search_wrd)
+    _show_status(status)
     return news_list
 
 def format_date(date_str):
@@ -54,13 +93,48 @@ def format_date(date_str):
     except Exception:
         return date_str
 
+def _news_fetcher(service_key):
+    """news_cache 키 (지역, 검색어, 건수, 페이지)로 조회하는 함수를 만듭니다."""
+    def fetch(key):
+        ctpv, search_wrd, rows, page = key
+        return _request_welfare_list(service_key, page, rows, None, ctpv or None, search_wrd or None)
+    return fetch
+
+
+def _enough_quota(service_key):
+    left = api_gateway.quota_left('welfare_news', service_key)
+    return left is None or left >= WARM_MIN_QUOTA
+
+
 def fetch_news(ctpv, search_list, free_text, rows, page):
     combined_search = search_list.copy()
     if free_text.strip():
         combined_search.append(free_text.strip())
     search_wrd = ",".join(combined_search) if combined_search else None
-    with st.spinner('검색 중...'):
-        return get_welfare_news(st.secrets["NEWS_API_KEY"], page, rows, None, ctpv, search_wrd)
+    service_key = st.secrets["NEWS_API_KEY"]
+
+    # 로컬 인덱스(welfare_index)가 한 번이라도 끝까지 동기화되었으면 검색은 로컬에서 처리하고,
+    # 네트워크는 주기적 동기화에만 씁니다. 첫 동기화 중에는 일부만 들어 있으므로 아래 API/캐시 경로를 씁니다.
+    index = get_welfare_index()
+    index.sync_in_background(service_key)
+    if index.is_ready():
+        return index.search(ctpv, search_list, free_text, rows, page)
+
+    # 모든 세션이 공유하는 캐시에서 먼저 찾고, 현재 페이지를 보여주는 동안 다음 페이지를 미리 받아옵니다.
+    cache = get_news_cache()
+    fetcher = _news_fetcher(service_key)
+    key = ((ctpv or '').strip(), search_wrd or '', int(rows), int(page))
+    # 자주 쓰는 조회 조건은 백그라운드 스레드에서 채우고, 남은 한도가 적으면 건너뜁니다.
+    cache.warm(COMMON_QUERIES, fetcher, lambda: _enough_quota(service_key))
+    if cache.contains(key):
+        news_list, status = cache.get(key, fetcher)
+    else:
+        with st.spinner('검색 중...'):
+            news_list, status = cache.get(key, fetcher)
+    _show_status(status)
+    if len(news_list) >= int(rows):
+        cache.prefetch((key[0], key[1], key[2], key[3] + 1), fetcher)
+    return news_list
 
 def run_news():
     st.title('복지 지원 서비스 알림 게시판📝')
@@ -85,11 +159,11 @@ def run_news():
 
         page_no = st.session_state.page_no
 
+        # 단일 입력 문자열을 쉼표로 분리해 리스트로 변환 (입력에 쉼표가 있으면 복수도 지원)
+        search_wrd_list = [w.strip() for w in search_wrd_single.split(',')] if search_wrd_single else []
+
         if st.button('복지 서비스 조회'):
             st.session_state.page_no = 1
-            
-            # 단일 입력 문자열을 쉼표로 분리해 리스트로 변환 (입력에 쉼표가 있으면 복수도 지원)
-            search_wrd_list = [w.strip() for w in search_wrd_single.split(',')] if search_wrd_single else []
             st.session_state.news_cache = fetch_news(ctpv_nm, search_wrd_list, free_text_search, num_of_rows, 1)
 
     with right_col:
@@ -9,12 +9,26 @@ from langchain_community.vectorstores import Chroma
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from langchain_core.runnables import RunnableGenerator, RunnableLambda, RunnablePassthrough
+
+import answer_cache
+import hybrid_retriever
+import local_rag
+import rag_planner
+from embedding_cache import CachedEmbeddings, LocalHashEmbeddings
 
 # 상수: chroma DB 위치, embedding/LLM 모델
 CHROMA_DIR = './chroma_db'
 EMBED_MODEL = "text-embedding-004"
 LLM_MODEL = "gemini-2.5-flash"
+# 컬렉션 지문(답변 캐시 무효화용)을 다시 계산하는 주기
+FINGERPRINT_TTL_S = 300
+# 'local'이면 네트워크 없이 LocalHashEmbeddings와 로컬 컬렉션(local_rag.LOCAL_CHROMA_DIR)을 사용합니다
+EMBEDDINGS_BACKEND = os.environ.get("RAG_EMBEDDINGS", "google")
+# 'bm25'이면 합친 검색 결과를 질문과의 BM25 점수로 다시 정렬합니다 (local_rag.bm25_rerank)
+RERANKER = os.environ.get("RAG_RERANKER", "none")
+# 'hybrid'이면 벡터 검색과 BM25(한국어 글자 bigram) 순위를 RRF로 합칩니다 (hybrid_retriever), 'vector'이면 벡터 검색만
+RETRIEVAL = os.environ.get("RAG_RETRIEVAL", "hybrid")
 
 # chatbot_hr에서 반복적으로 사용되는 긴 UI 블록(예: 예시 질문 팝오버)을
 # 별도의 함수로 분리하여 코드 가독성을 높입니다.
@@ -74,8 +88,16 @@ def get_health_tip(bmi, bp_sys, bp_dia, fbs, waist, gender):
 
 
 def ask_rag(question):
+    # 검색 점수만 먼저 보고 관련 문서가 없으면 LLM을 부르지 않고 None을 반환합니다.
     try:
         vectordb = load_vectorstore()
+        scored = rag_planner.score_query(vectordb, question)
+        bm25_index = make_bm25_index(vectordb)
+        coverage = bm25_index.best_coverage(question) if bm25_index is not None else 0.0
+        if not rag_planner.is_relevant(scored, relevance_thresholds()[0]) and coverage < rag_planner.MIN_BM25_COVERAGE:
+            top = scored[0][1] if scored else None
+            print(f"ask_rag: 관련 문서 없음 (최고 유사도 {top}, BM25 {coverage}): {question}")
+            return None
         chain = make_rag_chain(vectordb)
         result = chain.invoke({"question": question})
         return result
@@ -123,10 +145,62 @@ def add_source_to_answer(result):
     answer = result["answer"]
     source = result["source"]
     
+    return answer + source_suffix(source)
+
+
+def source_suffix(source):
+    """답변 끝에 붙일 출처 문자열 (출처가 없으면 빈 문자열)."""
     if source and source != "N/A":
-        return f"{answer}\n\n---\n**출처:** {source}"
-    else:
-        return answer
+        return f"\n\n---\n**출처:** {source}"
+    return ""
+
+
+def stream_with_source(chunks):
+    """
+    prompt_chain의 스트림({"answer": 토큰} / {"source": 출처} 조각)을 받아
+    답변 토큰을 도착하는 대로 내보내고, 마지막에 출처를 붙입니다.
+    (add_source_to_answer의 스트리밍 버전입니다.)
+    """
+    source = None
+    for chunk in chunks:
+        if chunk.get("answer"):
+            yield chunk["answer"]
+        if chunk.get("source") is not None:
+            source = chunk["source"]
+    suffix = source_suffix(source)
+    if suffix:
+        yield suffix
+
+
+def make_embeddings(backend=None):
+    """
+    쿼리 임베딩 모델을 만듭니다. 같은 문자열은 한 번만 원격으로 임베딩하도록
+    CachedEmbeddings(메모리 LRU + cache/embeddings.sqlite3)로 감쌉니다.
+    """
+    backend = backend or EMBEDDINGS_BACKEND
+    if backend == "local":
+        return CachedEmbeddings(LocalHashEmbeddings(), db_path=None)
+    return CachedEmbeddings(GoogleGenerativeAIEmbeddings(model=EMBED_MODEL), model_name=EMBED_MODEL)
+
+
+def relevance_thresholds():
+    """현재 임베딩 백엔드의 (쿼리 기준, 문서 기준) 관련도 유사도."""
+    return rag_planner.RELEVANCE_THRESHOLDS.get(EMBEDDINGS_BACKEND, rag_planner.RELEVANCE_THRESHOLDS["google"])
+
+
+def make_reranker(name=None):
+    """RAG_RERANKER 설정에 맞는 재정렬 함수(rerank(question, docs, top_n)) 또는 None."""
+    name = name or RERANKER
+    if name == "bm25":
+        return local_rag.bm25_rerank
+    return None
+
+
+def make_bm25_index(vectordb):
+    """RAG_RETRIEVAL이 'hybrid'이면 vectordb 전체 청크의 BM25 색인(hybrid_retriever.HybridIndex), 아니면 None."""
+    if RETRIEVAL != "hybrid":
+        return None
+    return hybrid_retriever.get_hybrid_index(vectordb)
 
 
 @st.cache_resource
@@ -135,14 +209,23 @@ def load_vectorstore():
     Streamlit 앱 실행 시 단 한 번만 ChromaDB를 로드합니다.
     (원본 동작을 그대로 유지합니다.)
     """
-    embeddings = GoogleGenerativeAIEmbeddings(model=EMBED_MODEL)
+    embeddings = make_embeddings()
     db_path = Path(CHROMA_DIR)
 
     if not db_path.exists() or not (db_path / "chroma.sqlite3").exists():
         st.error(f"'{CHROMA_DIR}' 폴더 또는 'chroma.sqlite3' 파일을 찾을 수 없습니다.")
         st.error("Colab에서 'chroma_db'를 빌드한 후, 압축 해제하여 VScode 프로젝트 폴더에 올바르게 복사했는지 확인하세요.")
+        st.error("또는 프로젝트 폴더에서 `python chroma_ingest.py`를 실행하면 data/의 PDF와 CSV로 DB를 다시 만들 수 있습니다.")
         st.stop()
 
+    if EMBEDDINGS_BACKEND == "local":
+        # 원본 컬렉션의 문서를 로컬 임베딩으로 다시 임베딩한 별도 컬렉션 (처음 한 번 생성)
+        try:
+            return local_rag.load_local_vectorstore(embeddings, CHROMA_DIR)
+        except Exception as e:
+            st.error(f"로컬 임베딩 컬렉션을 만드는 중 오류 발생: {e}")
+            st.stop()
+
     try:
         # ChromaDB 클라이언트에 직접 연결하여 진단 시작
         client = chromadb.PersistentClient(path=CHROMA_DIR)
@@ -187,25 +270,14 @@ def load_vectorstore():
     except Exception as e:
         st.error(f"DB 문서 개수 확인 중 심각한 오류 발생: {e}")
         st.error("ChromaDB 파일이 손상되었을 수 있습니다. Colab에서 DB를 다시 빌드하고 VScode의 `chromadb` 버전을 (1.3.0) 통일하세요.")
+        st.error("`python chroma_ingest.py --rebuild`로 현재 설치된 chromadb 버전에서 DB를 다시 만들 수 있습니다.")
         st.stop()
 
 
-@st.cache_resource
-def make_rag_chain(_vectordb):
-    """
-    벡터DB(retriever)와 LLM을 결합해 RAG 체인을 생성합니다.
-    - 어르신 친화형 말투 및 정책자료 기반 응답 강화
-    - 검색 다양성 확보 (mmr + k=10)
-    """
-    retriever = _vectordb.as_retriever(
-        search_type="mmr",
-        search_kwargs={"k": 10}
-    )
-
-    # --------------------------------------------
-    # 🌿 개선된 system prompt
-    # --------------------------------------------
-    system_prompt = """
+# --------------------------------------------
+# 🌿 개선된 system prompt
+# --------------------------------------------
+RAG_SYSTEM_PROMPT = """
 당신은 한국어로 답하는 노인 건강 및 복지 전문 어시스턴트입니다.
 
 [역할]
@@ -228,11 +300,18 @@ def make_rag_chain(_vectordb):
 - 예: “사용자님, 이 제도는 만 65세 이상 어르신께서 신청하실 수 있습니다.”
 """
 
+
+@st.cache_resource
+def make_answer_chain():
+    """
+    검색된 근거(context)와 질문으로 답변을 만드는 프롬프트 → LLM 체인입니다.
+    make_rag_chain과 검색 계획기(ask_planned)가 함께 사용합니다.
+    """
     # --------------------------------------------
     # 💬 프롬프트 템플릿 (검색 결과 + 질문 결합)
     # --------------------------------------------
     prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
+        ("system", RAG_SYSTEM_PROMPT),
         (
             "human",
             "질문: {question}\n\n"
@@ -250,6 +329,24 @@ def make_rag_chain(_vectordb):
         temperature=0.2  # 낮을수록 사실 기반
     )
 
+    return prompt | llm | StrOutputParser()
+
+
+@st.cache_resource
+def make_rag_chain(_vectordb):
+    """
+    벡터DB(retriever)와 LLM을 결합해 RAG 체인을 생성합니다.
+    - 어르신 친화형 말투 및 정책자료 기반 응답 강화
+    - 벡터 + BM25 하이브리드 검색 k=10 (RAG_RETRIEVAL='vector'이면 기존 mmr + k=10)
+    """
+    if RETRIEVAL == "hybrid":
+        retriever = hybrid_retriever.HybridRetriever(vectordb=_vectordb, k=10)
+    else:
+        retriever = _vectordb.as_retriever(
+            search_type="mmr",
+            search_kwargs={"k": 10}
+        )
+
     # --------------------------------------------
     # 🧩 체인 구성 (retriever → formatter → prompt → llm)
     # --------------------------------------------
@@ -265,7 +362,7 @@ def make_rag_chain(_vectordb):
 
     # LLM 응답 + 출처 정보 합침
     prompt_chain = {
-        "answer": prompt | llm | StrOutputParser(),
+        "answer": make_answer_chain(),
         "source": lambda x: x["source"]
     }
 
@@ -276,213 +373,278 @@ def make_rag_chain(_vectordb):
         }
         | RunnableLambda(lambda x: formatting_chain.invoke((x["result"][0], x["result"][1], x["question"])))
         | prompt_chain
-        | RunnableLambda(add_source_to_answer)
+        # invoke()는 완성된 답변 문자열을, stream()은 토큰 단위 문자열을 돌려줍니다.
+        | RunnableGenerator(stream_with_source)
     )
 
     return final_chain
 
 
-def ask_with_fallback(topic_query, user_display_question=None):
-    # If a list of candidates is provided, try them in order first
-    if isinstance(topic_query, (list, tuple)):
-        for candidate in topic_query:
-            if not candidate:
-                continue
-            res = ask_rag(candidate)
-            if res:
-                # debug log
-                try:
-                    if "debug_logs" not in st.session_state:
-                        st.session_state["debug_logs"] = []
-                    st.session_state["debug_logs"].append({"method": "candidate", "candidate": candidate})
-                except Exception:
-                    pass
-                print(f"ask_with_fallback: candidate succeeded: {candidate}")
-                return res
-        primary = topic_query[0] if topic_query else ""
-    else:
-        # 1) 먼저 직접 시도
-        res = ask_rag(topic_query)
-        if res:
-            return res
-        primary = topic_query
-
-    # 2) 문서에 존재할 가능성이 높은 토픽으로 재매핑 (간단한 키워드 맵)
-    fallback_map = {
-        "건강보험료 지원 - 저소득 노인": "국고보조금 정산",
-        "의료비 지원 - 대상 및 금액": "장기요양기관 운영 및 급여비용 부담",
-        "노인일자리 및 사회활동 지원사업 - 지원금": "시설 운영비 지출",
-        "노인일자리 및 사회활동 지원사업": "노인복지시설 기준",
-        "노인일자리 참여 자격": "노인복지시설 기준",
-        "공익형 일자리 신청 방법": "노인일자리 및 사회활동 지원사업",
-        "방문요양서비스 신청 방법": "장기요양기관 운영 및 급여비용 부담",
-        "장기요양보험 등급판정 방법": "장기요양기관 운영 및 급여비용 부담",
-        "노인학대 신고 방법": "노인학대 예방 교육",
-        "학대피해노인 전용쉼터 이용 방법": "학대피해노인 보호",
-        "노인교실 프로그램 안내": "여가문화 활동 및 프로그램 운영",
-        "경로당 운영 참여 방법": "여가문화 활동 및 프로그램 운영",
-    }
-
-    # 추가 매핑: UI에서 사용하는 q 문자열들을 PDF 내 존재하는 섹션/문구로 재매핑
-    # (추출 스크립트 결과 기반 추천 매핑)
-    fallback_map.update({
-        "노인일자리 및 사회활동 지원사업 주요 유형 및 설명": "노인복지 일반현황",
-        "노인일자리 참여 자격 및 신청 절차 안내": "노인복지 일반현황",
-        "노인일자리 활동의 급여 및 수당 지급 방식 안내": "사업별 지원기준단가",
-
-        # 지원금/혜택 관련
-        "노인복지 수당 및 지원금의 종류와 지급 기준 안내": "지원 대상 및 범위",
-        "저소득층 대상 의료비 및 지원 제도 운영 방식과 신청 기준 안내": "지원 대상 및 범위",
-        "저소득 노인 대상 건강보험료 지원 프로그램의 주요 내용 및 신청 절차": "지원 대상 및 범위",
-
-        # 돌봄·요양 관련
-        "방문요양 서비스의 제공 범위 및 신청 방법(장기요양 관련) 안내": "장기요양기관 운영 및 급여비용 부담",
-        "장기요양보험 등급 판정 절차 및 등급 기준 안내": "장기요양인정신청",
-
-        # 여가·문화활동 관련
-        "2025년 문화강좌 및 여가프로그램의 개요, 신청방법 및 일정 안내": "프로그램 운영",
-        "경로당 프로그램 참여 방법 및 운영시간(운영 안내)": "프로그램 운영",
-
-        # 긴급지원·상담 관련
-        "노인학대 신고 절차 및 긴급보호 서비스 이용 방법 안내": "긴급복지의료지원",
-        "학대피해 노인 보호(쉼터) 이용 자격 및 연락처 안내": "학대피해노인 보호",
-    })
-
-    # Try mapping based on primary candidate or the original string
-    alt = fallback_map.get(primary)
-    if alt:
-        res2 = ask_rag(alt)
-        if res2:
-            try:
-                if "debug_logs" not in st.session_state:
-                    st.session_state["debug_logs"] = []
-                st.session_state["debug_logs"].append({"method": "fallback_map", "candidate": alt})
-            except Exception:
-                pass
-            print(f"ask_with_fallback: fallback_map succeeded: {alt}")
-            # 문서 기반의 관련 주제로 재질의한 결과를 그대로 반환
-            return res2
-
-    # 3) 키워드 맵에 없으면 간단 키워드 추출(예: 중요한 명사로 재시도)
+def _debug_log(entry):
+    """st.session_state["debug_logs"]에 디버그 기록을 남깁니다."""
     try:
-        # 아주 간단한 추출: 한국어 공백 분할 후 명사처럼 보이는 단어 우선 사용
-        parts = topic_query.split()
-        for p in parts:
-            if len(p) >= 2:
-                res3 = ask_rag(p)
-                if res3:
-                    try:
-                        if "debug_logs" not in st.session_state:
-                            st.session_state["debug_logs"] = []
-                        st.session_state["debug_logs"].append({"method": "keyword", "candidate": p})
-                    except Exception:
-                        pass
-                    print(f"ask_with_fallback: keyword succeeded: {p}")
-                    return res3
+        if "debug_logs" not in st.session_state:
+            st.session_state["debug_logs"] = []
+        st.session_state["debug_logs"].append(entry)
     except Exception:
         pass
 
-    # 4) 최후 폴백: Gemini에게 원래(또는 표시용) 질문으로 물어본다
+
+def plan_retrieval(question, candidates=None):
+    """
+    검색 계획기(rag_planner)로 질문/결합 쿼리/후보/fallback 맵/키워드를 동시에 검색합니다 (LLM 호출 없음).
+    반환: 검색 결과 dict 또는 None(벡터DB/검색 오류).
+    """
+    try:
+        vectordb = load_vectorstore()
+        plan = rag_planner.retrieve(vectordb, question, candidates,
+                                    thresholds=relevance_thresholds(), rerank=make_reranker(),
+                                    bm25_index=make_bm25_index(vectordb))
+    except Exception as e:
+        print(f"plan_retrieval error: {e}")
+        return None
+    print(f"plan_retrieval: decision={plan['decision']} queries={len(plan['queries'])} docs={len(plan['docs'])} best={plan['best']} ({plan['ms']}ms)")
+    return plan
+
+
+def ask_planned(question, candidates=None):
+    """
+    plan_retrieval로 검색하고 RRF로 합친 문서로 LLM을 한 번만 호출합니다.
+    반환: (답변 또는 None, 검색 결과 dict). 관련도 기준(rag_planner.MIN_QUERY_SIMILARITY)을 넘은
+    검색 결과가 없으면 LLM을 호출하지 않고 답변은 None입니다.
+    """
+    plan = plan_retrieval(question, candidates)
+    if plan is None:
+        return None, None
+    if plan['decision'] != 'rag':
+        # 관련도 기준을 넘은 검색 결과가 없으면 LLM 호출 없이 돌아갑니다 (호출한 쪽에서 gemini_answer 사용).
+        return None, plan
+    try:
+        context, source = format_docs(plan['docs'])
+        answer = make_answer_chain().invoke({"question": question, "context": context})
+        return add_source_to_answer({"answer": answer, "source": source}), plan
+    except Exception as e:
+        print(f"ask_planned answer error: {e}")
+        return None, plan
+
+
+def ask_with_fallback(topic_query, user_display_question=None):
+    # 후보 목록(또는 질문 하나)과 재매핑/키워드 쿼리를 한 번에 검색하고 LLM은 한 번만 호출합니다.
+    if isinstance(topic_query, (list, tuple)):
+        candidates = [c for c in topic_query if c]
+        question = user_display_question or (candidates[0] if candidates else "")
+    else:
+        candidates = []
+        question = topic_query
+        if user_display_question and user_display_question != topic_query:
+            candidates = [topic_query]
+            question = user_display_question
+
+    res, plan = ask_planned(question, candidates)
+    if plan and not res:
+        _debug_log({"method": "relevance_gate", "decision": plan['decision'], "scores": plan['scores'], "bm25_scores": plan.get('bm25_scores')})
+    if res:
+        method, candidate = plan['best'] or ("planned", question)
+        _debug_log({"method": method, "candidate": candidate, "similarity": plan['scores'].get(candidate), "queries": len(plan['queries']), "retrieval_ms": plan['ms']})
+        print(f"ask_with_fallback: {method} succeeded: {candidate}")
+        return res
+
+    # 최후 폴백: Gemini에게 원래(또는 표시용) 질문으로 물어본다
     if user_display_question:
         return gemini_answer(user_display_question)
-    return gemini_answer(topic_query)
+    return gemini_answer(question)
 
 
-def gemini_answer(question):
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        prompt = f"""
+GEMINI_ERROR_MESSAGE = "죄송해요, 지금은 답변을 드릴 수 없어요. 조금 뒤에 다시 시도해 주세요."
+# 답변을 보내는 도중 스트림이 끊겼을 때 뒤에 붙이는 안내 (이런 답변은 답변 캐시에 저장하지 않음)
+STREAM_INTERRUPTED_MESSAGE = "\n\n(답변을 만드는 중에 연결이 끊겼어요. 잠시 후 다시 질문해 주세요.)"
+
+
+def _gemini_prompt(question):
+    return f"""
         노인분들께 서비스하는 챗봇이니, 따뜻하고 친절한 존댓말로 답변해 주세요.
         사용자를 지칭하는 말은 빼고, 쉬운 말로 설명해 주세요.
         질문: {question}
         """
-        response = model.generate_content(prompt)
+
+
+def gemini_answer(question):
+    try:
+        model = genai.GenerativeModel(LLM_MODEL)
+        response = model.generate_content(_gemini_prompt(question))
         return response.text
     except:
-        return "죄송해요, 지금은 답변을 드릴 수 없어요. 조금 뒤에 다시 시도해 주세요."
+        return GEMINI_ERROR_MESSAGE
+
+
+def stream_gemini_answer(question, status=None):
+    """gemini_answer의 스트리밍 버전: 응답 조각을 도착하는 대로 내보냅니다.
+    끝까지 정상적으로 받았을 때만 status["completed"]를 True로 바꿉니다."""
+    sent = False
+    finished = False
+    try:
+        model = genai.GenerativeModel(LLM_MODEL)
+        for chunk in model.generate_content(_gemini_prompt(question), stream=True):
+            text = getattr(chunk, "text", "")
+            if text:
+                sent = True
+                yield text
+        finished = True
+    except Exception as e:
+        print(f"stream_gemini_answer error: {e}")
+    if not sent:
+        yield GEMINI_ERROR_MESSAGE
+        return
+    if not finished:
+        yield STREAM_INTERRUPTED_MESSAGE
+        return
+    if status is not None:
+        status["completed"] = True
+
+
+def stream_rag_answer(question, docs, status=None):
+    """검색된 문서로 답변을 토큰 단위로 생성하고 마지막에 출처를 붙입니다.
+    끝까지 정상적으로 생성했을 때만 status["completed"]를 True로 바꿉니다 (도중에 끊기면 출처 대신 안내문)."""
+    context, source = format_docs(docs)
+    sent = False
+    finished = False
+    try:
+        for token in make_answer_chain().stream({"question": question, "context": context}):
+            if token:
+                sent = True
+                yield token
+        finished = True
+    except Exception as e:
+        print(f"stream_rag_answer error: {e}")
+    if not sent:
+        # 답변 생성이 처음부터 실패하면 Gemini 직접 답변으로 대신합니다.
+        yield from stream_gemini_answer(question, status)
+        return
+    if not finished:
+        yield STREAM_INTERRUPTED_MESSAGE
+        return
+    yield source_suffix(source)
+    if status is not None:
+        status["completed"] = True
+
+
+@st.cache_data(ttl=FINGERPRINT_TTL_S, show_spinner=False)
+def current_collection_fingerprint():
+    """현재 Chroma 컬렉션 지문. 바뀌면 예전 지문으로 저장된 RAG 답변을 정리합니다."""
+    fingerprint = answer_cache.collection_fingerprint(load_vectorstore())
+    try:
+        answer_cache.get_answer_cache().purge(fingerprint)
+    except Exception as e:
+        print(f"answer_cache purge error: {e}")
+    return fingerprint
+
+
+def _cached_answer(user_label, mode):
+    """답변 캐시 조회. 반환: (답변 또는 None, 매치 종류, 컬렉션 지문, 질문 임베딩)."""
+    fingerprint, embed_fn = "", None
+    try:
+        if mode == "rag":
+            fingerprint = current_collection_fingerprint()
+            embed_fn = load_vectorstore().embeddings.embed_query
+        answer, match, embedding = answer_cache.get_answer_cache().lookup(user_label, mode, fingerprint, embed_fn)
+        return answer, match, fingerprint, embedding
+    except Exception as e:
+        print(f"answer_cache lookup error: {e}")
+        return None, None, fingerprint, None
+
+
+def stream_answer(user_label, mapped_q=None, use_gemini=False):
+    """
+    post_user_and_respond / 채팅 입력창의 답변을 토큰 단위로 내보내는 제너레이터입니다.
+    st.write_stream에 넘기면 첫 토큰부터 바로 화면에 표시됩니다.
+    - use_gemini: Gemini에게 바로 질문
+    - 그 외: plan_retrieval로 동시 검색 → 관련 문서가 있으면 RAG 답변, 없으면 Gemini 답변
+    같은(또는 거의 같은) 질문의 답변이 답변 캐시(answer_cache)에 있으면 검색/LLM 호출 없이 바로 내보냅니다.
+    """
+    if isinstance(mapped_q, (list, tuple)):
+        candidates = [c for c in mapped_q if c]
+    elif mapped_q:
+        candidates = [mapped_q]
+    else:
+        candidates = []
+
+    mode = "gemini" if use_gemini else "rag"
+    cached, match, fingerprint, embedding = _cached_answer(user_label, mode)
+    if cached is not None:
+        _debug_log({"user_label": user_label, "success_step": f"cache_{match}", "success_candidate": user_label})
+        print(f"stream_answer: user_label={user_label} success_step=cache_{match}")
+        yield cached
+        return
+
+    parts = []
+    status = {"completed": False}
+    if use_gemini:
+        # Gemini 직접 호출: 사용자 질문을 그대로 보냄
+        success_step, success_candidate = "gemini", user_label
+        stream = stream_gemini_answer(user_label, status)
+    else:
+        plan = plan_retrieval(user_label, candidates)
+        if plan and plan['decision'] == 'rag':
+            success_step, success_candidate = plan['best'] or ("planned", user_label)
+            _debug_log({"method": "planned", "scores": plan['scores'], "retrieval_ms": plan['ms']})
+            stream = stream_rag_answer(user_label, plan['docs'], status)
+        else:
+            # 관련 문서가 없으면 Gemini에게 직접 물어봅니다.
+            if plan:
+                _debug_log({"method": "relevance_gate", "decision": plan['decision'], "scores": plan['scores'], "bm25_scores": plan.get('bm25_scores')})
+            success_step, success_candidate = "gemini_fallback", user_label
+            stream = stream_gemini_answer(user_label, status)
+    for part in stream:
+        parts.append(part)
+        yield part
+
+    # 스트림이 끝까지 정상적으로 끝난 답변만 캐시에 저장합니다 (오류 안내문/도중에 끊긴 답변 제외).
+    answer = "".join(parts)
+    if answer and status["completed"]:
+        try:
+            answer_cache.get_answer_cache().put(user_label, answer, mode, fingerprint, embedding)
+        except Exception as e:
+            print(f"answer_cache put error: {e}")
+
+    # record debug trace for this request
+    _debug_log({"user_label": user_label, "success_step": success_step, "success_candidate": success_candidate})
+    print(f"stream_answer: user_label={user_label} success_step={success_step} success_candidate={success_candidate}")
 
 
 def post_user_and_respond(user_label, mapped_q, use_gemini=False):
-    # 사용자에게 보이는 질문 라벨을 채팅에 남깁니다.
+    # 사용자에게 보이는 질문 라벨을 채팅에 남기고, 답변은 다음 화면에서 respond_pending이 스트리밍으로 그립니다.
+    # (버튼은 팝오버 안에 있으므로 여기서 바로 그리면 채팅창이 아니라 팝오버에 표시됩니다.)
     if "messages" not in st.session_state:
         st.session_state.messages = []
     st.session_state.messages.append({"role": "user", "content": user_label})
+    st.session_state["pending_answer"] = {"user_label": user_label, "mapped_q": mapped_q, "use_gemini": use_gemini}
+
+
+def write_streamed_answer(container, user_label, mapped_q=None, use_gemini=False):
+    """container의 assistant 말풍선에 답변을 토큰 단위로 그리고, 완성된 답변을 채팅 기록에 추가합니다."""
     try:
-        with st.spinner("잠시만 기다려 주세요..."):
-            ans = None
-            success_step = None
-            success_candidate = None
-            if not use_gemini:
-                # 1) 우선 사용자가 본래 입력한 질문(라벨)으로 바로 벡터검색 시도
-                try:
-                    ans = ask_rag(user_label)
-                    if ans:
-                        success_step = "user_label"
-                        success_candidate = user_label
-                except Exception:
-                    ans = None
-
-                # Prepare candidates: allow mapped_q to be a string or list
-                if isinstance(mapped_q, (list, tuple)):
-                    candidates = [c for c in mapped_q if c]
-                elif mapped_q:
-                    candidates = [mapped_q]
-                else:
-                    candidates = []
-
-                # 2) 결합 쿼리: 문서 키 + 원문 질문 (검색 성능 향상을 위해) -> try each candidate
-                if not ans and candidates:
-                    for c in candidates:
-                        try:
-                            combined = f"{c} {user_label}"
-                            ans = ask_rag(combined)
-                            if ans:
-                                success_step = "combined"
-                                success_candidate = c
-                                break
-                        except Exception:
-                            ans = None
-
-                # 3) 그 다음 문서-친화적 키로 검색 (각 후보 순차)
-                if not ans and candidates:
-                    for c in candidates:
-                        try:
-                            ans = ask_rag(c)
-                            if ans:
-                                success_step = "candidate"
-                                success_candidate = c
-                                break
-                        except Exception:
-                            ans = None
-
-                # 4) 그래도 없으면 기존의 폴백 로직(ask_with_fallback)을 사용 (ask_with_fallback는 리스트 대응됨)
-                if not ans:
-                    # ask_with_fallback will also log internally; record that we reached fallback
-                    try:
-                        if "debug_logs" not in st.session_state:
-                            st.session_state["debug_logs"] = []
-                        st.session_state["debug_logs"].append({"method": "pre_ask_with_fallback", "candidates": candidates or [user_label]})
-                    except Exception:
-                        pass
-                    ans = ask_with_fallback(candidates or user_label, user_label)
-                    success_step = success_step or "ask_with_fallback"
-                    success_candidate = success_candidate or (candidates[0] if candidates else user_label)
-            else:
-                # Gemini 직접 호출: 사용자 질문을 그대로 보냄
-                ans = gemini_answer(user_label)
-                success_step = "gemini"
-                success_candidate = user_label
-        # record debug trace for this request
-        try:
-            if "debug_logs" not in st.session_state:
-                st.session_state["debug_logs"] = []
-            st.session_state["debug_logs"].append({"user_label": user_label, "success_step": success_step, "success_candidate": success_candidate})
-        except Exception:
-            pass
-        print(f"post_user_and_respond: user_label={user_label} success_step={success_step} success_candidate={success_candidate}")
-        st.session_state.messages.append({"role": "assistant", "content": ans})
+        with container:
+            with st.chat_message("assistant"):
+                answer = st.write_stream(stream_answer(user_label, mapped_q, use_gemini))
+        if not isinstance(answer, str):
+            answer = "".join(str(part) for part in answer)
     except Exception as e:
-        st.session_state.messages.append({"role": "assistant", "content": "죄송해요, 답변 생성 중 오류가 발생했습니다."})
+        print(f"write_streamed_answer error: {e}")
+        answer = "죄송해요, 답변 생성 중 오류가 발생했습니다."
+        with container:
+            with st.chat_message("assistant"):
+                st.markdown(answer)
+    if "messages" not in st.session_state:
+        st.session_state.messages = []
+    st.session_state.messages.append({"role": "assistant", "content": answer})
+    return answer
+
+
+def respond_pending(container):
+    """post_user_and_respond가 남긴 질문이 있으면 답변을 스트리밍으로 그립니다."""
+    pending = st.session_state.pop("pending_answer", None)
+    if pending:
+        write_streamed_answer(container, pending["user_label"], pending["mapped_q"], pending["use_gemini"])
 
 
 def render_example_popover(post_user_and_respond, health_institutions, calculate_bmi, get_bmi_category, get_health_tip):
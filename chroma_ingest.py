@@ -0,0 +1,193 @@
+import argparse
+import glob
+import hashlib
+import os
+import time
+
+import pandas as pd
+
+from pdf_text_cache import extract_pdf_pages
+
+
+# data/ 아래의 PDF와 CSV로 챗봇용 Chroma 컬렉션을 만드는 인덱스 빌더입니다.
+# 이전에는 chroma_db를 Colab에서 따로 만들어 복사했기 때문에 같은 결과를 다시 만들 수 없었습니다.
+#   python chroma_ingest.py                      # google 임베딩 -> ./chroma_db 'langchain' 컬렉션
+#   python chroma_ingest.py --backend local      # 로컬 임베딩 -> local_rag.LOCAL_CHROMA_DIR
+#   python chroma_ingest.py --dry-run            # 추출/청크만 하고 무엇이 바뀌는지 출력
+# - PDF 페이지 텍스트는 pdf_text_cache에서 읽고, 캐시에 없는 페이지만 여러 프로세스로 나눠 추출합니다.
+# - 청크 id는 (출처, 페이지, 본문)의 해시이므로 다시 실행하면 바뀐 청크만 임베딩/업서트하고,
+#   같은 출처의 사라진 청크(예전에 Colab에서 만든 청크 포함)는 삭제합니다.
+# - 문서 임베딩도 embedding_cache에 저장되므로 --rebuild 해도 같은 본문은 다시 원격 호출하지 않습니다.
+
+DATA_DIR = 'data'
+PDF_GLOB = os.path.join(DATA_DIR, '*.pdf')
+# (경로, 인코딩, 구분자, 제외할 컬럼) — 한 행을 '컬럼: 값 / ...' 한 줄로 만들어 CHUNK_SIZE 단위로 묶습니다.
+CSV_SOURCES = [
+    (os.path.join(DATA_DIR, 'incheon senior welfare facility final.csv'), 'euc-kr', ',', ['lat', 'lon']),
+    (os.path.join(DATA_DIR, 'incheon health institutions.csv'), 'cp949', '\t', []),
+]
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+EMBED_BATCH = 100
+INGEST_MARKER = 'chroma_ingest'
+
+
+# ---------------------------------------------------------------------- 청크
+def chunk_id(source, page, text):
+    """청크 내용 해시 (같은 출처/페이지/본문이면 항상 같은 id)."""
+    h = hashlib.sha1()
+    for part in (source, str(page), text):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def _splitter(chunk_size, chunk_overlap):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def pdf_chunks(pages, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """{경로: [(페이지, 텍스트)]} -> [(id, 본문, 메타데이터)]. 청크는 페이지 경계를 넘지 않습니다."""
+    splitter = _splitter(chunk_size, chunk_overlap)
+    chunks = []
+    for path, page_texts in pages.items():
+        source = path.replace(os.sep, '/')
+        total = len(page_texts)
+        for page, text in page_texts:
+            for piece in splitter.split_text(text.strip()):
+                meta = {'source': source, 'page': page, 'page_label': str(page + 1), 'total_pages': total,
+                        'kind': 'pdf', 'ingested_by': INGEST_MARKER}
+                chunks.append((chunk_id(source, page, piece), piece, meta))
+    return chunks
+
+
+def csv_chunks(sources=CSV_SOURCES, chunk_size=CHUNK_SIZE):
+    """CSV 행을 '컬럼: 값 / ...' 줄로 만들고 chunk_size 글자 이내로 묶어 [(id, 본문, 메타데이터)]를 반환합니다."""
+    chunks = []
+    for path, encoding, sep, drop_cols in sources:
+        if not os.path.exists(path):
+            print(f'chroma_ingest: 파일이 없습니다: {path}')
+            continue
+        df = pd.read_csv(path, dtype=str, encoding=encoding, sep=sep)
+        df = df.drop(columns=[c for c in drop_cols if c in df.columns])
+        source = path.replace(os.sep, '/')
+        lines, start, size = [], 0, 0
+        rows = df.to_dict('records')
+
+        def flush(end):
+            body = '\n'.join(lines)
+            meta = {'source': source, 'page': start, 'rows': f'{start}-{end - 1}', 'kind': 'csv', 'ingested_by': INGEST_MARKER}
+            chunks.append((chunk_id(source, start, body), body, meta))
+
+        for i, row in enumerate(rows):
+            line = ' / '.join(f'{k}: {v}' for k, v in row.items() if isinstance(v, str) and v.strip())
+            if lines and size + len(line) + 1 > chunk_size:
+                flush(i)
+                lines, start, size = [], i, 0
+            lines.append(line)
+            size += len(line) + 1
+        if lines:
+            flush(len(rows))
+    return chunks
+
+
+# ---------------------------------------------------------------------- 업서트
+def sync_collection(collection, chunks, embeddings, batch=EMBED_BATCH, dry_run=False, prune=False):
+    """chunks를 컬렉션에 반영합니다. 반환: {'total', 'unchanged', 'added', 'deleted'}.
+
+    - 이미 있는 id(같은 본문)는 건너뛰고 새 청크만 임베딩해서 upsert
+    - 이번 실행의 출처와 파일명이 같은데 id가 없어진 청크는 삭제 (Colab에서 만든 예전 청크 포함)
+    - prune=True이면 이 빌더가 넣은 청크 중 더 이상 없는 출처의 청크도 삭제
+    """
+    new_ids = {cid for cid, _, _ in chunks}
+    current_names = {os.path.basename(meta['source']) for _, _, meta in chunks}
+    existing = collection.get(include=['metadatas'])
+    existing_ids = set(existing['ids'])
+    stale = []
+    for cid, meta in zip(existing['ids'], existing['metadatas']):
+        if cid in new_ids:
+            continue
+        meta = meta or {}
+        if os.path.basename(str(meta.get('source', ''))) in current_names:
+            stale.append(cid)
+        elif prune and meta.get('ingested_by') == INGEST_MARKER:
+            stale.append(cid)
+
+    todo, seen = [], set()
+    for cid, text, meta in chunks:
+        if cid in existing_ids or cid in seen:
+            continue
+        seen.add(cid)
+        todo.append((cid, text, meta))
+    stats = {'total': len(new_ids), 'unchanged': len(new_ids & existing_ids), 'added': len(todo), 'deleted': len(stale)}
+    if dry_run:
+        return stats
+
+    for i in range(0, len(todo), batch):
+        part = todo[i:i + batch]
+        texts = [t for _, t, _ in part]
+        collection.upsert(
+            ids=[c for c, _, _ in part],
+            documents=texts,
+            metadatas=[m for _, _, m in part],
+            embeddings=embeddings.embed_documents(texts),
+        )
+        print(f'  업서트 {min(i + batch, len(todo))}/{len(todo)}')
+    for i in range(0, len(stale), 500):
+        collection.delete(ids=stale[i:i + 500])
+    return stats
+
+
+def main():
+    from chatbot_hr_define import CHROMA_DIR, make_embeddings
+    import chromadb
+    import local_rag
+
+    parser = argparse.ArgumentParser(description='data/의 PDF와 CSV로 Chroma 컬렉션 생성/갱신')
+    parser.add_argument('--backend', choices=['google', 'local'], default='google', help='임베딩 백엔드')
+    parser.add_argument('--persist-dir', help='Chroma 폴더 (기본: google=./chroma_db, local=cache/chroma_local)')
+    parser.add_argument('--collection', help="컬렉션 이름 (기본: google='langchain', local='langchain_local')")
+    parser.add_argument('--pdfs', nargs='*', help=f'PDF 목록 (기본: {PDF_GLOB})')
+    parser.add_argument('--no-csv', action='store_true', help='CSV는 넣지 않음')
+    parser.add_argument('--workers', type=int, default=None, help='PDF 추출 프로세스 수')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--chunk-overlap', type=int, default=CHUNK_OVERLAP)
+    parser.add_argument('--rebuild', action='store_true', help='컬렉션을 지우고 처음부터 생성')
+    parser.add_argument('--prune', action='store_true', help='더 이상 없는 출처의 청크도 삭제')
+    parser.add_argument('--dry-run', action='store_true', help='변경 사항만 출력')
+    args = parser.parse_args()
+
+    persist_dir = args.persist_dir or (CHROMA_DIR if args.backend == 'google' else local_rag.LOCAL_CHROMA_DIR)
+    collection_name = args.collection or (local_rag.SOURCE_COLLECTION if args.backend == 'google' else local_rag.LOCAL_COLLECTION)
+    pdfs = args.pdfs if args.pdfs is not None else sorted(glob.glob(PDF_GLOB))
+
+    t0 = time.perf_counter()
+    pages = extract_pdf_pages(pdfs, args.workers)
+    n_pages = sum(len(p) for p in pages.values())
+    print(f'PDF {len(pdfs)}개 {n_pages}쪽 추출: {time.perf_counter() - t0:.1f}s')
+
+    chunks = pdf_chunks(pages, args.chunk_size, args.chunk_overlap)
+    if not args.no_csv:
+        chunks += csv_chunks(chunk_size=args.chunk_size)
+    print(f'청크 {len(chunks)}개')
+
+    client = chromadb.PersistentClient(path=persist_dir)
+    if args.rebuild and not args.dry_run:
+        try:
+            client.delete_collection(collection_name)
+        except Exception:
+            pass
+    # 임베딩이 길이 1로 정규화되어 있으므로 l2 공간 (rag_planner.distance_to_similarity)
+    collection = client.get_or_create_collection(collection_name, metadata={'hnsw:space': 'l2'})
+
+    t1 = time.perf_counter()
+    stats = sync_collection(collection, chunks, make_embeddings(args.backend), dry_run=args.dry_run, prune=args.prune)
+    action = '변경 예정' if args.dry_run else '반영'
+    print(f"{persist_dir} '{collection_name}': 전체 {stats['total']} / 그대로 {stats['unchanged']} / "
+          f"추가 {stats['added']} / 삭제 {stats['deleted']} {action} ({time.perf_counter() - t1:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
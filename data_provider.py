@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+
+import pandas as pd
+
+
+# 페이지 모듈들이 import될 때 읽던 CSV를 한곳에 모은 지연 로딩 데이터 제공자입니다.
+# - get_data(name): 처음 요청될 때 한 번만 읽고 프로세스 전역에 보관합니다(세션 간 공유).
+# - preload_in_background(): 첫 화면을 그린 뒤 백그라운드 스레드에서 미리 읽어 두어
+#   지도/챗봇 페이지로 처음 이동할 때 기다리지 않게 합니다.
+# 모듈 import에는 파일 읽기나 st.secrets 접근이 없으므로 Streamlit 밖(벤치마크, 스크립트)에서도 import할 수 있습니다.
+# 반환된 DataFrame은 여러 세션이 함께 쓰므로 수정하지 말고 필요하면 .copy()해서 사용합니다.
+
+
+def _read_csv(path, **kwargs):
+    """CSV를 읽습니다. 파일이 없으면 빈 DataFrame을 반환합니다."""
+    if not os.path.exists(path):
+        print(f'data_provider: 파일이 없습니다: {path}')
+        return pd.DataFrame()
+    return pd.read_csv(path, **kwargs)
+
+
+def _load_bus_route_names():
+    """노선ID -> 노선명 매핑 (버스 도착 정보 표시용)."""
+    route_df = _read_csv(os.path.join('data', 'incheon bus route.csv'), dtype=str, encoding='euc-kr')
+    if route_df.empty:
+        return {}
+    return dict(zip(route_df['노선아이디'].str.strip(), route_df['노선명'].str.strip()))
+
+
+# 이름 -> 로더
+LOADERS = {
+    'facilities': lambda: _read_csv(os.path.join('data', 'incheon senior welfare facility.csv'), dtype=str, encoding='euc-kr'),
+    'facilities_final': lambda: _read_csv(os.path.join('data', 'incheon senior welfare facility final.csv'), dtype=str, encoding='euc-kr'),
+    'bus_stops': lambda: _read_csv(os.path.join('data', 'bus stop.csv')),
+    'bus_route_names': _load_bus_route_names,
+    'restaurants': lambda: _read_csv(os.path.join('data', 'restaurant category.csv'), dtype=str, encoding='euc-kr'),
+    'leisure': lambda: _read_csv(os.path.join('data', 'leisure location.csv'), dtype=str, encoding='CP949'),
+    'health_institutions': lambda: _read_csv(os.path.join('data', 'incheon health institutions.csv'), dtype=str, encoding='cp949', sep='\t'),
+}
+
+# 첫 화면 이후 미리 읽어 둘 데이터 (지도 페이지에서 쓰는 순서대로)
+PRELOAD_ORDER = ['facilities_final', 'facilities', 'restaurants', 'leisure', 'bus_stops', 'bus_route_names', 'health_institutions']
+
+
+class DataProvider:
+    def __init__(self, loaders):
+        self._loaders = dict(loaders)
+        self._values = {}
+        self._load_ms = {}
+        self._locks = {name: threading.Lock() for name in self._loaders}
+        self._preload_thread = None
+        self._preload_lock = threading.Lock()
+
+    def get(self, name):
+        """name의 데이터를 반환합니다. 같은 데이터를 여러 스레드가 동시에 요청해도 한 번만 읽습니다."""
+        if name in self._values:
+            return self._values[name]
+        with self._locks[name]:
+            if name not in self._values:
+                t0 = time.perf_counter()
+                self._values[name] = self._loaders[name]()
+                self._load_ms[name] = round((time.perf_counter() - t0) * 1000, 1)
+        return self._values[name]
+
+    def is_loaded(self, name):
+        return name in self._values
+
+    def load_times(self):
+        """이름 -> 읽는 데 걸린 시간(ms)."""
+        return dict(self._load_ms)
+
+    def preload_in_background(self, names=None):
+        """names(기본: PRELOAD_ORDER)를 백그라운드 스레드에서 미리 읽습니다. 이미 진행 중이면 아무것도 하지 않습니다."""
+        names = list(names or PRELOAD_ORDER)
+        with self._preload_lock:
+            if self._preload_thread is not None:
+                return
+            if all(self.is_loaded(n) for n in names):
+                return
+
+            def _run():
+                for name in names:
+                    try:
+                        self.get(name)
+                    except Exception as e:
+                        print(f'data_provider preload error: {name} {e}')
+
+            self._preload_thread = threading.Thread(target=_run, name='data-preload', daemon=True)
+            self._preload_thread.start()
+
+
+_DATA_PROVIDER = DataProvider(LOADERS)
+
+
+def get_data_provider():
+    return _DATA_PROVIDER
+
+
+def get_data(name):
+    return _DATA_PROVIDER.get(name)
+
+
+def preload_in_background(names=None):
+    _DATA_PROVIDER.preload_in_background(names)
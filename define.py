@@ -1,6 +1,5 @@
 import numpy as np
 import pandas as pd
-import folium
 from streamlit.components.v1 import html as st_html
 import streamlit as st
 import math
@@ -13,17 +12,29 @@ import xml.etree.ElementTree as ET
 GRAPH_CACHE_PATH = './incheon_graph.pkl'
 
 import os
-import pickle
 
-try:
-    import osmnx as ox
-    import networkx as nx
-    _OSM = True
-except Exception:
-    _OSM = False
+# osmnx/networkx는 import만 1초 이상 걸리므로 도로 그래프가 실제로 있을 때 처음 필요한 순간에 불러옵니다.
+_OSM_MODULES = None
+
+
+def _osm_modules():
+    """(osmnx, networkx) 모듈을 반환합니다. 설치되어 있지 않으면 (None, None)."""
+    global _OSM_MODULES
+    if _OSM_MODULES is None:
+        try:
+            import osmnx as ox
+            import networkx as nx
+            _OSM_MODULES = (ox, nx)
+        except Exception:
+            _OSM_MODULES = (None, None)
+    return _OSM_MODULES
+
 
 import base64
 
+from route_cache import ROUTE_SIMPLIFY_TOLERANCE_M, load_graph, graph_key, get_route_cache, simplify, encode_polyline, decode_polyline
+
+
 def set_sidebar_background(image_path):
     # 로컬 이미지 파일을 base64로 읽기
     with open(image_path, "rb") as f:
@@ -109,11 +120,11 @@ def find_nearest_facilities(user_location, facilities_df: pd.DataFrame, return_c
 
     # 도로 기반 거리 계산 시도 (캐시된 그래프가 있으면 사용)
     road_results = None
-    if _OSM:
+    G = load_graph(graph_cache_path)
+    ox, nx = _osm_modules() if G is not None else (None, None)
+    if ox is not None:
         try:
-            if os.path.exists(graph_cache_path):
-                with open(graph_cache_path, 'rb') as fh:
-                    G = pickle.load(fh)
+            if G is not None:
                 # 사용자와 후보 정류소에 대한 최단거리 노드를 찾음
                 user_node = ox.nearest_nodes(G, ulon, ulat)
                 cand_nodes = ox.nearest_nodes(G, candidates[lon_col].tolist(), candidates[lat_col].tolist())
@@ -142,75 +153,114 @@ def find_nearest_facilities(user_location, facilities_df: pd.DataFrame, return_c
     return road_results_sorted.head(return_count if return_count is not None else len(road_results_sorted))
 
 
+def _escape_popup_text(text):
+    """'<br>'로 나뉜 각 줄을 HTML 이스케이프하고 줄바꿈을 '<br>'로 바꿉니다."""
+    s = str(text)
+    if '<br>' in s:
+        parts = s.split('<br>')
+        return '<br>'.join(escape(p) for p in parts)
+    return escape(s).replace('\n', '<br>')
+
+
+def popup_html(text, width=240):
+    """팝업 본문 HTML(div)을 반환합니다. make_popup과 map_layers의 GeoJSON 팝업이 함께 사용합니다."""
+    escaped = _escape_popup_text(text)
+    return f"""<div style='max-width:{width}px; white-space:normal; word-wrap:break-word; font-size:13px; line-height:1.2;'>{escaped}</div>"""
+
+
 def make_popup(text, width=240):
     """HTML 이스케이프와 간단한 줄바꿈을 적용한 Folium 팝업을 생성합니다.
 
     반환값: 지도에 추가할 수 있는 folium.Popup 객체
     """
-    s = str(text)
-    if '<br>' in s:
-        parts = s.split('<br>')
-        escaped = '<br>'.join(escape(p) for p in parts)
-    else:
-        escaped = escape(s).replace('\n', '<br>')
-    html = f"""<div style='max-width:{width}px; white-space:normal; word-wrap:break-word; font-size:13px; line-height:1.2;'>{escaped}</div>"""
+    escaped = _escape_popup_text(text)
+    html = popup_html(text, width)
     height = 50 + max(0, (len(escaped) - width) // 3)
+    import folium  # 지도 페이지에서만 필요하므로 처음 사용할 때 import
+
     return folium.Popup(folium.IFrame(html=html, width=width+20, height=height), max_width=width+20)
 
 
-def draw_route_on_map(fmap, ulat, ulon, target_lat, target_lon, graph_cache_path: str = GRAPH_CACHE_PATH):
-    """캐시된 osmnx 그래프를 사용해 도로 기반 경로를 지도에 그리려고 시도합니다.
+def _route_path_coords(G, route):
+    """노드 경로를 (lat, lon) 좌표 리스트로 바꿉니다."""
+    # 먼저 노드 좌표를 사용해 시도
+    try:
+        return [(float(G.nodes[n]['y']), float(G.nodes[n]['x'])) for n in route]
+    except Exception:
+        # 에지(간선) 지오메트리가 있으면 이를 사용해 대체
+        edge_geoms = []
+        for u, v in zip(route[:-1], route[1:]):
+            data = G.get_edge_data(u, v)
+            if data is None:
+                continue
+            first = next(iter(data.values()))
+            geom = first.get('geometry')
+            if geom is not None:
+                try:
+                    pts = [(pt[1], pt[0]) for pt in geom.coords]
+                    edge_geoms.extend(pts)
+                except Exception:
+                    pass
+        return edge_geoms
 
-    osmnx 또는 그래프가 없거나 라우팅에 실패하면 사용자-목표를 직선으로 연결합니다.
-    반환값: 도로 기반 경로를 성공적으로 그렸으면 True, 그렇지 않으면 False
+
+def compute_route_coords(ulat, ulon, target_lat, target_lon, graph_cache_path: str = GRAPH_CACHE_PATH,
+                         tolerance_m: float = ROUTE_SIMPLIFY_TOLERANCE_M):
+    """캐시된 osmnx 그래프로 사용자->목표 도로 경로 좌표를 계산합니다.
+
+    반환값: ([(lat, lon), ...], is_road)
+    경로는 (출발 노드, 도착 노드, tolerance_m)별로 route_cache에 단순화/인코딩되어 저장되므로
+    같은 경로는 최단 경로를 다시 찾지 않습니다.
+    osmnx 또는 그래프가 없거나 라우팅에 실패하면 두 점을 잇는 직선 좌표와 False를 반환합니다.
     """
-    # osmnx가 설치되어 있으면 이를 우선 사용
-    if _OSM:
+    # 그래프가 있고 osmnx가 설치되어 있으면 이를 우선 사용
+    G = load_graph(graph_cache_path)
+    ox, nx = _osm_modules() if G is not None else (None, None)
+    if ox is not None:
         try:
-            G = None
-            if os.path.exists(graph_cache_path):
-                with open(graph_cache_path, 'rb') as fh:
-                    G = pickle.load(fh)
             if G is not None:
                 try:
                     user_node = ox.nearest_nodes(G, ulon, ulat)
                     target_node = ox.nearest_nodes(G, target_lon, target_lat)
+                    key = (graph_key(graph_cache_path), user_node, target_node, float(tolerance_m))
+                    cache = get_route_cache()
+                    entry = cache.get(key)
+                    if entry is not None:
+                        return decode_polyline(entry[0]), True
                     route = nx.shortest_path(G, user_node, target_node, weight='length')
-                    # 먼저 노드 좌표를 사용해 시도
-                    try:
-                        coords = [(float(G.nodes[n]['y']), float(G.nodes[n]['x'])) for n in route]
-                        folium.PolyLine(locations=coords, color='green', weight=4, opacity=0.8).add_to(fmap)
-                        return True
-                    except Exception:
-                        # 에지(간선) 지오메트리가 있으면 이를 사용해 대체
-                        edge_geoms = []
-                        for u, v in zip(route[:-1], route[1:]):
-                            data = G.get_edge_data(u, v)
-                            if data is None:
-                                continue
-                            first = next(iter(data.values()))
-                            geom = first.get('geometry')
-                            if geom is not None:
-                                try:
-                                    pts = [(pt[1], pt[0]) for pt in geom.coords]
-                                    edge_geoms.extend(pts)
-                                except Exception:
-                                    pass
-                        if edge_geoms:
-                            folium.PolyLine(locations=edge_geoms, color='green', weight=4, opacity=0.8).add_to(fmap)
-                            return True
+                    coords = _route_path_coords(G, route)
+                    if coords:
+                        encoded = encode_polyline(simplify(coords, tolerance_m))
+                        cache.put(key, encoded, len(coords))
+                        return decode_polyline(encoded), True
                 except Exception:
                     # 라우팅에 실패함
                     pass
         except Exception:
             pass
 
-    # 대체: 직선으로 표시
+    # 대체: 직선
+    return [(float(ulat), float(ulon)), (float(target_lat), float(target_lon))], False
+
+
+def draw_route_on_map(fmap, ulat, ulon, target_lat, target_lon, graph_cache_path: str = GRAPH_CACHE_PATH, route=None):
+    """캐시된 osmnx 그래프를 사용해 도로 기반 경로를 지도에 그리려고 시도합니다.
+
+    osmnx 또는 그래프가 없거나 라우팅에 실패하면 사용자-목표를 직선으로 연결합니다.
+    route에 compute_route_coords의 결과를 넘기면 경로를 다시 계산하지 않습니다.
+    반환값: 도로 기반 경로를 성공적으로 그렸으면 True, 그렇지 않으면 False
+    """
+    import folium  # 지도 페이지에서만 필요하므로 처음 사용할 때 import
+
+    coords, is_road = route if route is not None else compute_route_coords(ulat, ulon, target_lat, target_lon, graph_cache_path)
     try:
-        folium.PolyLine(locations=[[ulat, ulon], [target_lat, target_lon]], color='green').add_to(fmap)
+        if is_road:
+            folium.PolyLine(locations=coords, color='green', weight=4, opacity=0.8).add_to(fmap)
+        else:
+            folium.PolyLine(locations=coords, color='green').add_to(fmap)
     except Exception:
         return False
-    return False
+    return is_road
 
 
 def _find_lat_lon_cols(df):
@@ -249,28 +299,16 @@ ALLOWED_FILES = [
 ]
 
 
-def extract_text_from_pdf(path: str) -> str:
-    """PDF에서 텍스트를 추출합니다. pypdf 우선, 실패하면 빈 문자열 반환."""
-    try:
-        from pypdf import PdfReader
-    except Exception:
-        try:
-            import PyPDF2
-            PdfReader = PyPDF2.PdfReader
-        except Exception:
-            return ''
+def _join_pages(page_texts):
+    return '\n\n'.join(t for _, t in page_texts if t)
+
 
+def extract_text_from_pdf(path: str) -> str:
+    """PDF에서 텍스트를 추출합니다. 페이지 텍스트는 pdf_text_cache에 저장되어 두 번째부터는 캐시에서 읽습니다.
+    실패하면 빈 문자열 반환."""
     try:
-        reader = PdfReader(path)
-        parts = []
-        for p in reader.pages:
-            try:
-                t = p.extract_text() or ''
-            except Exception:
-                t = ''
-            if t:
-                parts.append(t)
-        return '\n\n'.join(parts)
+        from pdf_text_cache import extract_pdf_pages
+        return _join_pages(extract_pdf_pages([path])[path])
     except Exception:
         return ''
 
@@ -282,13 +320,23 @@ def load_allowed_corpus(data_dir: str = './data'):
     """
     out = []
     base = os.path.abspath(data_dir)
+    # PDF는 한 번에 넘겨서 캐시에 없는 페이지만 프로세스 풀에서 함께 추출합니다.
+    pdf_paths = [os.path.join(base, f) for f in ALLOWED_FILES
+                 if f.lower().endswith('.pdf') and os.path.exists(os.path.join(base, f))]
+    pdf_pages = {}
+    if pdf_paths:
+        try:
+            from pdf_text_cache import extract_pdf_pages
+            pdf_pages = extract_pdf_pages(pdf_paths)
+        except Exception as e:
+            print(f'load_allowed_corpus: PDF 추출 실패: {e}')
     for fname in ALLOWED_FILES:
         fpath = os.path.join(base, fname)
         if not os.path.exists(fpath):
             continue
         lower = fname.lower()
         if lower.endswith('.pdf'):
-            txt = extract_text_from_pdf(fpath)
+            txt = _join_pages(pdf_pages.get(fpath, []))
             if txt:
                 out.append({'source': fname, 'text': txt})
         elif lower.endswith('.csv'):
@@ -306,36 +354,56 @@ def load_allowed_corpus(data_dir: str = './data'):
     return out
 
 
+def corpus_signature(data_dir: str = './data'):
+    """ALLOWED_FILES의 (파일명, 크기, 수정 시각) 목록. 저장된 TF-IDF 색인이 지금 자료로 만든 것인지 비교하는 데 씁니다."""
+    base = os.path.abspath(data_dir)
+    sig = []
+    for fname in ALLOWED_FILES:
+        fpath = os.path.join(base, fname)
+        if os.path.exists(fpath):
+            stat = os.stat(fpath)
+            sig.append([fname, stat.st_size, int(stat.st_mtime)])
+    return sig
+
+
 def build_tfidf_index(docs: list):
-    """문서 리스트({'text','source'})로 TF-IDF 벡터화된 인덱스를 반환합니다.
+    """문서 리스트({'text','source'})를 문단으로 나눠 한국어 글자 n-gram TF-IDF 색인(passage_index.PassageIndex)을 만듭니다."""
+    import passage_index
+    return passage_index.PassageIndex.build(passage_index.split_passages(docs))
+
 
-    반환: {'vectorizer': vec, 'matrix': mat, 'docs': docs}
+def load_tfidf_index(data_dir: str = './data', index_dir: str = None):
+    """저장된 문단 TF-IDF 색인을 mmap으로 엽니다. 없거나 자료가 바뀌었으면 새로 만들어 저장합니다.
+
+    허용된 자료가 하나도 없으면 None을 반환합니다.
     """
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    texts = [d.get('text', '') for d in docs]
-    vec = TfidfVectorizer(stop_words='english')
+    import passage_index
+    index_dir = index_dir or passage_index.INDEX_DIR
+    sig = corpus_signature(data_dir)
+    if not sig:
+        return None
+    meta = passage_index.read_meta(index_dir)
+    if meta and meta.get('version') == passage_index.INDEX_VERSION and meta.get('corpus') == sig:
+        try:
+            return passage_index.PassageIndex.load(index_dir)
+        except Exception as e:
+            print(f'load_tfidf_index: 저장된 색인을 열지 못해 새로 만듭니다: {e}')
+    docs = load_allowed_corpus(data_dir)
+    if not docs:
+        return None
+    index = build_tfidf_index(docs)
+    index.meta = {'corpus': sig}
     try:
-        mat = vec.fit_transform(texts)
-    except Exception:
-        # 매우 큰 텍스트에서 메모리 오류가 날 수 있으므로 부분 텍스트로 처리
-        short_texts = [t[:10000] for t in texts]
-        mat = vec.fit_transform(short_texts)
-    return {'type': 'tfidf', 'vectorizer': vec, 'matrix': mat, 'docs': docs}
+        index.save(index_dir)
+        return passage_index.PassageIndex.load(index_dir)
+    except Exception as e:
+        print(f'load_tfidf_index: 색인 저장 실패 (메모리 색인 사용): {e}')
+        return index
 
 
 def retrieve_tfidf_contexts(index, query: str, top_k: int = 3):
-    """TF-IDF 인덱스에서 상위 top_k 문서를 검색하여 (text, source) 리스트 반환."""
-    from sklearn.metrics.pairwise import cosine_similarity
-    vec = index['vectorizer']
-    mat = index['matrix']
-    docs = index['docs']
-    qv = vec.transform([query])
-    sims = cosine_similarity(qv, mat).flatten()
-    idxs = sims.argsort()[::-1][:top_k]
-    out = []
-    for i in idxs:
-        out.append({'text': docs[i].get('text', ''), 'source': docs[i].get('source', '')})
-    return out
+    """TF-IDF 색인에서 질문과 가장 비슷한 문단 top_k개를 [{'text', 'source', 'chunk', 'score'}]로 반환합니다."""
+    return index.search(query, top_k)
 
 
 def build_system_prompt():
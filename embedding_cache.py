@@ -0,0 +1,169 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+# 질문 임베딩 캐시입니다 (load_vectorstore의 GoogleGenerativeAIEmbeddings 앞에 둡니다).
+# 검색 계획기(rag_planner)의 쿼리 변형, 답변 캐시(answer_cache)의 유사 질문 조회, 다른 사용자의 같은 질문이
+# 매번 같은 문자열을 원격으로 임베딩하던 것을 한 번만 계산하도록 합니다.
+# - 키: sha1(모델, 종류('query' / 'document'), 텍스트) -> 같은 내용이면 어디서 요청해도 같은 키
+# - 프로세스 메모리 LRU(MAX_MEMORY_ENTRIES) + SQLite 파일(cache/embeddings.sqlite3)에 float32로 저장
+# - LocalHashEmbeddings: 네트워크 없이 같은 입력에 항상 같은 벡터를 주는 대체 임베딩 (오프라인 테스트용)
+#   Chroma에 저장된 Google 임베딩과는 공간이 다르므로 실제 검색 품질 확인에는 쓰지 마세요.
+
+EMBEDDING_DB_PATH = os.path.join('cache', 'embeddings.sqlite3')
+MAX_MEMORY_ENTRIES = 4096
+LOCAL_EMBEDDING_SIZE = 768
+
+
+def embedding_key(model, kind, text):
+    h = hashlib.sha1()
+    for part in (str(model), kind, text):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """다른 Embeddings 객체를 감싸 결과를 메모리 LRU + SQLite에 저장합니다."""
+
+    def __init__(self, inner, db_path=EMBEDDING_DB_PATH, max_memory_entries=MAX_MEMORY_ENTRIES, model_name=None):
+        self.inner = inner
+        self.model_name = model_name or getattr(inner, 'model', None) or type(inner).__name__
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()     # key -> list[float]
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._conn = None
+        if db_path:
+            parent = os.path.dirname(db_path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+            with self._lock:
+                self._conn.execute('PRAGMA journal_mode=WAL')
+                self._conn.execute(
+                    'CREATE TABLE IF NOT EXISTS embeddings ('
+                    ' key TEXT PRIMARY KEY,'
+                    ' model TEXT NOT NULL,'
+                    ' vector BLOB NOT NULL)'
+                )
+                self._conn.commit()
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys):
+        """keys 중 캐시에 있는 것을 {key: vector}로 반환합니다."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                    self.memory_hits += 1
+            missing = [k for k in keys if k not in found]
+            if missing and self._conn is not None:
+                for i in range(0, len(missing), 500):
+                    chunk = missing[i:i + 500]
+                    rows = self._conn.execute(
+                        f'SELECT key, vector FROM embeddings WHERE key IN ({",".join("?" * len(chunk))})', chunk
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                        found[key] = vector
+                        self._remember(key, vector)
+                        self.disk_hits += 1
+        return found
+
+    def _store(self, items):
+        with self._lock:
+            for key, vector in items:
+                self._remember(key, vector)
+            if self._conn is not None and items:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)',
+                    [(key, self.model_name, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items],
+                )
+                self._conn.commit()
+
+    def embed_query(self, text):
+        key = embedding_key(self.model_name, 'query', text)
+        found = self._lookup([key])
+        if key in found:
+            return list(found[key])
+        self.misses += 1
+        vector = list(self.inner.embed_query(text))
+        self._store([(key, vector)])
+        return vector
+
+    def embed_documents(self, texts):
+        keys = [embedding_key(self.model_name, 'document', t) for t in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in todo:
+                todo[key] = text
+        if todo:
+            self.misses += len(todo)
+            vectors = self.inner.embed_documents(list(todo.values()))
+            new_items = [(key, list(v)) for key, v in zip(todo.keys(), vectors)]
+            self._store(new_items)
+            found.update(new_items)
+        return [list(found[key]) for key in keys]
+
+    def stats(self):
+        with self._lock:
+            total = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_entries': len(self._memory),
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.memory_hits + self.disk_hits) / total, 3) if total else 0.0,
+            }
+
+
+class LocalHashEmbeddings(Embeddings):
+    """네트워크 없이 쓰는 결정적(deterministic) 임베딩.
+
+    글자 1~3-gram을 해시해 고정 크기 벡터에 더하고 길이 1로 정규화합니다.
+    같은 텍스트는 항상 같은 벡터가 되고, 글자가 많이 겹치는 텍스트끼리 유사도가 높습니다.
+    """
+
+    model = 'local-hash'
+
+    def __init__(self, size=LOCAL_EMBEDDING_SIZE):
+        self.size = size
+
+    def _embed(self, text):
+        vec = [0.0] * self.size
+        s = re.sub(r'\s+', ' ', str(text).strip().lower())
+        for n in (1, 2, 3):
+            for i in range(len(s) - n + 1):
+                gram = s[i:i + n]
+                digest = hashlib.md5(gram.encode('utf-8')).digest()
+                idx = int.from_bytes(digest[:4], 'little') % self.size
+                sign = 1.0 if digest[4] & 1 else -1.0
+                vec[idx] += sign * n
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
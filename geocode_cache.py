@@ -0,0 +1,204 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+
+# 카카오 주소 검색 결과를 SQLite 파일에 저장하는 지오코딩 캐시입니다.
+# - 주소를 정규화(normalize_address)한 문자열을 키로 사용하므로 띄어쓰기/괄호 차이는 같은 주소로 취급합니다.
+# - 파일 기반이라 여러 세션과 여러 프로세스(streamlit 워커)가 같은 캐시를 공유합니다.
+# - 결과가 없는 주소도 짧은 TTL로 저장해 같은 오타를 반복 조회하지 않습니다.
+# - 시설/식당/여가시설/검진기관 CSV의 주소 컬럼으로 미리 채워둘 수 있습니다(warm_up).
+
+GEOCODE_DB_PATH = os.path.join('cache', 'geocode.sqlite3')
+DEFAULT_TTL_S = 30 * 24 * 3600      # 좌표 결과 보관 기간(30일)
+NEGATIVE_TTL_S = 24 * 3600          # '결과 없음' 보관 기간(1일)
+
+# 워밍업에 사용할 CSV: (경로, 인코딩, 구분자, 주소 컬럼, 위도 컬럼, 경도 컬럼)
+# 좌표 컬럼이 없는 파일은 geocoder를 넘겨준 경우에만 원격 조회로 채웁니다.
+WARMUP_SOURCES = [
+    (os.path.join('data', 'incheon senior welfare facility.csv'), 'euc-kr', ',', '도로명 주소', 'lat', 'lon'),
+    (os.path.join('data', 'restaurant category.csv'), 'euc-kr', ',', '도로명 주소', 'lat', 'lon'),
+    (os.path.join('data', 'leisure location.csv'), 'CP949', ',', '도로명 주소', 'lat', 'lon'),
+    (os.path.join('data', 'incheon_health_check_centers.csv'), 'utf-8', ',', 'address', 'lat', 'lon'),
+    (os.path.join('data', 'incheon health institutions.csv'), 'cp949', '\t', '주소', None, None),
+]
+
+_SIDO_ALIASES = ('인천광역시', '인천시', '인천')
+
+
+def normalize_address(address) -> str:
+    """캐시 키로 사용할 주소 문자열을 만듭니다.
+
+    - 괄호 속 참고항목 '(부평동)' 제거, 쉼표 제거, 연속 공백 정리
+    - '인천광역시' / '인천시' 표기를 '인천'으로 통일
+    """
+    if address is None:
+        return ''
+    s = str(address).strip()
+    s = re.sub(r'\([^)]*\)', ' ', s)
+    s = s.replace(',', ' ')
+    tokens = s.split()
+    if tokens and tokens[0] in _SIDO_ALIASES:
+        tokens[0] = '인천'
+    return ' '.join(tokens)
+
+
+class GeocodeCache:
+    """정규화된 주소 -> (lat, lon) SQLite 캐시."""
+
+    def __init__(self, db_path=GEOCODE_DB_PATH, ttl_s=DEFAULT_TTL_S, negative_ttl_s=NEGATIVE_TTL_S):
+        self.db_path = db_path
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self._lock = threading.Lock()
+        parent = os.path.dirname(db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        with self._lock:
+            # WAL 모드: 다른 프로세스가 쓰는 동안에도 읽기가 막히지 않습니다.
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS geocode ('
+                ' addr_key TEXT PRIMARY KEY,'
+                ' lat REAL,'
+                ' lon REAL,'
+                ' source TEXT,'
+                ' updated_at REAL NOT NULL)'
+            )
+            self._conn.commit()
+
+    def get(self, address):
+        """캐시 조회 결과를 반환합니다.
+
+        - (lat, lon): 유효한 좌표가 캐시에 있음
+        - (None, None): '결과 없음'이 캐시에 있음(다시 조회할 필요 없음)
+        - None: 캐시에 없거나 만료됨
+        """
+        key = normalize_address(address)
+        if not key:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT lat, lon, updated_at FROM geocode WHERE addr_key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        lat, lon, updated_at = row
+        ttl = self.ttl_s if lat is not None else self.negative_ttl_s
+        if time.time() - updated_at > ttl:
+            return None
+        return (lat, lon)
+
+    def put(self, address, lat, lon, source='kakao'):
+        self.put_many([(address, lat, lon)], source=source)
+
+    def put_miss(self, address):
+        """검색 결과가 없는 주소를 기록합니다."""
+        self.put_many([(address, None, None)], source='miss')
+
+    def put_many(self, rows, source='kakao'):
+        """(주소, lat, lon) 튜플 목록을 한 번의 트랜잭션으로 저장합니다."""
+        now = time.time()
+        records = []
+        for address, lat, lon in rows:
+            key = normalize_address(address)
+            if not key:
+                continue
+            records.append((key, None if lat is None else float(lat), None if lon is None else float(lon), source, now))
+        if not records:
+            return 0
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO geocode (addr_key, lat, lon, source, updated_at) VALUES (?, ?, ?, ?, ?)',
+                records,
+            )
+            self._conn.commit()
+        return len(records)
+
+    def purge_expired(self):
+        """만료된 항목을 삭제하고 삭제된 행 수를 반환합니다."""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                'DELETE FROM geocode WHERE (lat IS NOT NULL AND updated_at < ?) OR (lat IS NULL AND updated_at < ?)',
+                (now - self.ttl_s, now - self.negative_ttl_s),
+            )
+            self._conn.commit()
+        return cur.rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM geocode').fetchone()[0]
+
+    def warm_up(self, sources=WARMUP_SOURCES, geocoder=None, max_remote=200):
+        """CSV 주소 컬럼으로 캐시를 미리 채웁니다.
+
+        좌표 컬럼이 있는 파일은 네트워크 없이 바로 저장하고, 좌표가 없는 파일은
+        geocoder(address) -> (lat, lon)가 주어졌을 때만 캐시에 없는 주소를
+        최대 max_remote건까지 원격 조회합니다. 저장한 건수를 반환합니다.
+        """
+        stored = 0
+        remote_calls = 0
+        for path, encoding, sep, addr_col, lat_col, lon_col in sources:
+            if not os.path.exists(path):
+                continue
+            try:
+                df = pd.read_csv(path, dtype=str, encoding=encoding, sep=sep)
+            except Exception:
+                continue
+            if addr_col not in df.columns:
+                continue
+
+            if lat_col and lon_col and lat_col in df.columns and lon_col in df.columns:
+                sub = df[[addr_col, lat_col, lon_col]].dropna()
+                lat = pd.to_numeric(sub[lat_col], errors='coerce')
+                lon = pd.to_numeric(sub[lon_col], errors='coerce')
+                ok = lat.notna() & lon.notna()
+                rows = list(zip(sub.loc[ok, addr_col], lat[ok], lon[ok]))
+                stored += self.put_many(rows, source='csv')
+                continue
+
+            if geocoder is None:
+                continue
+            for address in df[addr_col].dropna().unique():
+                if remote_calls >= max_remote:
+                    break
+                if self.get(address) is not None:
+                    continue
+                remote_calls += 1
+                lat, lon = geocoder(address)
+                if lat is None or lon is None:
+                    self.put_miss(address)
+                else:
+                    self.put(address, lat, lon)
+                    stored += 1
+        return stored
+
+
+_GEOCODE_CACHE = None
+_GEOCODE_CACHE_LOCK = threading.Lock()
+
+
+def get_geocode_cache():
+    """프로세스 전역 GeocodeCache를 반환합니다. 처음 만들 때 비어 있으면 CSV 좌표로 채웁니다."""
+    global _GEOCODE_CACHE
+    with _GEOCODE_CACHE_LOCK:
+        if _GEOCODE_CACHE is None:
+            cache = GeocodeCache()
+            if len(cache) == 0:
+                cache.warm_up()
+            _GEOCODE_CACHE = cache
+        return _GEOCODE_CACHE
+
+
+if __name__ == '__main__':
+    # 사용 예: python geocode_cache.py  (CSV 좌표로 캐시를 채우고 만료 항목 정리)
+    cache = GeocodeCache()
+    n = cache.warm_up()
+    removed = cache.purge_expired()
+    print(f'warm-up: {n}건 저장, 만료 {removed}건 삭제, 현재 {len(cache)}건')
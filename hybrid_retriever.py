@@ -0,0 +1,110 @@
+import threading
+import time
+from typing import Any
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+import local_rag
+import rag_planner
+from answer_cache import collection_fingerprint
+
+
+# BM25 + 벡터 하이브리드 검색기입니다.
+# 벡터 검색(MMR k=10)만으로는 "기초연금", "노인맞춤돌봄서비스", "65세" 같은 정책 이름/숫자가 그대로 들어 있는
+# 청크를 자주 놓쳐서, rag_planner.FALLBACK_MAP의 재매핑 쿼리를 여러 번 돌려야 겨우 찾는 경우가 많았습니다.
+# - HybridIndex: Chroma 컬렉션의 전체 청크에 대한 BM25 색인 (local_rag.tokenize의 한국어 글자 bigram)
+# - hybrid_search(): 벡터 검색 순위와 BM25 순위를 rag_planner.reciprocal_rank_fusion으로 합칩니다.
+# - HybridRetriever: make_rag_chain의 MMR retriever 자리에 쓰는 langchain retriever
+# 색인은 컬렉션 지문(answer_cache.collection_fingerprint)이 바뀔 때만 다시 만듭니다 (chroma_ingest로 문서를 넣은 뒤 등).
+
+VECTOR_K = 20            # 합치기 전에 벡터 검색에서 가져오는 문서 수
+BM25_K = 20              # 합치기 전에 BM25에서 가져오는 문서 수
+HYBRID_K = 10            # 합친 뒤 남기는 문서 수 (기존 retriever와 같은 k=10)
+INDEX_CHECK_S = 60       # 컬렉션 지문을 다시 확인하는 간격
+
+
+class HybridIndex:
+    """문서 목록에 대한 BM25 색인. 점수는 질문 토큰 idf 합으로 나눈 값(coverage, 0~약 2)입니다."""
+
+    def __init__(self, docs):
+        self.docs = list(docs)
+        self.bm25 = local_rag.BM25Index([d.page_content for d in self.docs])
+
+    @classmethod
+    def from_vectordb(cls, vectordb):
+        """langchain Chroma 컬렉션의 모든 청크로 색인을 만듭니다."""
+        data = vectordb.get(include=['documents', 'metadatas'])
+        # similarity_search가 돌려주는 Document와 같은 모양(id 없음)이어야 RRF에서 같은 청크로 합쳐집니다.
+        docs = [Document(page_content=text or '', metadata=meta or {})
+                for text, meta in zip(data['documents'], data['metadatas'])]
+        return cls(docs)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def search(self, query, k=BM25_K):
+        """[(문서, coverage), ...] coverage 내림차순, 0보다 큰 것만."""
+        coverage = self.bm25.normalized_scores(query)
+        order = coverage.argsort(kind='stable')[::-1][:k]
+        return [(self.docs[i], round(float(coverage[i]), 4)) for i in order if coverage[i] > 0]
+
+    def best_coverage(self, query):
+        """1위 문서의 coverage (문서가 없으면 0)."""
+        hits = self.search(query, 1)
+        return hits[0][1] if hits else 0.0
+
+
+_INDEXES = {}     # id(vectordb) -> (지문, 색인, 확인 시각)
+_INDEX_LOCK = threading.Lock()
+
+
+def get_hybrid_index(vectordb):
+    """vectordb의 HybridIndex. 처음 호출하거나 컬렉션 지문이 바뀌었으면 새로 만듭니다."""
+    key = id(vectordb)
+    with _INDEX_LOCK:
+        cached = _INDEXES.get(key)
+        now = time.time()
+        if cached is not None and now - cached[2] < INDEX_CHECK_S:
+            return cached[1]
+        fingerprint = collection_fingerprint(vectordb)
+        if cached is not None and cached[0] == fingerprint:
+            _INDEXES[key] = (fingerprint, cached[1], now)
+            return cached[1]
+        t0 = time.perf_counter()
+        index = HybridIndex.from_vectordb(vectordb)
+        _INDEXES[key] = (fingerprint, index, now)
+        print(f'hybrid_retriever: BM25 색인 생성 ({len(index)}개 청크, {(time.perf_counter() - t0) * 1000:.0f}ms)')
+        return index
+
+
+def hybrid_search(vectordb, query, k=HYBRID_K, index=None, thresholds=None):
+    """벡터 검색과 BM25 결과를 RRF로 합쳐 [(문서, 점수, ['vector' / 'bm25'])]를 반환합니다.
+
+    thresholds: (쿼리 기준, 문서 기준) 코사인 유사도. 주어지면 rag_planner.retrieve와 같은 관련도 게이트를
+    벡터/BM25 각각에 적용하고, 둘 다 통과하지 못하면 빈 리스트를 반환합니다.
+    """
+    index = index or get_hybrid_index(vectordb)
+    ranked = {}
+    vector = rag_planner.score_query(vectordb, query, VECTOR_K)
+    bm25 = index.search(query, BM25_K)
+    if thresholds is None:
+        ranked['vector'] = [doc for doc, _ in vector]
+        ranked['bm25'] = [doc for doc, _ in bm25]
+    else:
+        min_query, min_doc = thresholds
+        if rag_planner.is_relevant(vector, min_query):
+            ranked['vector'] = [doc for doc, sim in vector if sim >= min_doc]
+        if rag_planner.is_relevant(bm25, rag_planner.MIN_BM25_COVERAGE):
+            ranked['bm25'] = [doc for doc, cov in bm25 if cov >= rag_planner.MIN_BM25_DOC_COVERAGE]
+    return rag_planner.reciprocal_rank_fusion(ranked, top_n=k)
+
+
+class HybridRetriever(BaseRetriever):
+    """벡터 + BM25 하이브리드 langchain retriever (게이트 없이 항상 k개까지 반환)."""
+
+    vectordb: Any
+    k: int = HYBRID_K
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return [doc for doc, _, _ in hybrid_search(self.vectordb, query, self.k)]
@@ -0,0 +1,149 @@
+import bisect
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from geocode_cache import WARMUP_SOURCES, normalize_address
+
+
+# 번들 CSV(노인복지시설, 식당, 여가시설, 검진센터)의 도로명 주소와 좌표로 만든 오프라인 지오코더입니다.
+# - 정방향: 정규화된 주소의 완전 일치 -> 상세주소(층/호)가 붙은 입력의 최장 접두 일치 ->
+#   입력이 여러 주소의 접두어이고 그 주소들이 가까이 모여 있으면 중심점, 순서로 찾습니다.
+#   정렬된 주소 배열 + 이진 탐색(bisect)으로 접두어 범위를 찾으므로 trie와 같은 역할을 합니다.
+# - 역방향: 좌표에서 가장 가까운 알려진 주소를 numpy 벡터 연산으로 찾습니다.
+# 여기서 찾지 못한 주소만 카카오 API(app_location.get_lat_lon_kakao)로 넘어갑니다.
+
+PREFIX_MAX_SPREAD_M = 150.0     # 접두 일치 후보들이 이 거리 안에 모여 있을 때만 중심점을 사용
+REVERSE_MAX_DIST_M = 100.0
+
+
+def _has_number(token):
+    return any(ch.isdigit() for ch in token)
+
+
+class LocalGeocoder:
+    """정규화된 도로명 주소 -> (lat, lon) 인메모리 인덱스."""
+
+    def __init__(self):
+        self._exact = {}
+        self._display = {}
+        self._keys = []
+        self._lats = np.empty(0)
+        self._lons = np.empty(0)
+
+    @classmethod
+    def from_sources(cls, sources=WARMUP_SOURCES):
+        geocoder = cls()
+        rows = []
+        for path, encoding, sep, addr_col, lat_col, lon_col in sources:
+            if not lat_col or not lon_col or not os.path.exists(path):
+                continue
+            try:
+                df = pd.read_csv(path, dtype=str, encoding=encoding, sep=sep)
+            except Exception:
+                continue
+            if not {addr_col, lat_col, lon_col}.issubset(df.columns):
+                continue
+            sub = df[[addr_col, lat_col, lon_col]].dropna()
+            lat = pd.to_numeric(sub[lat_col], errors='coerce')
+            lon = pd.to_numeric(sub[lon_col], errors='coerce')
+            ok = lat.notna() & lon.notna()
+            rows.extend(zip(sub.loc[ok, addr_col], lat[ok], lon[ok]))
+        geocoder.add_many(rows)
+        return geocoder
+
+    def add_many(self, rows):
+        """(주소, lat, lon) 목록을 인덱스에 추가합니다. 같은 주소는 먼저 들어온 좌표를 유지합니다."""
+        for address, lat, lon in rows:
+            key = normalize_address(address)
+            if not key or key in self._exact:
+                continue
+            self._exact[key] = (float(lat), float(lon))
+            self._display[key] = str(address).strip()
+        self._keys = sorted(self._exact)
+        coords = np.array([self._exact[k] for k in self._keys], dtype=float).reshape(-1, 2)
+        self._lats = coords[:, 0]
+        self._lons = coords[:, 1]
+
+    def __len__(self):
+        return len(self._exact)
+
+    def _variants(self, address):
+        key = normalize_address(address)
+        if not key:
+            return []
+        # '서구 서곶로 284'처럼 시/도를 생략한 입력도 허용하고,
+        # 반대로 인덱스 쪽 주소에 시/도가 빠져 있으면 '인천 '을 뗀 키로도 찾습니다.
+        if key.startswith('인천 '):
+            return [key, key[len('인천 '):]]
+        return [key, '인천 ' + key]
+
+    def _prefix_indices(self, key):
+        """key 뒤에 토큰('key ...') 또는 부번('key-...')이 더 붙은 주소들의 정렬 배열 위치."""
+        idx = []
+        for sep in (' ', '-'):
+            lo = bisect.bisect_left(self._keys, key + sep)
+            hi = bisect.bisect_left(self._keys, key + sep + '\uffff')
+            idx.extend(range(lo, hi))
+        return idx
+
+    def lookup(self, address):
+        """(lat, lon, match_type)을 반환하고 찾지 못하면 None을 반환합니다.
+
+        match_type: 'exact' | 'prefix' | 'centroid'
+        """
+        for key in self._variants(address):
+            hit = self._exact.get(key)
+            if hit is not None:
+                return hit[0], hit[1], 'exact'
+
+            # 1) 알려진 주소 + 상세주소(예: '... 17-16 2층') -> 건물번호까지 일치하는 최장 접두어
+            tokens = key.split()
+            for end in range(len(tokens) - 1, 2, -1):
+                if not _has_number(tokens[end - 1]):
+                    continue
+                hit = self._exact.get(' '.join(tokens[:end]))
+                if hit is not None:
+                    return hit[0], hit[1], 'prefix'
+
+            # 2) 입력이 여러 주소의 접두어(예: 번지 뒤 부번 생략)이고 후보들이 한 곳에 모여 있는 경우
+            idx = self._prefix_indices(key)
+            if idx and _has_number(tokens[-1]):
+                lats = self._lats[idx]
+                lons = self._lons[idx]
+                spread = _haversine_np(lats.min(), lons.min(), lats.max(), lons.max())
+                if spread <= PREFIX_MAX_SPREAD_M:
+                    return float(lats.mean()), float(lons.mean()), 'centroid'
+        return None
+
+    def reverse(self, lat, lon, max_dist_m=REVERSE_MAX_DIST_M):
+        """좌표에서 가장 가까운 알려진 주소를 (주소, 거리m)로 반환합니다. 없으면 None."""
+        if len(self._keys) == 0:
+            return None
+        dists = _haversine_np(float(lat), float(lon), self._lats, self._lons)
+        i = int(np.argmin(dists))
+        if dists[i] > max_dist_m:
+            return None
+        return self._display[self._keys[i]], float(dists[i])
+
+
+def _haversine_np(lat1, lon1, lat2, lon2):
+    """define._haversine_m의 numpy 버전(배열 입력 가능, 단위 m)."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    hav = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000.0 * np.arcsin(np.sqrt(hav))
+
+
+_LOCAL_GEOCODER = None
+_LOCAL_GEOCODER_LOCK = threading.Lock()
+
+
+def get_local_geocoder():
+    """프로세스 전역 LocalGeocoder를 처음 호출될 때 만들어 반환합니다."""
+    global _LOCAL_GEOCODER
+    with _LOCAL_GEOCODER_LOCK:
+        if _LOCAL_GEOCODER is None:
+            _LOCAL_GEOCODER = LocalGeocoder.from_sources()
+        return _LOCAL_GEOCODER
@@ -0,0 +1,153 @@
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import Counter
+
+import numpy as np
+
+
+# 원격 임베딩 없이 동작하는 로컬 RAG 백엔드입니다.
+# - tokenize(): 한국어 글자 bigram 토크나이저. PDF에서 뽑은 본문은 띄어쓰기가 사라진 곳이 많아
+#   ("기초연금을신청해활용해보세요") 단어 단위보다 글자 bigram이 훨씬 잘 맞습니다.
+# - BM25Index / bm25_rerank(): 검색된 문서를 질문과의 BM25 점수로 다시 정렬하는 가벼운 재정렬기
+# - load_local_vectorstore(): LocalHashEmbeddings(embedding_cache)로 임베딩한 별도 Chroma 컬렉션을
+#   LOCAL_CHROMA_DIR에 만들어 엽니다. 원본 chroma_db의 문서와 메타데이터를 그대로 옮겨 다시 임베딩하므로
+#   네트워크 없이 인덱스를 다시 만들고 검색할 수 있습니다(원본 chroma_db는 건드리지 않음).
+# 백엔드 선택은 chatbot_hr_define의 RAG_EMBEDDINGS / RAG_RERANKER / RAG_RETRIEVAL 환경변수, 비교는 tools/compare_rag_backends.py.
+
+LOCAL_CHROMA_DIR = os.path.join('cache', 'chroma_local')
+LOCAL_COLLECTION = 'langchain_local'
+SOURCE_COLLECTION = 'langchain'
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r'[0-9a-zA-Z]+|[가-힣]+')
+
+
+def tokenize(text):
+    """글자 bigram 토큰 목록. 영문/숫자는 단어 단위, 한 글자짜리 한글 단어는 그대로 둡니다."""
+    tokens = []
+    for word in _TOKEN_RE.findall(str(text).lower()):
+        if word[0] < '가':
+            tokens.append(word)
+        elif len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+class BM25Index:
+    """문서 목록에 대한 BM25 점수 계산기."""
+
+    def __init__(self, texts, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.doc_tfs = [Counter(tokenize(t)) for t in texts]
+        self.doc_lens = np.array([sum(tf.values()) for tf in self.doc_tfs], dtype=float)
+        self.avg_len = float(self.doc_lens.mean()) if len(self.doc_lens) else 0.0
+        df = Counter()
+        for tf in self.doc_tfs:
+            df.update(tf.keys())
+        n = len(self.doc_tfs)
+        self.idf = {term: math.log(1.0 + (n - d + 0.5) / (d + 0.5)) for term, d in df.items()}
+
+    def scores(self, query):
+        """query에 대한 문서별 BM25 점수 배열."""
+        out = np.zeros(len(self.doc_tfs), dtype=float)
+        if not self.doc_tfs:
+            return out
+        norm = self.k1 * (1.0 - self.b + self.b * self.doc_lens / max(self.avg_len, 1e-9))
+        for term, qf in Counter(tokenize(query)).items():
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            tf = np.array([d.get(term, 0) for d in self.doc_tfs], dtype=float)
+            out += qf * idf * tf * (self.k1 + 1.0) / (tf + norm)
+        return out
+
+    def query_weight(self, query):
+        """질문 토큰 idf의 합. 말뭉치에 없는 토큰은 가장 드문 토큰의 idf로 셉니다."""
+        n = len(self.doc_tfs)
+        unseen_idf = math.log(1.0 + (n + 0.5) / 0.5)
+        return sum(qf * self.idf.get(term, unseen_idf) for term, qf in Counter(tokenize(query)).items())
+
+    def normalized_scores(self, query):
+        """BM25 점수를 질문 토큰 idf 합으로 나눈 값. 질문 bigram이 한 번씩 모두 들어 있으면 약 1,
+        하나도 없으면 0입니다 (질문 길이와 상관없이 비교할 수 있는 기준)."""
+        weight = self.query_weight(query)
+        if weight <= 0:
+            return np.zeros(len(self.doc_tfs), dtype=float)
+        return self.scores(query) / weight
+
+    def top_k(self, query, k=10):
+        """[(문서 번호, 점수), ...] 점수가 0보다 큰 것만 내림차순."""
+        s = self.scores(query)
+        order = np.argsort(-s, kind='stable')[:k]
+        return [(int(i), float(s[i])) for i in order if s[i] > 0]
+
+
+def bm25_rerank(question, docs, top_n=None):
+    """검색된 문서(langchain Document)를 질문과의 BM25 점수로 다시 정렬합니다. 점수가 같으면 원래 순서."""
+    docs = list(docs)
+    if len(docs) < 2:
+        return docs[:top_n] if top_n else docs
+    s = BM25Index([d.page_content for d in docs]).scores(question)
+    order = sorted(range(len(docs)), key=lambda i: (-s[i], i))
+    ranked = [docs[i] for i in order]
+    return ranked[:top_n] if top_n else ranked
+
+
+# ---------------------------------------------------------------------- 로컬 Chroma 컬렉션
+_BUILD_LOCK = threading.Lock()
+
+
+def build_local_collection(source_dir, target_dir=LOCAL_CHROMA_DIR, embeddings=None, batch_size=256):
+    """source_dir의 'langchain' 컬렉션 문서를 로컬 임베딩으로 다시 임베딩해 target_dir에 저장합니다.
+
+    기존 target_dir은 지우고 새로 만듭니다. 옮긴 문서 수를 반환합니다.
+    Chroma는 읽기만 해도 폴더의 파일을 고쳐 쓰므로 source_dir은 임시 폴더에 복사해서 읽습니다.
+    """
+    import chromadb
+    from embedding_cache import LocalHashEmbeddings
+
+    embeddings = embeddings or LocalHashEmbeddings()
+    tmp_dir = tempfile.mkdtemp(prefix='chroma_src_')
+    try:
+        shutil.copytree(source_dir, tmp_dir, dirs_exist_ok=True)
+        source = chromadb.PersistentClient(path=tmp_dir).get_collection(SOURCE_COLLECTION)
+        data = source.get(include=['documents', 'metadatas'])
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    shutil.rmtree(target_dir, ignore_errors=True)
+    client = chromadb.PersistentClient(path=target_dir)
+    # 임베딩이 길이 1로 정규화되어 있으므로 원본과 같은 l2 공간을 사용합니다 (rag_planner.distance_to_similarity).
+    target = client.get_or_create_collection(LOCAL_COLLECTION, metadata={'hnsw:space': 'l2'})
+    ids, docs, metas = data['ids'], data['documents'], data['metadatas']
+    for i in range(0, len(ids), batch_size):
+        chunk_docs = docs[i:i + batch_size]
+        target.upsert(
+            ids=ids[i:i + batch_size],
+            documents=chunk_docs,
+            metadatas=metas[i:i + batch_size],
+            embeddings=embeddings.embed_documents(chunk_docs),
+        )
+    return len(ids)
+
+
+def load_local_vectorstore(embeddings, source_dir, target_dir=LOCAL_CHROMA_DIR, rebuild=False):
+    """로컬 임베딩 컬렉션을 langchain Chroma로 엽니다. 없거나 rebuild=True이면 source_dir에서 새로 만듭니다."""
+    import chromadb
+    from langchain_community.vectorstores import Chroma
+
+    with _BUILD_LOCK:
+        exists = os.path.exists(os.path.join(target_dir, 'chroma.sqlite3'))
+        if rebuild or not exists:
+            n = build_local_collection(source_dir, target_dir, embeddings)
+            print(f'local_rag: {target_dir}에 로컬 임베딩 컬렉션 생성 ({n}개 문서)')
+        client = chromadb.PersistentClient(path=target_dir)
+        return Chroma(client=client, collection_name=LOCAL_COLLECTION, embedding_function=embeddings)
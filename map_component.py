@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from map_layers import LAYER_STYLES, POPUP_STYLE, ROUTE_STYLES
+
+
+# 지도를 클라이언트(iframe) 안에 유지하고 바뀐 레이어만 JSON diff로 보내는 Streamlit 컴포넌트입니다.
+# folium + st_html은 멀티셀렉트만 바꿔도 지도 HTML 전체를 다시 보내고 iframe을 새로 그리지만,
+# 여기서는 세션마다 "클라이언트가 가진 레이어의 해시"를 기억해 두고
+#   - 새로 생기거나 내용이 바뀐 레이어 -> upsert
+#   - 사라진 레이어 -> remove
+# 만 보냅니다. 바뀐 것이 없으면 직전 payload를 그대로 보내므로 프론트엔드는 아무것도 하지 않습니다.
+#
+# payload = {'rev': n, 'base_rev': n-1 | None, 'view': {...} | None, 'upsert': {...}, 'remove': [...]}
+# - base_rev가 None이면 전체 동기화(프론트엔드는 기존 레이어를 모두 지우고 다시 그림)
+# - 프론트엔드의 rev와 base_rev가 다르면(페이지 이동으로 iframe이 새로 생긴 경우 등)
+#   컴포넌트 값으로 {'resync': nonce}를 보내고, 다음 실행에서 전체 동기화를 보냅니다.
+# report_view=True면 프론트엔드가 지도를 움직일 때마다 현재 화면 영역을 컴포넌트 값 {'view': ...}로 보내므로
+# 서버가 화면 안의 점/클러스터만 골라 보낼 수 있습니다(poi_cluster).
+# 프론트엔드: components/incremental_map/index.html (Leaflet, 빌드 과정 없음)
+
+COMPONENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'components', 'incremental_map')
+DEFAULT_ZOOM = 14
+
+try:
+    _incremental_map = components.declare_component('incremental_map', path=COMPONENT_DIR)
+    MAP_COMPONENT_AVAILABLE = os.path.exists(os.path.join(COMPONENT_DIR, 'index.html'))
+except Exception as e:
+    print(f'map_component: 컴포넌트를 등록하지 못했습니다: {e}')
+    _incremental_map = None
+    MAP_COMPONENT_AVAILABLE = False
+
+
+def marker_layer(fc, category, popup_width=240):
+    """map_layers의 FeatureCollection을 마커 레이어 spec으로 감쌉니다."""
+    style = LAYER_STYLES.get(category, LAYER_STYLES['facility'])
+    return {
+        'kind': 'marker',
+        'data': fc,
+        'style': style,
+        'popup_style': POPUP_STYLE.format(width=popup_width),
+    }
+
+
+def polyline_layer(encoded, is_road):
+    """인코딩된 폴리라인 문자열(route_cache.encode_polyline)을 선 레이어 spec으로 감쌉니다.
+
+    GeoJSON 좌표 배열보다 훨씬 작아서 경로가 바뀔 때 보내는 diff가 줄어듭니다.
+    """
+    return {'kind': 'polyline', 'encoded': encoded, 'style': ROUTE_STYLES[bool(is_road)]}
+
+
+def tile_layer(url, options, label=None):
+    """정적 타일 피라미드(map_layers.poi_tile_layer)를 타일 레이어 spec으로 감쌉니다.
+
+    컴포넌트는 타일 레이어를 꺼진 상태로 레이어 선택 메뉴에만 추가하고, 사용자가 켠 것만 그립니다.
+    """
+    return {'kind': 'tiles', 'url': url, 'options': options, 'label': label}
+
+
+def _layer_hash(spec):
+    raw = json.dumps(spec, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def build_payload(state, view, layers, force_full=False):
+    """이전 동기화 상태(state)와 현재 레이어를 비교해 보낼 payload를 만들고 state를 갱신합니다.
+
+    - state: {'rev', 'hashes', 'view', 'payload'} (처음에는 빈 dict)
+    - view: {'center': [lat, lon], 'zoom': z}
+    - layers: {레이어 이름: marker_layer/polyline_layer/tile_layer spec} - 비어 있는 레이어는 빼고 넘깁니다.
+    """
+    hashes = {name: _layer_hash(spec) for name, spec in layers.items()}
+    full = force_full or 'rev' not in state
+    prev_hashes = {} if full else state.get('hashes', {})
+
+    upsert = {name: layers[name] for name, h in hashes.items() if prev_hashes.get(name) != h}
+    remove = sorted(name for name in prev_hashes if name not in hashes)
+    view_changed = full or state.get('view') != view
+
+    if not full and not upsert and not remove and not view_changed:
+        return state['payload']
+
+    rev = state.get('rev', 0) + 1
+    payload = {
+        'rev': rev,
+        'base_rev': None if full else state['rev'],
+        'view': view if view_changed else None,
+        'upsert': upsert,
+        'remove': remove,
+    }
+    state.update({'rev': rev, 'hashes': hashes, 'view': view, 'payload': payload})
+    return payload
+
+
+def client_view(key):
+    """프론트엔드가 마지막으로 알려준 화면 영역 {'bounds': [south, west, north, east], 'zoom': z} 또는 None."""
+    value = st.session_state.get(key)
+    return value.get('view') if isinstance(value, dict) else None
+
+
+def render_incremental_map(center, layers, key='incremental_map', zoom=DEFAULT_ZOOM, height=680, report_view=False):
+    """지도를 그리고 프론트엔드가 마지막으로 알려준 화면 영역을 반환합니다.
+
+    반환값: {'bounds': [south, west, north, east], 'zoom': z} 또는 (아직 모르면) None
+    """
+    state_key = f'_{key}_sync'
+    state = st.session_state.setdefault(state_key, {})
+
+    # 프론트엔드가 상태를 잃었다고 알려온 경우 전체 동기화
+    force_full = False
+    value = st.session_state.get(key)
+    if not isinstance(value, dict):
+        value = {}
+    if value.get('resync') and value.get('resync') != state.get('resync_seen'):
+        state['resync_seen'] = value.get('resync')
+        force_full = True
+
+    view = {'center': [round(float(center[0]), 6), round(float(center[1]), 6)], 'zoom': int(zoom)}
+    payload = build_payload(state, view, layers, force_full=force_full)
+    _incremental_map(payload=payload, height=height, report_view=bool(report_view), key=key, default=None)
+    return value.get('view')
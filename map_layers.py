@@ -0,0 +1,179 @@
+import os
+
+import folium
+import pandas as pd
+
+from define import _escape_popup_text
+
+
+# 지도 마커를 종류(카테고리)별 GeoJSON FeatureCollection 하나로 묶어 그립니다.
+# make_popup은 마커마다 folium.IFrame(별도 HTML 문서)을 만들어 지도 HTML이 마커 수에 비례해 커지지만,
+# 여기서는 각 feature에 이스케이프된 팝업 문자열만 넣고 스타일/팝업 템플릿은 레이어당 한 번만 둡니다.
+# 용량 비교: python tools/bench_map_payload.py
+
+POPUP_STYLE = 'max-width:{width}px; white-space:normal; word-wrap:break-word; font-size:13px; line-height:1.2;'
+
+# 카테고리별 마커 모양 (app_map의 기존 마커 색상/아이콘과 동일)
+LAYER_STYLES = {
+    'user': {'color': 'blue', 'icon': 'user', 'prefix': 'fa'},
+    'facility': {'color': 'red', 'icon': 'flag', 'prefix': 'glyphicon'},
+    'restaurant': {'color': 'orange', 'icon': 'cutlery', 'prefix': 'fa'},
+    'leisure': {'color': 'purple', 'icon': 'star', 'prefix': 'fa'},
+    'bus_user': {'color': 'green', 'icon': 'bus', 'prefix': 'fa'},
+    'bus_facility': {'color': 'darkgreen', 'icon': 'bus', 'prefix': 'fa'},
+}
+
+# 경로 선 모양 (define.draw_route_on_map과 동일)
+ROUTE_STYLES = {
+    True: {'color': 'green', 'weight': 4, 'opacity': 0.8},
+    False: {'color': 'green', 'weight': 3, 'opacity': 1.0},
+}
+
+
+# tools/build_poi_tiles.py가 만드는 정적 POI 타일 피라미드 (static/tiles/<layer>/{z}/{x}/{y}.png)
+# Streamlit 정적 파일 서빙으로 /app/static/ 아래에서 제공됩니다.
+TILE_ROOT = os.path.join('static', 'tiles')
+TILE_URL = '/app/static/tiles/{layer}/{{z}}/{{x}}/{{y}}.png'
+TILE_MIN_ZOOM = 10
+TILE_MAX_ZOOM = 16
+TILE_LABELS = {
+    'facility': '전체 노인복지시설',
+    'bus_stop': '전체 버스 정류장',
+    'leisure': '전체 여가시설',
+}
+
+
+def make_feature(lat, lon, popup_text, **props):
+    """Point feature 하나를 만듭니다. 좌표가 숫자가 아니면 None."""
+    try:
+        latv = float(lat)
+        lonv = float(lon)
+    except (TypeError, ValueError):
+        return None
+    if pd.isna(latv) or pd.isna(lonv):
+        return None
+    properties = {'popup': _escape_popup_text(popup_text)}
+    properties.update(props)
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [round(lonv, 6), round(latv, 6)]},
+        'properties': properties,
+    }
+
+
+def feature_collection(features):
+    return {'type': 'FeatureCollection', 'features': [f for f in features if f is not None]}
+
+
+def _first_present(row, candidates):
+    for c in candidates:
+        if c in row and pd.notna(row[c]):
+            return row[c]
+    return ''
+
+
+def user_features(ulat, ulon):
+    return feature_collection([make_feature(ulat, ulon, '사용자 위치')])
+
+
+def facility_features(df, name_col, type_col, lat_col, lon_col):
+    features = []
+    for _, row in df.iterrows():
+        title = str(row.get(name_col, '이름')) + '<br>' + str(row.get(type_col, '시설'))
+        features.append(make_feature(row[lat_col], row[lon_col], title))
+    return feature_collection(features)
+
+
+def restaurant_features(df, limit=20):
+    features = []
+    for _, r in df.head(limit).iterrows():
+        label = r.get('상호', '맛집')
+        extra = _first_present(r, ['주소', '도로명 주소', '소재지', '상세주소'])
+        popup_text = label if not extra else f"{label}<br>{extra}"
+        features.append(make_feature(r.get('lat'), r.get('lon'), popup_text))
+    return feature_collection(features)
+
+
+def leisure_features(df, limit=20):
+    features = []
+    for _, r in df.head(limit).iterrows():
+        label = r.get('이름', '여가')
+        extra = _first_present(r, ['주소', '위치', '설명', '도로명 주소', '시설분류'])
+        popup_text = label if not extra else f"{label}<br>{extra}"
+        features.append(make_feature(r.get('lat'), r.get('lon'), popup_text))
+    return feature_collection(features)
+
+
+def bus_stop_features(df, dist_col):
+    features = []
+    for _, r in df.iterrows():
+        stop_no = str(r.get('정류소번호', 'N/A')).split('.')[0]
+        try:
+            dist = int(r.get(dist_col, 0))
+        except (TypeError, ValueError):
+            dist = 0
+        popup_text = f"{r.get('정류장명', '정류장')}<br>정류장 번호:  {stop_no}<br>{dist}m"
+        features.append(make_feature(r.get('lat'), r.get('lon'), popup_text))
+    return feature_collection(features)
+
+
+def add_feature_layer(fmap, fc, category, name=None, popup_width=240):
+    """FeatureCollection을 GeoJson 레이어 하나로 지도에 추가합니다. 비어 있으면 추가하지 않습니다."""
+    if not fc or not fc.get('features'):
+        return None
+    style = LAYER_STYLES.get(category, LAYER_STYLES['facility'])
+    layer = folium.GeoJson(
+        fc,
+        name=name or category,
+        marker=folium.Marker(icon=folium.Icon(color=style['color'], icon=style['icon'], prefix=style['prefix'])),
+        popup=folium.GeoJsonPopup(fields=['popup'], labels=False, style=POPUP_STYLE.format(width=popup_width), max_width=popup_width + 20),
+    )
+    layer.add_to(fmap)
+    return layer
+
+
+def tile_layer_available(layer):
+    """layer의 타일이 만들어져 있는지 (tools/build_poi_tiles.py 실행 여부)."""
+    return os.path.isdir(os.path.join(TILE_ROOT, layer))
+
+
+def poi_tile_layer(layer):
+    """Leaflet tileLayer에 넘길 (URL 템플릿, 옵션)."""
+    options = {
+        'minZoom': TILE_MIN_ZOOM,
+        'maxNativeZoom': TILE_MAX_ZOOM,   # 더 확대하면 가장 큰 줌의 타일을 늘려서 사용
+        'maxZoom': 19,
+        'opacity': 0.9,
+        'errorTileUrl': '',
+    }
+    return TILE_URL.format(layer=layer), options
+
+
+POI_TILE_LAYERS = ('facility', 'bus_stop', 'leisure')
+
+
+def available_poi_tile_layers(layers=POI_TILE_LAYERS):
+    """만들어진 POI 타일만 [(레이어, URL 템플릿, 옵션)]으로 반환합니다."""
+    return [(layer,) + poi_tile_layer(layer) for layer in layers if tile_layer_available(layer)]
+
+
+def add_poi_tile_layers(fmap, layers=POI_TILE_LAYERS):
+    """만들어진 POI 타일을 켜고 끌 수 있는 오버레이로 지도에 추가합니다. 추가한 레이어 수를 반환합니다."""
+    added = 0
+    for layer, url, options in available_poi_tile_layers(layers):
+        folium.TileLayer(
+            tiles=url,
+            attr='Incheon POI',
+            name=TILE_LABELS.get(layer, layer),
+            overlay=True,
+            control=True,
+            show=False,
+            min_zoom=options['minZoom'],
+            max_native_zoom=options['maxNativeZoom'],
+            max_zoom=options['maxZoom'],
+            opacity=options['opacity'],
+        ).add_to(fmap)
+        added += 1
+    if added:
+        folium.LayerControl(collapsed=True).add_to(fmap)
+    return added
@@ -0,0 +1,87 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+# run_map이 만든 지도 HTML(fmap._repr_html_())을 지도 상태별로 저장하는 LRU 캐시입니다.
+# 키는 (사용자 위치, 시설유형, 추천 시설 목록, 선택된 시설, 오버레이 집합, 경로 좌표 해시, POI 타일 레이어 집합)이며,
+# 같은 상태의 재실행(예: 그리드에서 같은 행을 다시 선택)은 folium 지도 생성과 직렬화를 건너뜁니다.
+# 프로세스 전역이므로 같은 상태를 보는 다른 세션도 같은 HTML을 재사용합니다.
+
+MAX_ENTRIES = 64
+COORD_DIGITS = 6
+
+
+def _round_pair(p):
+    return (round(float(p[0]), COORD_DIGITS), round(float(p[1]), COORD_DIGITS))
+
+
+def route_hash(coords):
+    """경로 좌표 리스트의 짧은 해시."""
+    h = hashlib.sha1()
+    for lat, lon in coords or []:
+        h.update(f'{float(lat):.{COORD_DIGITS}f},{float(lon):.{COORD_DIGITS}f};'.encode())
+    return h.hexdigest()[:16]
+
+
+def map_state_key(user_location, selected_type, facility_points, selected_facility, overlays, route_coords,
+                  tile_layers=()):
+    """지도 상태를 나타내는 캐시 키(문자열)를 만듭니다.
+
+    - facility_points: 지도에 표시되는 추천 시설 (이름, lat, lon) 목록
+    - overlays: 선택된 부가 정보(맛집/여가시설/정류장) 목록 - 순서는 무시합니다.
+    - tile_layers: 지도에 추가된 POI 타일 레이어 이름 (map_layers.available_poi_tile_layers) - 타일을 새로 만들면 키가 바뀝니다.
+    """
+    parts = (
+        _round_pair(user_location),
+        selected_type or '',
+        tuple((str(n), *_round_pair((lat, lon))) for n, lat, lon in facility_points),
+        _round_pair(selected_facility),
+        tuple(sorted(overlays or [])),
+        route_hash(route_coords),
+        tuple(sorted(tile_layers or [])),
+    )
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+class MapRenderCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def put(self, key, html):
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+_MAP_RENDER_CACHE = MapRenderCache()
+
+
+def get_map_render_cache():
+    return _MAP_RENDER_CACHE
@@ -0,0 +1,129 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+# "가까운 시설" 검색(app_map._rank_candidates -> find_nearest_facilities) 결과를 모든 세션이 함께 쓰는 캐시입니다.
+# 구청, 주요 역처럼 많이 입력되는 주소는 같은 좌표(또는 아주 가까운 좌표)와 같은 시설유형으로 반복 검색되므로
+# 위치를 CELL_DEG 격자 칸으로 반올림한 (칸, 시설유형)을 키로 결과를 저장해 거리 순위 계산과 도로 경로 탐색을 건너뜁니다.
+# - LRU(MAX_ENTRIES) + TTL(TTL_S) 으로 제거하고, hits/misses/expired/evictions를 기록합니다.
+# - 같은 칸 안의 다른 위치에서 재사용하면 도로 거리는 칸 크기(약 50m) 이내의 오차가 있으므로
+#   직선 거리(straight_dist_m)만 호출한 위치 기준으로 다시 계산합니다(app_map 참고).
+# - get_or_compute()는 키별 잠금으로 같은 칸의 계산을 한 번만 실행하고(single-flight), 다른 세션은 그 결과를 기다립니다.
+#   항목마다 TTL을 줄 수 있어 오류 결과는 ERROR_TTL_S 동안만 보관합니다.
+
+CELL_DEG = 0.0005           # 위도 약 55m, 경도 약 44m (인천 기준)
+TTL_S = 6 * 3600
+MAX_ENTRIES = 1024
+ERROR_TTL_S = 60
+
+
+def cell_key(lat, lon, facility_type=None):
+    """위치를 격자 칸으로 반올림한 캐시 키."""
+    return (
+        int(math.floor(float(lat) / CELL_DEG)),
+        int(math.floor(float(lon) / CELL_DEG)),
+        facility_type or '전체',
+    )
+
+
+class NearestCache:
+    def __init__(self, ttl_s=TTL_S, max_entries=MAX_ENTRIES):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (value, stored_at, ttl_s)
+        self._lock = threading.Lock()
+        self._key_locks = {}            # key -> [Lock, 기다리는 수]
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() - entry[1] > entry[2]:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, ttl_s=None):
+        with self._lock:
+            self._entries[key] = (value, time.time(), self.ttl_s if ttl_s is None else ttl_s)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _key_lock(self, key):
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+            return entry[0]
+
+    def _release_key_lock(self, key):
+        with self._lock:
+            entry = self._key_locks.get(key)
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self._key_locks[key]
+
+    def get_or_compute(self, key, compute, ttl_for=None):
+        """캐시에 있으면 반환하고, 없으면 compute()의 결과를 저장한 뒤 반환합니다.
+
+        같은 key를 동시에 요청하면 한 스레드만 compute()를 실행하고 나머지는 그 결과를 씁니다.
+        ttl_for(value)가 주어지면 그 값(초)을 이 항목의 TTL로 씁니다 (None이면 기본 TTL).
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        lock = self._key_lock(key)
+        try:
+            with lock:
+                # 기다리는 동안 다른 스레드가 계산을 끝냈을 수 있습니다.
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and time.time() - entry[1] <= entry[2]:
+                        return entry[0]
+                value = compute()
+                self.put(key, value, ttl_for(value) if ttl_for is not None else None)
+                return value
+        finally:
+            self._release_key_lock(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+_NEAREST_CACHE = None
+_NEAREST_CACHE_LOCK = threading.Lock()
+
+
+def get_nearest_cache():
+    global _NEAREST_CACHE
+    with _NEAREST_CACHE_LOCK:
+        if _NEAREST_CACHE is None:
+            _NEAREST_CACHE = NearestCache()
+        return _NEAREST_CACHE
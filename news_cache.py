@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+# 복지 서비스 게시판(app_news) 조회 결과를 모든 세션이 함께 쓰는 캐시입니다.
+# - 키: (지역, 검색어, 페이지당 건수, 페이지 번호)
+# - FRESH_TTL_S 안의 결과는 그대로 반환하고, STALE_TTL_S 안의 결과는 먼저 보여준 뒤
+#   백그라운드에서 다시 받아옵니다(stale-while-revalidate).
+# - 현재 페이지를 보여주는 동안 다음 페이지를 미리 받아오고(prefetch),
+#   자주 쓰는 조회 조건은 앱이 처음 뜰 때 백그라운드 스레드에서 하나씩 채워둡니다(warm).
+# fetcher(key)는 (결과 리스트, 상태) 튜플을 반환해야 하며 streamlit을 호출하면 안 됩니다
+# (백그라운드 스레드에서 실행됨). 상태가 None(성공) 또는 ('warning', ...)(검색 결과 없음)인 결과만 저장하고,
+# ('error', ...)와 ('unavailable', ...)(한도 초과/서킷 차단/네트워크 오류)는 저장하지 않습니다.
+# 한 번 막힌 호출의 빈 목록을 모든 세션에 보여주지 않도록 하기 위해서입니다.
+
+FRESH_TTL_S = 10 * 60
+STALE_TTL_S = 24 * 3600
+MAX_ENTRIES = 256
+MAX_WORKERS = 2
+CACHEABLE_STATUS = ('warning',)
+
+
+class NewsCache:
+    def __init__(self, fresh_ttl_s=FRESH_TTL_S, stale_ttl_s=STALE_TTL_S, max_entries=MAX_ENTRIES):
+        self.fresh_ttl_s = fresh_ttl_s
+        self.stale_ttl_s = stale_ttl_s
+        self.max_entries = max_entries
+        self._entries = OrderedDict()      # key -> (items, status, fetched_at)
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='news-cache')
+        self.warmed = False
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, None
+            age = time.time() - entry[2]
+            if age > self.stale_ttl_s:
+                del self._entries[key]
+                return None, None
+            self._entries.move_to_end(key)
+            return entry, age <= self.fresh_ttl_s
+
+    def _store(self, key, items, status):
+        if status is not None and status[0] not in CACHEABLE_STATUS:
+            return
+        with self._lock:
+            self._entries[key] = (items, status, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _refresh(self, key, fetcher):
+        try:
+            items, status = fetcher(key)
+            self._store(key, items, status)
+        except Exception as e:
+            print(f'news_cache refresh error: {key} {e}')
+        finally:
+            with self._lock:
+                self._inflight.discard(key)
+
+    def _schedule(self, key, fetcher):
+        with self._lock:
+            if key in self._inflight:
+                return
+            self._inflight.add(key)
+        self._executor.submit(self._refresh, key, fetcher)
+
+    def get(self, key, fetcher):
+        """(items, status)를 반환합니다. 캐시에 없으면 이 스레드에서 바로 받아옵니다."""
+        entry, fresh = self._lookup(key)
+        if entry is not None:
+            if not fresh:
+                self._schedule(key, fetcher)
+            return entry[0], entry[1]
+        items, status = fetcher(key)
+        self._store(key, items, status)
+        return items, status
+
+    def contains(self, key):
+        return self._lookup(key)[0] is not None
+
+    def prefetch(self, key, fetcher):
+        """캐시에 없거나 오래된 key를 백그라운드로 받아옵니다."""
+        entry, fresh = self._lookup(key)
+        if entry is None or not fresh:
+            self._schedule(key, fetcher)
+
+    def warm(self, keys, fetcher, should_continue=None):
+        """자주 쓰는 조회 조건들을 한 번만 백그라운드 스레드에서 하나씩 채워둡니다.
+
+        호출한 요청은 기다리지 않습니다. should_continue()가 False를 반환하면(예: 남은 일일 한도가 적음) 멈춥니다.
+        """
+        with self._lock:
+            if self.warmed:
+                return
+            self.warmed = True
+
+        def _run():
+            for key in keys:
+                if self.contains(key):
+                    continue
+                if should_continue is not None and not should_continue():
+                    print('news_cache warm: 남은 호출 한도가 적어 건너뜀')
+                    return
+                try:
+                    items, status = fetcher(key)
+                    self._store(key, items, status)
+                except Exception as e:
+                    print(f'news_cache warm error: {key} {e}')
+
+        threading.Thread(target=_run, name='news-cache-warm', daemon=True).start()
+
+
+_NEWS_CACHE = None
+_NEWS_CACHE_LOCK = threading.Lock()
+
+
+def get_news_cache():
+    global _NEWS_CACHE
+    with _NEWS_CACHE_LOCK:
+        if _NEWS_CACHE is None:
+            _NEWS_CACHE = NewsCache()
+        return _NEWS_CACHE
@@ -0,0 +1,180 @@
+import json
+import math
+import os
+import re
+import shutil
+from collections import Counter
+
+import numpy as np
+
+
+# 폴백 챗봇(app_chatbot_JS)용 문단 단위 TF-IDF 색인입니다.
+# 이전에는 시작할 때마다 문서 전체로 TfidfVectorizer(stop_words='english')를 새로 학습했고(메모리 오류가 나면 앞 10,000자만),
+# 검색 결과로 PDF 전체를 돌려준 뒤 앞 1,200자만 잘라 썼기 때문에 질문과 관련된 부분이 프롬프트에 들어가지 않았습니다.
+# - split_passages(): 문서를 CHUNK_SIZE 글자 단위 문단으로 나눕니다 (문단/줄 경계 우선, CHUNK_OVERLAP만큼 겹침).
+# - char_ngrams(): 한국어 글자 2~3-gram. 영어 불용어 목록은 한국어에 의미가 없고, PDF 본문은 띄어쓰기가 사라진 곳이 많아
+#   단어 단위보다 글자 n-gram이 잘 맞습니다 (local_rag.tokenize와 같은 이유).
+# - PassageIndex.save()/load(): 열(용어) 단위 희소 행렬(CSC)을 .npy 파일로 저장하고 np.load(mmap_mode='r')로 엽니다.
+#   질문의 n-gram 열만 읽으므로 색인 전체를 메모리에 올리지 않고, 여러 streamlit 프로세스가 페이지 캐시를 공유합니다.
+# 색인 폴더: pdf_index_storage_openai/tfidf_chunks (기존 tfidf_index.pkl 옆). 생성/갱신은 define.load_tfidf_index.
+
+INDEX_DIR = os.path.join('pdf_index_storage_openai', 'tfidf_chunks')
+INDEX_VERSION = 1
+CHUNK_SIZE = 600
+CHUNK_OVERLAP = 100
+NGRAM_SIZES = (2, 3)
+
+_TOKEN_RE = re.compile(r'[0-9a-zA-Z]+|[가-힣]+')
+_ARRAYS = ('data', 'indices', 'indptr', 'idf')
+
+
+def char_ngrams(text, sizes=NGRAM_SIZES):
+    """글자 n-gram 목록. 영문/숫자는 단어 단위, n보다 짧은 한글 단어는 그대로 둡니다."""
+    tokens = []
+    for word in _TOKEN_RE.findall(str(text).lower()):
+        if word[0] < '가':
+            tokens.append(word)
+            continue
+        if len(word) < min(sizes):
+            tokens.append(word)
+            continue
+        for n in sizes:
+            tokens.extend(word[i:i + n] for i in range(len(word) - n + 1))
+    return tokens
+
+
+def _split_text(text, chunk_size, chunk_overlap):
+    """text를 chunk_size 글자 이내 조각으로 나눕니다. 빈 줄 -> 줄 -> 공백 경계에서 자르고, 없으면 글자 수로 자릅니다."""
+    text = re.sub(r'[ \t]+', ' ', text).strip()
+    pieces = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            window = text[start:end]
+            for sep in ('\n\n', '\n', ' '):
+                cut = window.rfind(sep)
+                if cut > chunk_size // 2:
+                    end = start + cut
+                    break
+        piece = text[start:end].strip()
+        if piece:
+            pieces.append(piece)
+        if end >= len(text):
+            break
+        start = max(end - chunk_overlap, start + 1)
+    return pieces
+
+
+def split_passages(docs, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """[{'source', 'text'}] 문서 -> [{'source', 'chunk', 'text'}] 문단 목록."""
+    passages = []
+    for d in docs:
+        for i, piece in enumerate(_split_text(d.get('text', '') or '', chunk_size, chunk_overlap)):
+            passages.append({'source': d.get('source', ''), 'chunk': i, 'text': piece})
+    return passages
+
+
+def _tf(counts):
+    """sublinear tf (1 + log tf)."""
+    return {term: 1.0 + math.log(c) for term, c in counts.items()}
+
+
+class PassageIndex:
+    """문단 TF-IDF 색인. 행렬은 (문단 x 용어) 값을 용어(열) 단위로 저장한 CSC 배열이며, 각 문단 벡터는 길이 1입니다."""
+
+    def __init__(self, passages, vocab, idf, data, indices, indptr, meta=None):
+        self.passages = passages
+        self.vocab = vocab          # 용어 -> 열 번호
+        self.idf = idf
+        self.data = data
+        self.indices = indices      # 문단 번호
+        self.indptr = indptr
+        self.meta = meta or {}
+
+    @classmethod
+    def build(cls, passages, meta=None):
+        counts = [Counter(char_ngrams(p['text'])) for p in passages]
+        df = Counter()
+        for c in counts:
+            df.update(c.keys())
+        vocab = {term: i for i, term in enumerate(sorted(df))}
+        n = len(passages)
+        idf = np.zeros(len(vocab), dtype=np.float32)
+        for term, d in df.items():
+            idf[vocab[term]] = math.log((1.0 + n) / (1.0 + d)) + 1.0
+
+        columns = [[] for _ in vocab]
+        for row, c in enumerate(counts):
+            weights = {vocab[t]: w * idf[vocab[t]] for t, w in _tf(c).items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for col, w in weights.items():
+                columns[col].append((row, w / norm))
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(col) for col in columns])
+        indices = np.fromiter((r for col in columns for r, _ in col), dtype=np.int32, count=int(indptr[-1]))
+        data = np.fromiter((w for col in columns for _, w in col), dtype=np.float32, count=int(indptr[-1]))
+        return cls(passages, vocab, idf, data, indices, indptr, meta)
+
+    def __len__(self):
+        return len(self.passages)
+
+    def query_vector(self, query):
+        """{열 번호: 가중치} 길이 1로 정규화한 질문 벡터 (색인에 없는 n-gram은 버림)."""
+        counts = Counter(t for t in char_ngrams(query) if t in self.vocab)
+        weights = {self.vocab[t]: w * float(self.idf[self.vocab[t]]) for t, w in _tf(counts).items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {col: w / norm for col, w in weights.items()}
+
+    def scores(self, query):
+        """문단별 코사인 유사도 배열. 질문 n-gram의 열만 읽습니다."""
+        out = np.zeros(len(self.passages), dtype=np.float32)
+        for col, w in self.query_vector(query).items():
+            start, end = int(self.indptr[col]), int(self.indptr[col + 1])
+            out[self.indices[start:end]] += w * self.data[start:end]
+        return out
+
+    def search(self, query, top_k=5):
+        """상위 top_k 문단 [{'text', 'source', 'chunk', 'score'}]. 점수가 0인 문단은 제외합니다."""
+        s = self.scores(query)
+        order = np.argsort(-s, kind='stable')[:top_k]
+        return [dict(self.passages[i], score=round(float(s[i]), 4)) for i in order if s[i] > 0]
+
+    def save(self, index_dir=INDEX_DIR):
+        """index_dir에 저장합니다. 임시 폴더에 다 쓴 뒤 바꿔치기하므로 읽는 쪽이 반쯤 쓴 파일을 보지 않습니다."""
+        tmp_dir = index_dir.rstrip(os.sep) + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name in _ARRAYS:
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(tmp_dir, 'vocab.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.vocab, f, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, 'passages.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.passages, f, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(dict(self.meta, version=INDEX_VERSION, passages=len(self.passages), terms=len(self.vocab)),
+                      f, ensure_ascii=False, indent=1)
+        shutil.rmtree(index_dir, ignore_errors=True)
+        os.replace(tmp_dir, index_dir)
+
+    @classmethod
+    def load(cls, index_dir=INDEX_DIR, mmap=True):
+        """저장된 색인을 엽니다. mmap=True이면 행렬 배열은 읽기 전용 메모리 맵입니다."""
+        with open(os.path.join(index_dir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(os.path.join(index_dir, 'vocab.json'), encoding='utf-8') as f:
+            vocab = json.load(f)
+        with open(os.path.join(index_dir, 'passages.json'), encoding='utf-8') as f:
+            passages = json.load(f)
+        arrays = {name: np.load(os.path.join(index_dir, f'{name}.npy'), mmap_mode='r' if mmap else None)
+                  for name in _ARRAYS}
+        return cls(passages, vocab, meta=meta, **arrays)
+
+
+def read_meta(index_dir=INDEX_DIR):
+    """저장된 색인의 meta.json 또는 None."""
+    try:
+        with open(os.path.join(index_dir, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
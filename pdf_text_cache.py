@@ -0,0 +1,213 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+
+# PDF 페이지 텍스트 추출 캐시입니다.
+# define.load_allowed_corpus(폴백 챗봇)와 chroma_ingest가 실행될 때마다 pypdf로 모든 페이지를 다시 파싱했습니다
+# (47쪽짜리 PDF 하나에 약 4초). run_chatbot은 검색 결과가 없을 때 코퍼스를 한 번 더 읽기도 했습니다.
+# - 키: (파일 내용 sha1, 페이지 번호) -> 파일 이름이 바뀌어도 내용이 같으면 다시 추출하지 않고,
+#   내용이 바뀌면 해시가 달라져 자동으로 다시 추출합니다.
+# - 본문은 zlib으로 압축해 SQLite 파일(cache/pdf_text.sqlite3)에 저장합니다.
+# - 파일 해시는 (경로, 크기, 수정 시각)이 같으면 다시 계산하지 않습니다 (files 테이블).
+# - 캐시에 없는 페이지는 PAGES_PER_TASK쪽씩 나눠 프로세스 풀에서 추출합니다.
+
+PDF_TEXT_DB_PATH = os.path.join('cache', 'pdf_text.sqlite3')
+PAGES_PER_TASK = 8
+HASH_BLOCK = 1 << 20
+
+
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _pdf_reader(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        from PyPDF2 import PdfReader
+    return PdfReader(path)
+
+
+def extract_page_range(path, start, end):
+    """PDF의 [start, end) 페이지 텍스트를 [(페이지 번호, 텍스트)]로 반환합니다 (워커 프로세스에서 실행)."""
+    reader = _pdf_reader(path)
+    out = []
+    for i in range(start, min(end, len(reader.pages))):
+        try:
+            text = reader.pages[i].extract_text() or ''
+        except Exception as e:
+            print(f'pdf_text_cache: {path} {i}쪽 추출 실패: {e}')
+            text = ''
+        out.append((i, text))
+    return out
+
+
+class PdfTextCache:
+    """(파일 sha1, 페이지) -> zlib 압축 텍스트 SQLite 캐시."""
+
+    def __init__(self, db_path=PDF_TEXT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.page_hits = 0
+        self.page_misses = 0
+        parent = os.path.dirname(db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        with self._lock:
+            # WAL 모드: 다른 프로세스가 쓰는 동안에도 읽기가 막히지 않습니다.
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS files ('
+                ' path TEXT PRIMARY KEY,'
+                ' size INTEGER NOT NULL,'
+                ' mtime REAL NOT NULL,'
+                ' sha1 TEXT NOT NULL,'
+                ' n_pages INTEGER NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS pages ('
+                ' sha1 TEXT NOT NULL,'
+                ' page INTEGER NOT NULL,'
+                ' text BLOB NOT NULL,'
+                ' PRIMARY KEY (sha1, page))'
+            )
+            self._conn.commit()
+
+    def file_info(self, path):
+        """(sha1, 페이지 수). 크기와 수정 시각이 저장된 값과 같으면 파일을 다시 읽지 않습니다."""
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute('SELECT size, mtime, sha1, n_pages FROM files WHERE path = ?', (key,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            return row[2], row[3]
+        sha1 = file_sha1(path)
+        with self._lock:
+            known = self._conn.execute('SELECT n_pages FROM files WHERE sha1 = ? LIMIT 1', (sha1,)).fetchone()
+        n_pages = known[0] if known else len(_pdf_reader(path).pages)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO files (path, size, mtime, sha1, n_pages) VALUES (?, ?, ?, ?, ?)',
+                (key, stat.st_size, stat.st_mtime, sha1, n_pages),
+            )
+            self._conn.commit()
+        return sha1, n_pages
+
+    def get_pages(self, sha1):
+        """{페이지 번호: 텍스트} 저장된 페이지만."""
+        with self._lock:
+            rows = self._conn.execute('SELECT page, text FROM pages WHERE sha1 = ?', (sha1,)).fetchall()
+        return {page: zlib.decompress(blob).decode('utf-8') for page, blob in rows}
+
+    def put_pages(self, sha1, page_texts):
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO pages (sha1, page, text) VALUES (?, ?, ?)',
+                [(sha1, page, zlib.compress(text.encode('utf-8'))) for page, text in page_texts],
+            )
+            self._conn.commit()
+
+    def extract(self, paths, workers=None):
+        """{경로: [(페이지 번호, 텍스트), ...]}. 캐시에 없는 페이지만 프로세스 풀에서 추출해 저장합니다.
+
+        읽을 수 없는 PDF는 빈 리스트가 됩니다.
+        """
+        pages, infos, tasks = {}, {}, []
+        for path in paths:
+            pages[path] = []
+            try:
+                sha1, n_pages = self.file_info(path)
+            except Exception as e:
+                print(f'pdf_text_cache: PDF를 열 수 없습니다: {path} {e}')
+                continue
+            infos[path] = sha1
+            cached = self.get_pages(sha1)
+            pages[path] = sorted(cached.items())
+            self.page_hits += len(cached)
+            missing = [p for p in range(n_pages) if p not in cached]
+            # 빠진 페이지를 PAGES_PER_TASK쪽 이내의 연속 구간으로 묶습니다.
+            start = None
+            for i, p in enumerate(missing):
+                if start is None:
+                    start = p
+                end_of_run = i + 1 == len(missing) or missing[i + 1] != p + 1 or p + 1 - start >= PAGES_PER_TASK
+                if end_of_run:
+                    tasks.append((path, start, p + 1))
+                    start = None
+        if not tasks:
+            return pages
+
+        workers = workers or min(len(tasks), os.cpu_count() or 1)
+        if workers <= 1:
+            results = []
+            for t in tasks:
+                try:
+                    results.append(extract_page_range(*t))
+                except Exception as e:
+                    print(f'pdf_text_cache: 추출 실패: {t[0]} {e}')
+                    results.append([])
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(extract_page_range, *t) for t in tasks]
+                results = []
+                for t, fut in zip(tasks, futures):
+                    try:
+                        results.append(fut.result())
+                    except Exception as e:
+                        print(f'pdf_text_cache: 추출 실패: {t[0]} {e}')
+                        results.append([])
+        for (path, _, _), result in zip(tasks, results):
+            if result:
+                self.put_pages(infos[path], result)
+                self.page_misses += len(result)
+                pages[path].extend(result)
+        for path in pages:
+            pages[path].sort()
+        return pages
+
+    def stats(self):
+        with self._lock:
+            files = self._conn.execute('SELECT COUNT(DISTINCT sha1) FROM files').fetchone()[0]
+            n_pages = self._conn.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+        return {'files': files, 'pages': n_pages, 'page_hits': self.page_hits, 'page_misses': self.page_misses}
+
+
+_PDF_TEXT_CACHE = None
+_PDF_TEXT_CACHE_LOCK = threading.Lock()
+
+
+def get_pdf_text_cache():
+    """프로세스 전역 PdfTextCache를 반환합니다."""
+    global _PDF_TEXT_CACHE
+    with _PDF_TEXT_CACHE_LOCK:
+        if _PDF_TEXT_CACHE is None:
+            _PDF_TEXT_CACHE = PdfTextCache()
+        return _PDF_TEXT_CACHE
+
+
+def extract_pdf_pages(paths, workers=None):
+    """{경로: [(페이지 번호, 텍스트), ...]} (캐시 사용). 캐시 파일을 열 수 없으면 캐시 없이 바로 추출합니다."""
+    try:
+        cache = get_pdf_text_cache()
+    except Exception as e:
+        print(f'pdf_text_cache: 캐시를 열 수 없어 직접 추출합니다: {e}')
+        cache = None
+    if cache is not None:
+        return cache.extract(paths, workers)
+    pages = {}
+    for path in paths:
+        try:
+            pages[path] = extract_page_range(path, 0, len(_pdf_reader(path).pages))
+        except Exception as e:
+            print(f'pdf_text_cache: PDF를 열 수 없습니다: {path} {e}')
+            pages[path] = []
+    return pages
@@ -0,0 +1,165 @@
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from map_layers import feature_collection, make_feature
+
+
+# 도시 전체 지도("유형 X의 모든 시설")를 위한 서버 측 마커 클러스터링과 화면 영역(viewport) 컬링입니다.
+# - PoiClusterIndex는 줌 레벨마다 웹 메르카토르 픽셀 격자(CLUSTER_CELL_PX)로 점들을 미리 묶어 둡니다.
+# - query()는 현재 화면 영역 안의 클러스터(또는 MAX_CLUSTER_ZOOM보다 확대된 경우 개별 점)만 반환하므로
+#   시설 1,900여 개 / 정류장 6,900여 개를 한 번에 보내지 않고도 도시 전체를 보여줄 수 있습니다.
+# - 인덱스는 (레이어, 시설유형)별로 한 번만 만들어 프로세스 전역에 보관합니다.
+
+MIN_ZOOM = 8
+MAX_CLUSTER_ZOOM = 16           # 이보다 확대하면 클러스터 없이 개별 점을 보여줌
+CLUSTER_CELL_PX = 60
+VIEWPORT_PAD = 0.2              # 화면 가장자리 밖으로 조금 더 보내 이동 시 빈 곳이 덜 보이게 함
+MAX_FEATURES = 3000
+
+# 레이어 이름 -> (파일 경로, 인코딩, 이름 컬럼, 위도 컬럼, 경도 컬럼, 유형/부가 정보 컬럼)
+POI_SOURCES = {
+    'facility': (os.path.join('data', 'incheon senior welfare facility.csv'), 'euc-kr', '시설명', 'lat', 'lon', '시설유형'),
+    'bus_stop': (os.path.join('data', 'bus stop.csv'), 'utf-8', '정류소 명', '위도', '경도', '정류소 번호'),
+    'leisure': (os.path.join('data', 'leisure location.csv'), 'CP949', '시설명', 'lat', 'lon', '시설분류'),
+}
+
+
+def _mercator_px(lats, lons, zoom):
+    """위경도 -> 줌 레벨 zoom의 웹 메르카토르 픽셀 좌표(Leaflet과 동일)."""
+    scale = 256.0 * (2 ** zoom)
+    lat_rad = np.radians(np.clip(lats, -85.0511, 85.0511))
+    x = (np.asarray(lons) + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / math.pi) / 2.0 * scale
+    return x, y
+
+
+def _popup_text(layer, name, extra):
+    if layer == 'bus_stop':
+        return f"{name}<br>정류장 번호: {str(extra).split('.')[0]}"
+    return f"{name}<br>{extra}" if extra else str(name)
+
+
+class PoiClusterIndex:
+    """점 목록에 대한 줌 레벨별 격자 클러스터."""
+
+    def __init__(self, layer, names, lats, lons, extras):
+        self.layer = layer
+        self.names = list(names)
+        self.extras = list(extras)
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self._levels = {}
+        for zoom in range(MIN_ZOOM, MAX_CLUSTER_ZOOM + 1):
+            self._levels[zoom] = self._build_level(zoom)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _build_level(self, zoom):
+        """줌 레벨 하나의 클러스터 배열(중심 위경도, 개수, 대표 점 인덱스)."""
+        if len(self.lats) == 0:
+            empty = np.empty(0)
+            return empty, empty, empty.astype(int), empty.astype(int)
+        x, y = _mercator_px(self.lats, self.lons, zoom)
+        cx = np.floor(x / CLUSTER_CELL_PX).astype(np.int64)
+        cy = np.floor(y / CLUSTER_CELL_PX).astype(np.int64)
+        cells = cx * (1 << 32) + cy
+        _, first, inverse, counts = np.unique(cells, return_index=True, return_inverse=True, return_counts=True)
+        lat_c = np.bincount(inverse, weights=self.lats) / counts
+        lon_c = np.bincount(inverse, weights=self.lons) / counts
+        return lat_c, lon_c, counts, first
+
+    def query(self, bounds, zoom):
+        """화면 영역 안의 점/클러스터를 FeatureCollection으로 반환합니다.
+
+        - bounds: (south, west, north, east)
+        - 클러스터 feature는 properties에 count(2 이상)를 가집니다.
+        """
+        south, west, north, east = bounds
+        pad_lat = (north - south) * VIEWPORT_PAD
+        pad_lon = (east - west) * VIEWPORT_PAD
+        south, north = south - pad_lat, north + pad_lat
+        west, east = west - pad_lon, east + pad_lon
+
+        zoom = int(round(zoom))
+        if zoom > MAX_CLUSTER_ZOOM:
+            lat_c, lon_c = self.lats, self.lons
+            counts = np.ones(len(self.lats), dtype=int)
+            first = np.arange(len(self.lats))
+        else:
+            lat_c, lon_c, counts, first = self._levels[max(MIN_ZOOM, zoom)]
+
+        inside = np.nonzero((lat_c >= south) & (lat_c <= north) & (lon_c >= west) & (lon_c <= east))[0]
+        # 너무 많으면 큰 클러스터부터 보냄
+        if len(inside) > MAX_FEATURES:
+            inside = inside[np.argsort(-counts[inside], kind='stable')[:MAX_FEATURES]]
+
+        features = []
+        for i in inside:
+            count = int(counts[i])
+            if count == 1:
+                j = int(first[i])
+                features.append(make_feature(self.lats[j], self.lons[j], _popup_text(self.layer, self.names[j], self.extras[j])))
+            else:
+                features.append(make_feature(lat_c[i], lon_c[i], f'{count}곳', count=count))
+        return feature_collection(features)
+
+
+def bounds_around(center, zoom, width_px=1200, height_px=680):
+    """중심/줌에서 보이는 대략적인 화면 영역 (프론트엔드가 화면 영역을 알려주기 전 첫 화면용)."""
+    lat, lon = float(center[0]), float(center[1])
+    deg_per_px = 360.0 / (256.0 * (2 ** zoom))
+    half_w = deg_per_px * width_px / 2
+    half_h = deg_per_px * height_px / 2 * math.cos(math.radians(lat))
+    return lat - half_h, lon - half_w, lat + half_h, lon + half_w
+
+
+def load_poi_frame(layer):
+    """POI_SOURCES의 CSV를 읽어 (이름, lat, lon, 부가 정보) 컬럼의 DataFrame으로 반환합니다."""
+    path, encoding, name_col, lat_col, lon_col, extra_col = POI_SOURCES[layer]
+    df = pd.read_csv(path, dtype=str, encoding=encoding)
+    out = pd.DataFrame({
+        'name': df[name_col].fillna(''),
+        'lat': pd.to_numeric(df[lat_col], errors='coerce'),
+        'lon': pd.to_numeric(df[lon_col], errors='coerce'),
+        'extra': df[extra_col].fillna('') if extra_col in df.columns else '',
+    })
+    return out.dropna(subset=['lat', 'lon']).reset_index(drop=True)
+
+
+_POI_INDEXES = {}
+_POI_FRAMES = {}
+_POI_LOCK = threading.Lock()
+
+
+def get_poi_index(layer, type_value=None):
+    """(레이어, 시설유형)별 PoiClusterIndex를 처음 호출될 때 만들어 반환합니다.
+
+    type_value는 facility 레이어의 '시설유형' 값이며 None이나 '전체'면 전체 시설을 사용합니다.
+    """
+    if type_value == '전체':
+        type_value = None
+    key = (layer, type_value)
+    with _POI_LOCK:
+        index = _POI_INDEXES.get(key)
+        if index is None:
+            df = _POI_FRAMES.get(layer)
+            if df is None:
+                df = load_poi_frame(layer)
+                _POI_FRAMES[layer] = df
+            if type_value is not None:
+                df = df[df['extra'] == type_value]
+            index = PoiClusterIndex(layer, df['name'], df['lat'], df['lon'], df['extra'])
+            _POI_INDEXES[key] = index
+        return index
+
+
+def poi_types(layer='facility'):
+    """레이어의 유형 값 목록(개수 많은 순)."""
+    get_poi_index(layer)
+    with _POI_LOCK:
+        return _POI_FRAMES[layer]['extra'].value_counts().index.tolist()
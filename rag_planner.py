@@ -0,0 +1,262 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+# 챗봇 RAG 검색 계획기입니다.
+# 이전에는 post_user_and_respond / ask_with_fallback 이 사용자 질문, 결합 쿼리, 후보 키, fallback 맵, 키워드를
+# 하나씩 ask_rag(검색 + Gemini 호출)로 시도했기 때문에 최악의 경우 LLM을 열 번 넘게 순서대로 불렀습니다.
+# 여기서는
+# - plan_queries(): 시도하던 쿼리를 한 번에 모두 만들고(중복 제거, MAX_QUERIES개까지)
+# - retrieve_all(): 모든 쿼리의 벡터 검색을 스레드 풀에서 동시에 실행한 뒤
+# - reciprocal_rank_fusion(): 순위를 RRF로 합쳐 상위 문서만 남깁니다.
+# LLM 호출은 합쳐진 문서로 한 번만 합니다(chatbot_hr_define.ask_planned 참고).
+#
+# 관련도 게이트: 검색 점수(코사인 유사도)만으로 LLM 호출 여부를 먼저 정합니다.
+# - 가장 가까운 문서가 MIN_QUERY_SIMILARITY 미만인 쿼리는 RRF에서 빼고
+# - MIN_DOC_SIMILARITY 미만인 문서는 버립니다.
+# - 통과한 쿼리가 없으면 decision='gemini' 가 되어 RAG 답변 생성 없이 gemini_answer로 넘어갑니다.
+# 이전에는 답변을 끝까지 생성한 뒤 빈 문자열이 아니면 성공으로 봤기 때문에 관련 없는 문서로도 답변했습니다.
+#
+# bm25_index(hybrid_retriever.HybridIndex)를 넘기면 쿼리마다 BM25 순위도 함께 RRF에 넣습니다.
+# 정책 이름이 그대로 들어 있는 청크는 벡터 유사도가 기준에 못 미쳐도 BM25 coverage로 게이트를 통과하므로
+# FALLBACK_MAP 재매핑 없이 사용자 질문 그대로 찾는 경우가 많아집니다.
+
+RRF_K = 60              # RRF 상수 (순위 1과 2의 점수 차이를 완만하게)
+PER_QUERY_K = 10        # 쿼리 하나당 가져오는 문서 수 (기존 retriever와 같은 k=10)
+FUSED_K = 10            # LLM에 넘기는 문서 수
+MAX_QUERIES = 12
+MAX_WORKERS = 8
+
+# 관련도 기준 (코사인 유사도). text-embedding-004 에서 관련 있는 질문-청크는 대체로 0.65 이상,
+# 주제가 다른 질문은 0.55 아래로 나옵니다.
+MIN_QUERY_SIMILARITY = 0.62
+MIN_DOC_SIMILARITY = 0.55
+# 임베딩 백엔드별 (MIN_QUERY_SIMILARITY, MIN_DOC_SIMILARITY).
+# local(LocalHashEmbeddings)은 글자 n-gram 해시라 유사도 범위가 낮습니다: 관련 질문 0.25~0.5, 무관한 질문 0.16 이하.
+RELEVANCE_THRESHOLDS = {
+    'google': (MIN_QUERY_SIMILARITY, MIN_DOC_SIMILARITY),
+    'local': (0.22, 0.15),
+}
+# BM25 관련도 기준 (local_rag.BM25Index.normalized_scores). 질문 bigram이 모두 들어 있는 청크는 1 안팎,
+# 주제가 다른 질문(날씨, 주식 등)은 0.2 아래, 조사/어미가 많은 긴 일반 질문은 0.4 안팎입니다.
+MIN_BM25_COVERAGE = 0.6
+MIN_BM25_DOC_COVERAGE = 0.3
+# chroma_db 'langchain' 컬렉션의 거리 함수 (hnsw space). 임베딩은 길이 1로 정규화되어 있습니다.
+DISTANCE_SPACE = 'l2'
+
+# 문서에 존재할 가능성이 높은 토픽으로 재매핑 (UI에서 사용하는 q 문자열 -> PDF 내 섹션/문구)
+FALLBACK_MAP = {
+    "건강보험료 지원 - 저소득 노인": "국고보조금 정산",
+    "의료비 지원 - 대상 및 금액": "장기요양기관 운영 및 급여비용 부담",
+    "노인일자리 및 사회활동 지원사업 - 지원금": "시설 운영비 지출",
+    "노인일자리 및 사회활동 지원사업": "노인복지시설 기준",
+    "노인일자리 참여 자격": "노인복지시설 기준",
+    "공익형 일자리 신청 방법": "노인일자리 및 사회활동 지원사업",
+    "방문요양서비스 신청 방법": "장기요양기관 운영 및 급여비용 부담",
+    "장기요양보험 등급판정 방법": "장기요양기관 운영 및 급여비용 부담",
+    "노인학대 신고 방법": "노인학대 예방 교육",
+    "학대피해노인 전용쉼터 이용 방법": "학대피해노인 보호",
+    "노인교실 프로그램 안내": "여가문화 활동 및 프로그램 운영",
+    "경로당 운영 참여 방법": "여가문화 활동 및 프로그램 운영",
+
+    # 추출 스크립트 결과 기반 추천 매핑
+    "노인일자리 및 사회활동 지원사업 주요 유형 및 설명": "노인복지 일반현황",
+    "노인일자리 참여 자격 및 신청 절차 안내": "노인복지 일반현황",
+    "노인일자리 활동의 급여 및 수당 지급 방식 안내": "사업별 지원기준단가",
+
+    # 지원금/혜택 관련
+    "노인복지 수당 및 지원금의 종류와 지급 기준 안내": "지원 대상 및 범위",
+    "저소득층 대상 의료비 및 지원 제도 운영 방식과 신청 기준 안내": "지원 대상 및 범위",
+    "저소득 노인 대상 건강보험료 지원 프로그램의 주요 내용 및 신청 절차": "지원 대상 및 범위",
+
+    # 돌봄·요양 관련
+    "방문요양 서비스의 제공 범위 및 신청 방법(장기요양 관련) 안내": "장기요양기관 운영 및 급여비용 부담",
+    "장기요양보험 등급 판정 절차 및 등급 기준 안내": "장기요양인정신청",
+
+    # 여가·문화활동 관련
+    "2025년 문화강좌 및 여가프로그램의 개요, 신청방법 및 일정 안내": "프로그램 운영",
+    "경로당 프로그램 참여 방법 및 운영시간(운영 안내)": "프로그램 운영",
+
+    # 긴급지원·상담 관련
+    "노인학대 신고 절차 및 긴급보호 서비스 이용 방법 안내": "긴급복지의료지원",
+    "학대피해 노인 보호(쉼터) 이용 자격 및 연락처 안내": "학대피해노인 보호",
+}
+
+
+def plan_queries(question, candidates=None, max_queries=MAX_QUERIES):
+    """검색할 (방법, 쿼리) 목록을 만듭니다. 순서는 기존 순차 폴백의 시도 순서와 같습니다.
+
+    - user_label: 사용자 질문 그대로
+    - combined: '후보 키 + 질문'
+    - candidate: 문서 친화적인 후보 키
+    - fallback_map: FALLBACK_MAP으로 재매핑한 토픽
+    - keyword: 후보가 없을 때 질문을 공백으로 나눈 두 글자 이상의 단어
+    """
+    candidates = [c for c in (candidates or []) if c]
+    planned = []
+    if question:
+        planned.append(('user_label', question))
+    for c in candidates:
+        if question and c != question:
+            planned.append(('combined', f"{c} {question}"))
+    for c in candidates:
+        planned.append(('candidate', c))
+    for key in (candidates[:1] or [question]):
+        alt = FALLBACK_MAP.get(key)
+        if alt:
+            planned.append(('fallback_map', alt))
+    if not candidates and question:
+        for p in question.split():
+            if len(p) >= 2:
+                planned.append(('keyword', p))
+
+    seen = set()
+    queries = []
+    for method, query in planned:
+        if query in seen:
+            continue
+        seen.add(query)
+        queries.append((method, query))
+    return queries[:max_queries]
+
+
+def distance_to_similarity(distance, space=DISTANCE_SPACE):
+    """Chroma 거리 -> 코사인 유사도. l2는 제곱 거리이므로 정규화된 벡터에서 cos = 1 - d / 2."""
+    if space == 'cosine':
+        return 1.0 - distance
+    if space == 'ip':
+        return -distance
+    return 1.0 - distance / 2.0
+
+
+def score_query(vectordb, query, k=PER_QUERY_K):
+    """query로 검색해 [(문서, 코사인 유사도), ...]를 유사도 내림차순으로 반환합니다 (LLM 호출 없음)."""
+    results = vectordb.similarity_search_with_score(query, k=k)
+    scored = [(doc, round(distance_to_similarity(d), 4)) for doc, d in results]
+    scored.sort(key=lambda item: -item[1])
+    return scored
+
+
+def is_relevant(scored, min_similarity=MIN_QUERY_SIMILARITY):
+    """score_query 결과의 1위 문서가 기준 이상인지."""
+    return bool(scored) and scored[0][1] >= min_similarity
+
+
+def retrieve_all(vectordb, queries, k=PER_QUERY_K, max_workers=MAX_WORKERS):
+    """queries의 검색을 동시에 실행하고 {쿼리: [(문서, 유사도), ...]}를 반환합니다. 실패한 쿼리는 빈 리스트."""
+    texts = [q for _, q in queries]
+    if not texts:
+        return {}
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(texts))) as pool:
+        futures = {q: pool.submit(score_query, vectordb, q, k) for q in texts}
+        for q, fut in futures.items():
+            try:
+                results[q] = fut.result() or []
+            except Exception as e:
+                print(f"rag_planner: 검색 실패: {q} {e}")
+                results[q] = []
+    return results
+
+
+def apply_relevance_gate(scored_lists, min_query=MIN_QUERY_SIMILARITY, min_doc=MIN_DOC_SIMILARITY):
+    """관련도 기준을 통과한 쿼리의 문서 리스트만 {쿼리: 문서 리스트}로 반환합니다."""
+    ranked = {}
+    for query, scored in scored_lists.items():
+        if not is_relevant(scored, min_query):
+            continue
+        ranked[query] = [doc for doc, sim in scored if sim >= min_doc]
+    return ranked
+
+
+def _doc_key(doc):
+    """같은 청크를 여러 쿼리가 찾았을 때 하나로 합치기 위한 키."""
+    doc_id = getattr(doc, 'id', None)
+    if doc_id:
+        return doc_id
+    meta = doc.metadata or {}
+    return (Path(str(meta.get('source', ''))).name, meta.get('page'), doc.page_content)
+
+
+def reciprocal_rank_fusion(ranked_lists, k=RRF_K, top_n=FUSED_K):
+    """여러 순위 리스트를 RRF(1 / (k + 순위))로 합칩니다.
+
+    ranked_lists: {쿼리: 문서 리스트}
+    반환: [(문서, 점수, 이 문서를 찾은 쿼리 목록), ...] 점수 내림차순
+    """
+    scores = {}
+    docs = {}
+    hits = {}
+    for query, ranked in ranked_lists.items():
+        for rank, doc in enumerate(ranked, 1):
+            key = _doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+            hits.setdefault(key, []).append(query)
+    order = sorted(scores, key=lambda key: -scores[key])[:top_n]
+    return [(docs[key], round(scores[key], 5), hits[key]) for key in order]
+
+
+def bm25_all(bm25_index, queries, k=PER_QUERY_K):
+    """queries의 BM25 검색 결과 {쿼리: [(문서, coverage), ...]}. 메모리 색인이라 순서대로 실행합니다."""
+    results = {}
+    for _, q in queries:
+        try:
+            results[q] = bm25_index.search(q, k)
+        except Exception as e:
+            print(f"rag_planner: BM25 검색 실패: {q} {e}")
+            results[q] = []
+    return results
+
+
+def retrieve(vectordb, question, candidates=None, top_n=FUSED_K, thresholds=None, rerank=None, bm25_index=None):
+    """계획 -> 동시 검색 -> 관련도 게이트 -> RRF (-> 재정렬)를 한 번에 실행합니다 (LLM 호출 없음).
+
+    thresholds: (쿼리 기준, 문서 기준) 코사인 유사도. 기본은 google 임베딩 기준.
+    rerank: rerank(question, docs, top_n) -> docs. 주어지면 RRF 상위 top_n * 2개를 다시 정렬해 top_n개를 남깁니다.
+    bm25_index: search(query, k) -> [(문서, coverage)]. 주어지면 쿼리마다 BM25 순위도 RRF에 합칩니다
+    (게이트는 MIN_BM25_COVERAGE / MIN_BM25_DOC_COVERAGE).
+
+    반환 dict:
+    - 'queries': [(방법, 쿼리)], 'scores': {쿼리: 1위 문서 유사도}, 'bm25_scores': {쿼리: 1위 coverage}
+    - 'decision': 'rag'(합친 문서로 답변) 또는 'gemini'(기준을 넘은 쿼리가 없음)
+    - 'docs': LLM에 넘길 문서, 'fused': RRF 결과
+    - 'best': 1위 유사도가 가장 높은 (방법, 쿼리) 또는 None, 'ms': 검색 시간
+    """
+    t0 = time.perf_counter()
+    queries = plan_queries(question, candidates)
+    scored_lists = retrieve_all(vectordb, queries)
+    min_query, min_doc = thresholds or (MIN_QUERY_SIMILARITY, MIN_DOC_SIMILARITY)
+    scores = {q: (scored[0][1] if scored else 0.0) for q, scored in scored_lists.items()}
+    gated = apply_relevance_gate(scored_lists, min_query, min_doc)
+    bm25_scores = {}
+    if bm25_index is not None:
+        bm25_lists = bm25_all(bm25_index, queries)
+        bm25_scores = {q: (hits[0][1] if hits else 0.0) for q, hits in bm25_lists.items()}
+        for q, hits in apply_relevance_gate(bm25_lists, MIN_BM25_COVERAGE, MIN_BM25_DOC_COVERAGE).items():
+            gated[f"bm25:{q}"] = hits
+    fused = reciprocal_rank_fusion(gated, top_n=top_n * 2 if rerank else top_n)
+    docs = [doc for doc, _, _ in fused]
+    if rerank and docs:
+        docs = rerank(question, docs, top_n)
+        fused = fused[:top_n]
+    best = None
+    if fused:
+        # 기준을 넘은 쿼리 중 1위 유사도가 가장 높은 변형 (동점이면 계획 순서가 앞선 것).
+        # 벡터 기준을 넘은 쿼리가 없으면 BM25 coverage가 가장 높은 변형.
+        best = max(((m, q) for m, q in queries if scores.get(q, 0.0) >= min_query),
+                   key=lambda mq: scores[mq[1]], default=None)
+        if best is None:
+            best = max(((m, q) for m, q in queries if bm25_scores.get(q, 0.0) >= MIN_BM25_COVERAGE),
+                       key=lambda mq: bm25_scores[mq[1]], default=None)
+    return {
+        'queries': queries,
+        'scores': scores,
+        'bm25_scores': bm25_scores,
+        'decision': 'rag' if docs else 'gemini',
+        'docs': docs,
+        'fused': fused,
+        'best': best,
+        'ms': round((time.perf_counter() - t0) * 1000, 1),
+    }
@@ -0,0 +1,183 @@
+import math
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+
+# 도로 경로(draw_route_on_map / compute_route_coords)를 위한 그래프 캐시와 경로 캐시입니다.
+# - load_graph(): osmnx 그래프 피클을 프로세스 전역에 한 번만 읽어 둡니다(파일이 바뀌면 다시 읽음).
+#   이전에는 경로를 그리거나 도로 거리를 잴 때마다 피클 전체를 다시 읽었습니다.
+# - RouteCache: (출발 노드, 도착 노드, 단순화 허용 오차)를 키로 단순화된 경로를 인코딩된 폴리라인 문자열로 저장합니다.
+#   같은 경로를 다시 볼 때는 최단 경로 탐색도, 수백 개의 노드 좌표도 필요 없습니다.
+# - simplify(): Douglas–Peucker 단순화 (허용 오차는 미터 단위)
+# - encode_polyline()/decode_polyline(): Google encoded polyline 형식 (precision 5 = 약 1m)
+
+ROUTE_SIMPLIFY_TOLERANCE_M = 5.0
+POLYLINE_PRECISION = 5
+MAX_ROUTES = 512
+
+_EARTH_R = 6371000.0
+
+
+# ---------------------------------------------------------------------- 단순화 / 인코딩
+def _perp_dist_m(p, a, b, cos_lat):
+    """점 p와 선분 a-b 사이의 거리(m). 좁은 영역이므로 등장방형 근사를 사용합니다."""
+    px, py = p[1] * cos_lat, p[0]
+    ax, ay = a[1] * cos_lat, a[0]
+    bx, by = b[1] * cos_lat, b[0]
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        d = math.hypot(px - ax, py - ay)
+    else:
+        t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+        d = math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+    return math.radians(d) * _EARTH_R
+
+
+def simplify(coords, tolerance_m=ROUTE_SIMPLIFY_TOLERANCE_M):
+    """[(lat, lon), ...] 경로를 Douglas–Peucker로 단순화합니다. 양 끝점은 항상 유지됩니다."""
+    coords = [(float(lat), float(lon)) for lat, lon in coords]
+    if len(coords) < 3 or tolerance_m <= 0:
+        return coords
+    cos_lat = math.cos(math.radians(sum(c[0] for c in coords) / len(coords)))
+    keep = [False] * len(coords)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(coords) - 1)]
+    while stack:
+        start, end = stack.pop()
+        max_d, idx = 0.0, None
+        for i in range(start + 1, end):
+            d = _perp_dist_m(coords[i], coords[start], coords[end], cos_lat)
+            if d > max_d:
+                max_d, idx = d, i
+        if idx is not None and max_d > tolerance_m:
+            keep[idx] = True
+            stack.append((start, idx))
+            stack.append((idx, end))
+    return [c for c, k in zip(coords, keep) if k]
+
+
+def _encode_value(v):
+    v = ~(v << 1) if v < 0 else (v << 1)
+    out = []
+    while v >= 0x20:
+        out.append(chr((0x20 | (v & 0x1f)) + 63))
+        v >>= 5
+    out.append(chr(v + 63))
+    return ''.join(out)
+
+
+def encode_polyline(coords, precision=POLYLINE_PRECISION):
+    """[(lat, lon), ...] -> encoded polyline 문자열."""
+    factor = 10 ** precision
+    out = []
+    prev_lat = prev_lon = 0
+    for lat, lon in coords:
+        ilat = int(round(float(lat) * factor))
+        ilon = int(round(float(lon) * factor))
+        out.append(_encode_value(ilat - prev_lat))
+        out.append(_encode_value(ilon - prev_lon))
+        prev_lat, prev_lon = ilat, ilon
+    return ''.join(out)
+
+
+def decode_polyline(encoded, precision=POLYLINE_PRECISION):
+    """encoded polyline 문자열 -> [(lat, lon), ...]."""
+    factor = float(10 ** precision)
+    coords = []
+    index = lat = lon = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1f) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else (result >> 1))
+        lat += deltas[0]
+        lon += deltas[1]
+        coords.append((lat / factor, lon / factor))
+    return coords
+
+
+# ---------------------------------------------------------------------- 그래프 캐시
+_GRAPHS = {}
+_GRAPH_LOCK = threading.Lock()
+
+
+def load_graph(path):
+    """osmnx 그래프 피클을 한 번만 읽어 반환합니다. 파일이 없거나 읽지 못하면 None."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _GRAPH_LOCK:
+        cached = _GRAPHS.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, 'rb') as fh:
+                G = pickle.load(fh)
+        except Exception as e:
+            print(f'route_cache: 그래프를 읽지 못했습니다: {path} {e}')
+            return None
+        _GRAPHS[path] = (mtime, G)
+        return G
+
+
+def graph_key(path):
+    """경로 캐시 키에 넣을 그래프 식별자 (파일이 바뀌면 달라짐)."""
+    with _GRAPH_LOCK:
+        cached = _GRAPHS.get(path)
+    return (path, cached[0] if cached else None)
+
+
+# ---------------------------------------------------------------------- 경로 캐시
+class RouteCache:
+    def __init__(self, max_entries=MAX_ROUTES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (encoded polyline, 원래 좌표 수)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, encoded, raw_points):
+        with self._lock:
+            self._entries[key] = (encoded, raw_points)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            encoded_bytes = sum(len(e[0]) for e in self._entries.values())
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'encoded_bytes': encoded_bytes,
+            }
+
+
+_ROUTE_CACHE = RouteCache()
+
+
+def get_route_cache():
+    return _ROUTE_CACHE
@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+
+# 저장소 루트에서 실행: python tools/bench_map_payload.py
+# 기존 방식(마커마다 folium.Marker + make_popup IFrame)과 map_layers의 GeoJSON 레이어 방식으로
+# 같은 지도를 만들고 fmap._repr_html_() 크기(바이트)와 생성 시간을 비교합니다.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import folium
+import pandas as pd
+
+from define import make_popup
+from map_layers import add_feature_layer, feature_collection, make_feature
+
+CENTER = (37.4563, 126.7052)   # 인천시청 부근
+
+# (이름, CSV 경로, 인코딩, 이름 컬럼, 위도, 경도, 카테고리)
+SOURCES = [
+    ('시설', os.path.join('data', 'incheon senior welfare facility.csv'), 'euc-kr', '시설명', 'lat', 'lon', 'facility'),
+    ('맛집', os.path.join('data', 'restaurant category.csv'), 'euc-kr', '식당명', 'lat', 'lon', 'restaurant'),
+    ('여가', os.path.join('data', 'leisure location.csv'), 'CP949', '시설명', 'lat', 'lon', 'leisure'),
+    ('정류장', os.path.join('data', 'bus stop.csv'), 'utf-8', '정류소 명', '위도', '경도', 'bus_user'),
+]
+ICONS = {
+    'facility': dict(color='red', icon='flag'),
+    'restaurant': dict(color='orange', icon='cutlery', prefix='fa'),
+    'leisure': dict(color='purple', icon='star', prefix='fa'),
+    'bus_user': dict(color='green', icon='bus', prefix='fa'),
+}
+
+
+def load_points(n):
+    out = []
+    for label, path, enc, name_col, lat_col, lon_col, category in SOURCES:
+        df = pd.read_csv(path, dtype=str, encoding=enc).dropna(subset=[lat_col, lon_col]).head(n)
+        rows = [(r[name_col], r.get('도로명 주소', ''), float(r[lat_col]), float(r[lon_col])) for _, r in df.iterrows()]
+        out.append((category, rows))
+    return out
+
+
+def build_legacy(points):
+    fmap = folium.Map(location=CENTER, zoom_start=14)
+    for category, rows in points:
+        for name, addr, lat, lon in rows:
+            folium.Marker([lat, lon], popup=make_popup(f'{name}<br>{addr}'), icon=folium.Icon(**ICONS[category])).add_to(fmap)
+    return fmap
+
+
+def build_geojson(points):
+    fmap = folium.Map(location=CENTER, zoom_start=14)
+    for category, rows in points:
+        fc = feature_collection(make_feature(lat, lon, f'{name}<br>{addr}') for name, addr, lat, lon in rows)
+        add_feature_layer(fmap, fc, category)
+    return fmap
+
+
+def measure(builder, points):
+    start = time.perf_counter()
+    html = builder(points)._repr_html_()
+    return len(html.encode('utf-8')), (time.perf_counter() - start) * 1000
+
+
+if __name__ == '__main__':
+    print(f"{'마커/종류':>9} {'기존(byte)':>12} {'GeoJSON(byte)':>14} {'비율':>6} {'기존(ms)':>9} {'GeoJSON(ms)':>12}")
+    for n in (5, 20, 100, 500):
+        points = load_points(n)
+        legacy_bytes, legacy_ms = measure(build_legacy, points)
+        geo_bytes, geo_ms = measure(build_geojson, points)
+        print(f'{n:>9} {legacy_bytes:>12,} {geo_bytes:>14,} {geo_bytes / legacy_bytes:>6.2f} {legacy_ms:>9.1f} {geo_ms:>12.1f}')
@@ -0,0 +1,117 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+# 저장소 루트에서 실행: python tools/build_poi_tiles.py [--layers facility bus_stop leisure] [--force]
+# 정적인 POI 레이어(노인복지시설, 버스 정류장, 여가시설)를 z/x/y PNG 타일 피라미드로 미리 그려
+# static/tiles/<layer>/{z}/{x}/{y}.png 에 저장합니다. 점이 하나도 없는 타일은 만들지 않습니다.
+# Streamlit 정적 파일 서빙(.streamlit/config.toml의 enableStaticServing)으로 /app/static/tiles/... 에서 제공되며
+# 지도에서는 map_layers.add_poi_tile_layers / poi_tile_layer로 타일 레이어로 붙입니다.
+# 원본 CSV가 바뀌지 않았으면(manifest.json의 해시 비교) 다시 그리지 않습니다.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+from map_layers import TILE_ROOT, TILE_MAX_ZOOM, TILE_MIN_ZOOM
+from poi_cluster import POI_SOURCES, _mercator_px, load_poi_frame
+
+TILE_SIZE = 256
+
+# 레이어별 점 색상 (RGBA, map_layers.LAYER_STYLES의 마커 색상과 비슷하게)
+TILE_COLORS = {
+    'facility': (214, 62, 42, 230),
+    'bus_stop': (53, 150, 60, 220),
+    'leisure': (145, 75, 180, 230),
+}
+
+
+def _radius(zoom):
+    """줌 레벨별 점 반지름(px)."""
+    if zoom <= 12:
+        return 2
+    if zoom <= 14:
+        return 3
+    return 4
+
+
+def _source_hash(layer):
+    path = POI_SOURCES[layer][0]
+    h = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        h.update(fh.read())
+    return h.hexdigest()
+
+
+def render_layer(layer, min_zoom=TILE_MIN_ZOOM, max_zoom=TILE_MAX_ZOOM, out_root=TILE_ROOT):
+    """레이어 하나의 타일을 모두 그리고 만든 타일 수를 반환합니다."""
+    df = load_poi_frame(layer)
+    lats = df['lat'].to_numpy(dtype=float)
+    lons = df['lon'].to_numpy(dtype=float)
+    color = TILE_COLORS.get(layer, (0, 0, 0, 220))
+    # 이전 타일 중 더 이상 점이 없는 타일이 남지 않도록 레이어 폴더를 비우고 다시 그림
+    shutil.rmtree(os.path.join(out_root, layer), ignore_errors=True)
+    written = 0
+    for zoom in range(min_zoom, max_zoom + 1):
+        r = _radius(zoom)
+        px, py = _mercator_px(lats, lons, zoom)
+        # 타일 경계 근처의 점은 이웃 타일에도 그려야 잘리지 않으므로 반지름만큼 넓혀서 타일을 배정
+        tiles = {}
+        for x, y in zip(px, py):
+            for tx in range(int((x - r) // TILE_SIZE), int((x + r) // TILE_SIZE) + 1):
+                for ty in range(int((y - r) // TILE_SIZE), int((y + r) // TILE_SIZE) + 1):
+                    tiles.setdefault((tx, ty), []).append((x - tx * TILE_SIZE, y - ty * TILE_SIZE))
+        for (tx, ty), points in tiles.items():
+            img = Image.new('RGBA', (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(img)
+            for x, y in points:
+                draw.ellipse((x - r, y - r, x + r, y + r), fill=color, outline=(255, 255, 255, 255))
+            tile_dir = os.path.join(out_root, layer, str(zoom), str(tx))
+            os.makedirs(tile_dir, exist_ok=True)
+            img.save(os.path.join(tile_dir, f'{ty}.png'), optimize=True)
+            written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='POI 타일 피라미드 생성')
+    parser.add_argument('--layers', nargs='+', default=list(POI_SOURCES.keys()), choices=list(POI_SOURCES.keys()))
+    parser.add_argument('--min-zoom', type=int, default=TILE_MIN_ZOOM)
+    parser.add_argument('--max-zoom', type=int, default=TILE_MAX_ZOOM)
+    parser.add_argument('--force', action='store_true', help='원본이 바뀌지 않았어도 다시 생성')
+    args = parser.parse_args()
+
+    manifest_path = os.path.join(TILE_ROOT, 'manifest.json')
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as fh:
+            manifest = json.load(fh)
+
+    for layer in args.layers:
+        source_hash = _source_hash(layer)
+        prev = manifest.get(layer, {})
+        if not args.force and prev.get('source_hash') == source_hash \
+                and prev.get('min_zoom') == args.min_zoom and prev.get('max_zoom') == args.max_zoom:
+            print(f'{layer}: 변경 없음, 건너뜀')
+            continue
+        t0 = time.perf_counter()
+        count = render_layer(layer, args.min_zoom, args.max_zoom)
+        print(f'{layer}: 타일 {count}개 생성 ({time.perf_counter() - t0:.1f}s)')
+        manifest[layer] = {
+            'source_hash': source_hash,
+            'min_zoom': args.min_zoom,
+            'max_zoom': args.max_zoom,
+            'tiles': count,
+            'built_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+    os.makedirs(TILE_ROOT, exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
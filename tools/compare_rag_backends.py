@@ -0,0 +1,185 @@
+import argparse
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# 저장소 루트에서 실행: python tools/compare_rag_backends.py [--k 5] [--repeat 3] [--backends local local+hybrid bm25 google]
+# 챗봇 RAG 검색 백엔드의 품질과 지연시간을 비교합니다.
+# - google: chroma_db 원본 컬렉션 + text-embedding-004 (GOOGLE_API_KEY가 없으면 건너뜀)
+# - local: LocalHashEmbeddings로 다시 임베딩한 로컬 컬렉션 (local_rag.build_local_collection)
+# - *+bm25: 벡터 검색 상위 2k개를 BM25로 재정렬 (local_rag.bm25_rerank)
+# - bm25: 전체 청크에 대한 BM25만 사용
+# - *+hybrid: 벡터 검색과 전체 청크 BM25 순위를 RRF로 합침 (hybrid_retriever.hybrid_search)
+# 품질: EVAL_SET의 키워드가 들어 있는 청크를 정답으로 보고 hit@1, precision@k, MRR을 계산합니다.
+# google이 있으면 google 결과와의 겹침(overlap@k)도 출력합니다.
+# 원본 chroma_db는 열기만 해도 파일이 바뀌므로 임시 폴더에 복사해서 사용합니다.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import chromadb
+from langchain_community.vectorstores import Chroma
+
+import hybrid_retriever
+import local_rag
+import rag_planner
+from chatbot_hr_define import CHROMA_DIR, EMBED_MODEL
+from embedding_cache import CachedEmbeddings, LocalHashEmbeddings
+
+# (질문, 정답 청크에 들어 있어야 하는 키워드 중 하나)
+EVAL_SET = [
+    ("기초연금: 신청 방법·지급 방식·감액 기준 안내", ["기초연금"]),
+    ("노인장기요양보험: 급여 종류(방문요양·시설급여 등) 및 신청 방법", ["장기요양급여", "장기요양인정"]),
+    ("노인일자리 지원사업: 참여 유형·자격·신청처 안내", ["노인일자리"]),
+    ("노인맞춤돌봄서비스: 제공 항목(안전·사회참여·생활교육)과 이용방법 안내", ["노인맞춤돌봄"]),
+    ("노인 주거 지원: 공공임대주택·주거지원 및 신청절차 안내", ["임대주택", "특별공급"]),
+    ("무릎 관절 수술비 지원 받을 수 있나요?", ["무릎관절"]),
+    ("임플란트도 건강보험이 되나요", ["임플란트"]),
+    ("부모님 부양하면 세금 공제가 되나요", ["경로우대"]),
+    ("노인학대 신고는 어디에 하나요", ["노인학대"]),
+    ("경로당에서는 어떤 프로그램을 하나요", ["경로당"]),
+    ("요양원 같은 노인의료복지시설 입소 자격", ["노인의료복지시설"]),
+    ("치매 검진이나 치료 지원이 있나요", ["치매"]),
+]
+
+
+def _compact(text):
+    return re.sub(r'\s+', '', text)
+
+
+def is_relevant(doc, keywords):
+    body = _compact(doc.page_content)
+    return any(_compact(k) in body for k in keywords)
+
+
+def quality(results, k):
+    """results: [(문서 리스트, 키워드)] -> (hit@1, precision@k, MRR)."""
+    hits1, precs, rrs = [], [], []
+    for docs, keywords in results:
+        flags = [is_relevant(d, keywords) for d in docs[:k]]
+        hits1.append(1.0 if flags and flags[0] else 0.0)
+        precs.append(sum(flags) / float(k))
+        rrs.append(next((1.0 / (i + 1) for i, f in enumerate(flags) if f), 0.0))
+    return statistics.mean(hits1), statistics.mean(precs), statistics.mean(rrs)
+
+
+def _vector_search(vectordb, k, rerank):
+    def search(question):
+        docs = [d for d, _ in rag_planner.score_query(vectordb, question, k * 2 if rerank else k)]
+        return local_rag.bm25_rerank(question, docs, k) if rerank else docs[:k]
+    return search
+
+
+def _hybrid_search(vectordb, k):
+    index = hybrid_retriever.get_hybrid_index(vectordb)
+    return lambda question: [d for d, _, _ in hybrid_retriever.hybrid_search(vectordb, question, k, index=index)]
+
+
+def make_backends(names, workdir, k):
+    """이름 -> search(question) -> 문서 리스트. 만들 수 없는 백엔드는 이유와 함께 건너뜁니다."""
+    src_dir = os.path.join(workdir, 'chroma_src')
+    shutil.copytree(os.path.join(ROOT, CHROMA_DIR), src_dir)
+    backends, build_ms = {}, {}
+
+    if any(n.startswith('local') for n in names):
+        t0 = time.perf_counter()
+        local_db = local_rag.load_local_vectorstore(CachedEmbeddings(LocalHashEmbeddings(), db_path=None),
+                                                    src_dir, os.path.join(workdir, 'chroma_local'), rebuild=True)
+        build_ms['local'] = (time.perf_counter() - t0) * 1000
+        for name in names:
+            if name in ('local', 'local+bm25'):
+                backends[name] = _vector_search(local_db, k, rerank=name.endswith('+bm25'))
+            elif name == 'local+hybrid':
+                backends[name] = _hybrid_search(local_db, k)
+
+    if 'bm25' in names:
+        t0 = time.perf_counter()
+        data = chromadb.PersistentClient(path=src_dir).get_collection(local_rag.SOURCE_COLLECTION).get(
+            include=['documents', 'metadatas'])
+        from langchain_core.documents import Document
+        corpus = [Document(page_content=t, metadata=m or {}) for t, m in zip(data['documents'], data['metadatas'])]
+        index = local_rag.BM25Index([d.page_content for d in corpus])
+        build_ms['bm25'] = (time.perf_counter() - t0) * 1000
+        backends['bm25'] = lambda q: [corpus[i] for i, _ in index.top_k(q, k)]
+
+    if any(n.startswith('google') for n in names):
+        if not (os.environ.get('GOOGLE_API_KEY') or os.environ.get('GEMINI_API_KEY')):
+            print('google: GOOGLE_API_KEY가 없어 건너뜀')
+        else:
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+            embeddings = CachedEmbeddings(GoogleGenerativeAIEmbeddings(model=EMBED_MODEL), db_path=None)
+            google_db = Chroma(client=chromadb.PersistentClient(path=src_dir),
+                               collection_name=local_rag.SOURCE_COLLECTION, embedding_function=embeddings)
+            for name in names:
+                if name in ('google', 'google+bm25'):
+                    backends[name] = _vector_search(google_db, k, rerank=name.endswith('+bm25'))
+                elif name == 'google+hybrid':
+                    backends[name] = _hybrid_search(google_db, k)
+    return backends, build_ms
+
+
+def run(search, repeat):
+    """EVAL_SET 전체를 검색해 ([(문서, 키워드)], 질의별 지연시간 ms 리스트)를 반환합니다.
+
+    첫 번째 반복은 임베딩 캐시를 채우는 콜드 실행으로 따로 기록합니다."""
+    results, cold, warm = [], [], []
+    for i in range(repeat):
+        for question, keywords in EVAL_SET:
+            t0 = time.perf_counter()
+            docs = search(question)
+            ms = (time.perf_counter() - t0) * 1000
+            (cold if i == 0 else warm).append(ms)
+            if i == 0:
+                results.append((docs, keywords))
+    return results, cold, warm
+
+
+def _p95(values):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RAG 검색 백엔드 품질/지연시간 비교')
+    parser.add_argument('--backends', nargs='+', default=['local', 'local+bm25', 'local+hybrid', 'bm25',
+                                                       'google', 'google+bm25', 'google+hybrid'])
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='rag_compare_')
+    try:
+        backends, build_ms = make_backends(args.backends, workdir, args.k)
+        for name, ms in build_ms.items():
+            print(f'{name} 인덱스 생성: {ms:.0f} ms')
+        print(f'\n질문 {len(EVAL_SET)}개, k={args.k}')
+        print(f'{"backend":14s} {"hit@1":>6s} {"P@k":>6s} {"MRR":>6s} {"cold p50":>9s} {"warm p50":>9s} {"warm p95":>9s}')
+        ranked = {}
+        for name in args.backends:
+            if name not in backends:
+                continue
+            results, cold, warm = run(backends[name], args.repeat)
+            ranked[name] = results
+            h1, prec, mrr = quality(results, args.k)
+            warm = warm or cold
+            print(f'{name:14s} {h1:6.2f} {prec:6.2f} {mrr:6.2f} {statistics.median(cold):9.1f} '
+                  f'{statistics.median(warm):9.1f} {_p95(warm):9.1f}')
+
+        if 'google' in ranked:
+            print('\ngoogle 결과와의 겹침 (overlap@k)')
+            ref = [set(rag_planner._doc_key(d) for d in docs) for docs, _ in ranked['google']]
+            for name, results in ranked.items():
+                if name == 'google':
+                    continue
+                overlaps = [len(ref[i] & set(rag_planner._doc_key(d) for d in docs)) / float(args.k)
+                            for i, (docs, _) in enumerate(results)]
+                print(f'  {name:14s} {statistics.mean(overlaps):.2f}')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# 저장소 루트에서 실행: python tools/import_time_report.py [--repeat 3] [--top 10]
+# 새 파이썬 프로세스에서 `python -X importtime`으로 모듈을 import해 콜드 스타트 시간을 잽니다.
+# - cold start: app_main만 import (홈 화면을 띄우는 데 필요한 것)
+# - eager: app_main + 모든 페이지 모듈 import (페이지를 지연 import하기 전의 시작 비용)
+# - 페이지별: 해당 페이지로 처음 이동할 때 추가로 드는 시간
+# streamlit 자체의 import 시간은 어느 경우에나 들기 때문에 제외합니다.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app_main import PAGES
+
+PAGE_MODULES = sorted({module for module, _ in PAGES.values()})
+
+
+def measure(modules):
+    """새 프로세스에서 modules를 import하고 ({패키지: self us 합}, 총 us, 오류 메시지 목록)을 반환합니다.
+
+    한 모듈의 import가 실패해도 나머지 모듈은 계속 import합니다.
+    """
+    code = (
+        'import streamlit\n'
+        f'for m in {modules!r}:\n'
+        '    try:\n'
+        '        __import__(m)\n'
+        '    except Exception as e:\n'
+        '        print(f"IMPORT_ERROR {m}: {type(e).__name__}: {e}")\n'
+    )
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    packages = {}
+    total = 0
+    in_streamlit = False
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        self_us = int(parts[0])
+        cum_us = int(parts[1])
+        raw = parts[2].rstrip()
+        depth = (len(raw) - len(raw.lstrip())) // 2
+        name = raw.strip()
+        if depth == 0:
+            # streamlit 자체(과 그 하위 모듈)는 어느 경우에나 들기 때문에 제외
+            in_streamlit = name == 'streamlit'
+            if name in modules:
+                total += cum_us
+        if not in_streamlit:
+            root = name.split('.')[0]
+            packages[root] = packages.get(root, 0) + self_us
+    errors = [line[len('IMPORT_ERROR '):] for line in proc.stdout.splitlines() if line.startswith('IMPORT_ERROR ')]
+    return packages, total, errors
+
+
+def median_ms(modules, repeat):
+    totals = []
+    last = ({}, 0, [])
+    for _ in range(repeat):
+        last = measure(modules)
+        totals.append(last[1] / 1000.0)
+    return statistics.median(totals), last
+
+
+def main():
+    parser = argparse.ArgumentParser(description='앱 import 시간 비교')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10, help='eager import에서 오래 걸린 패키지 수')
+    args = parser.parse_args()
+
+    cold_ms, _ = median_ms(['app_main'], args.repeat)
+    eager_ms, (eager_packages, _, eager_errors) = median_ms(['app_main'] + PAGE_MODULES, args.repeat)
+
+    print(f'cold start (app_main)          : {cold_ms:8.1f} ms')
+    print(f'eager (app_main + 모든 페이지)  : {eager_ms:8.1f} ms')
+    if eager_ms > 0:
+        print(f'시작 시 줄어든 시간            : {eager_ms - cold_ms:8.1f} ms ({(1 - cold_ms / eager_ms) * 100:.0f}%)')
+    for err in eager_errors:
+        print(f'  (import 오류: {err})')
+
+    print('\n페이지로 처음 이동할 때 추가되는 시간')
+    for module in PAGE_MODULES:
+        page_ms, (_, _, errors) = median_ms(['app_main', module], args.repeat)
+        note = f'  (import 오류: {errors[0]})' if errors else ''
+        print(f'  {module:20s} {page_ms - cold_ms:8.1f} ms{note}')
+
+    print(f'\neager import에서 오래 걸린 패키지 {args.top}개 (self time 합)')
+    for name, us in sorted(eager_packages.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f'  {name:30s} {us / 1000.0:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
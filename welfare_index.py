@@ -0,0 +1,260 @@
+import os
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+import api_gateway
+
+
+# 지자체 복지서비스 목록(LocalGovernmentWelfareInformations/LcgvWelfarelist)을 로컬 SQLite FTS5에
+# 모아두고 게시판 검색을 로컬에서 처리합니다.
+# - sync(): 목록 전체를 페이지 단위로 받아 변경된 항목만 갱신하고, 목록에서 사라진 항목은 지웁니다.
+#   SYNC_INTERVAL_S 안에는 다시 동기화하지 않으므로 네트워크는 주기적인 동기화에만 사용됩니다.
+#   last_sync_at은 목록을 끝까지 받은 뒤에만 기록하고(is_ready), 중간에 실패하면 시도 시각과 연속 실패 횟수를
+#   기록해 SYNC_RETRY_BASE_S부터 두 배씩 늘어나는 간격이 지나기 전에는 다시 시도하지 않습니다(일일 한도 보호).
+# - search(): 지역(ctpvNm), 지원 대상, 자유 검색어로 로컬 검색합니다.
+#   FTS5 trigram 토크나이저를 사용하므로 한국어 부분 문자열도 찾을 수 있고,
+#   trigram이 적용되지 않는 2글자 이하 검색어는 LIKE로 처리합니다.
+
+BASE_URL = "https://apis.data.go.kr/B554287/LocalGovernmentWelfareInformations/LcgvWelfarelist"
+WELFARE_DB_PATH = os.path.join('cache', 'welfare_services.sqlite3')
+SYNC_PAGE_SIZE = 500
+SYNC_INTERVAL_S = 12 * 3600
+MAX_SYNC_PAGES = 100
+SYNC_RETRY_BASE_S = 10 * 60
+
+FIELDS = [
+    'servId', 'servNm', 'servDgst', 'servDtlLink', 'bizChrDeptNm', 'ctpvNm', 'sggNm',
+    'lifeNmArray', 'trgterIndvdlNmArray', 'intrsThemaNmArray', 'lastModYmd',
+]
+
+
+class WelfareIndex:
+    def __init__(self, db_path=WELFARE_DB_PATH):
+        self.db_path = db_path
+        parent = os.path.dirname(db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._sync_thread = None
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS services ('
+                + ', '.join(f'{f} TEXT' + (' PRIMARY KEY' if f == 'servId' else '') for f in FIELDS)
+                + ', synced_at REAL)'
+            )
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS services_fts USING fts5("
+                "servId UNINDEXED, servNm, servDgst, bizChrDeptNm, targets, tokenize='trigram')"
+            )
+            self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self._conn.commit()
+
+    # ------------------------------------------------------------------ 동기화
+    def _get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+            self._conn.commit()
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM services').fetchone()[0]
+
+    def last_synced(self):
+        return float(self._get_meta('last_sync_at', 0) or 0)
+
+    def is_ready(self):
+        """목록 전체 동기화를 한 번 이상 끝까지 마쳤는지 (첫 동기화 중에는 False)."""
+        return self.last_synced() > 0
+
+    def retry_at(self):
+        """실패한 동기화를 다시 시도할 수 있는 시각 (실패 기록이 없으면 0)."""
+        failures = int(self._get_meta('sync_failures', 0) or 0)
+        if failures <= 0:
+            return 0.0
+        last_attempt = float(self._get_meta('last_attempt_at', 0) or 0)
+        return last_attempt + min(SYNC_INTERVAL_S, SYNC_RETRY_BASE_S * (2 ** (failures - 1)))
+
+    def sync_due(self):
+        now = time.time()
+        return now - self.last_synced() >= SYNC_INTERVAL_S and now >= self.retry_at()
+
+    def _fetch_page(self, service_key, page_no):
+        params = {'serviceKey': service_key, 'pageNo': str(page_no), 'numOfRows': str(SYNC_PAGE_SIZE)}
+        response = api_gateway.request('welfare_news', BASE_URL, params=params, api_key=service_key, timeout=20)
+        if response.status_code != 200:
+            raise RuntimeError(f'status {response.status_code}')
+        root = ET.fromstring(response.content)
+        result_code = root.findtext('.//resultCode')
+        if result_code == '40':
+            return [], 0
+        if result_code != '0':
+            raise RuntimeError(f"resultCode {result_code}: {root.findtext('.//resultMessage')}")
+        total = int(root.findtext('.//totalCount') or 0)
+        items = [{f: (serv.findtext(f) or '').strip() for f in FIELDS} for serv in root.findall('.//servList')]
+        return items, total
+
+    def _upsert(self, items, now):
+        """변경된 항목만 services/services_fts에 반영하고 반영한 건수를 반환합니다."""
+        changed = 0
+        with self._lock:
+            for item in items:
+                if not item['servId']:
+                    continue
+                row = self._conn.execute(
+                    'SELECT lastModYmd, servNm, servDgst FROM services WHERE servId = ?', (item['servId'],)
+                ).fetchone()
+                if row is not None and tuple(row) == (item['lastModYmd'], item['servNm'], item['servDgst']):
+                    self._conn.execute('UPDATE services SET synced_at = ? WHERE servId = ?', (now, item['servId']))
+                    continue
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO services ({', '.join(FIELDS)}, synced_at) "
+                    f"VALUES ({', '.join('?' * len(FIELDS))}, ?)",
+                    [item[f] for f in FIELDS] + [now],
+                )
+                self._conn.execute('DELETE FROM services_fts WHERE servId = ?', (item['servId'],))
+                targets = ' '.join([item['trgterIndvdlNmArray'], item['lifeNmArray'], item['intrsThemaNmArray']])
+                self._conn.execute(
+                    'INSERT INTO services_fts (servId, servNm, servDgst, bizChrDeptNm, targets) VALUES (?, ?, ?, ?, ?)',
+                    (item['servId'], item['servNm'], item['servDgst'], item['bizChrDeptNm'], targets),
+                )
+                changed += 1
+            self._conn.commit()
+        return changed
+
+    def sync(self, service_key, force=False):
+        """목록 전체를 받아 로컬 인덱스를 갱신합니다. (변경 건수, 삭제 건수)를 반환합니다."""
+        if not force and not self.sync_due():
+            return 0, 0
+        started = time.time()
+        changed = 0
+        page_no = 1
+        total = None
+        complete = False
+        try:
+            while page_no <= MAX_SYNC_PAGES:
+                items, page_total = self._fetch_page(service_key, page_no)
+                total = page_total if total is None else total
+                if not items:
+                    break
+                changed += self._upsert(items, started)
+                # totalCount가 있고 받은 페이지가 그 수를 모두 덮었을 때만 끝까지 받은 것으로 봅니다.
+                # (첫 페이지가 비었거나, 중간 페이지가 비었거나, MAX_SYNC_PAGES에 걸린 경우는 일부만 받은 것)
+                if page_no * SYNC_PAGE_SIZE >= total:
+                    complete = total > 0
+                    break
+                page_no += 1
+        finally:
+            # 끝까지 받지 못했으면(예외 포함) 시도 시각과 연속 실패 횟수를 남겨 다음 시도를 늦춥니다.
+            self._set_meta('last_attempt_at', time.time())
+            failures = 0 if complete else int(self._get_meta('sync_failures', 0) or 0) + 1
+            self._set_meta('sync_failures', failures)
+
+        if not complete:
+            print(f'welfare_index sync: 일부만 받음 (page={page_no}, total={total}) - 삭제/완료 기록 없이 나중에 다시 시도')
+            return changed, 0
+
+        # 끝까지 받았을 때만 이번 동기화에서 보이지 않은 항목을 삭제하고 완료 시각을 기록합니다.
+        with self._lock:
+            stale = [r[0] for r in self._conn.execute(
+                'SELECT servId FROM services WHERE synced_at < ?', (started,)).fetchall()]
+            for sid in stale:
+                self._conn.execute('DELETE FROM services WHERE servId = ?', (sid,))
+                self._conn.execute('DELETE FROM services_fts WHERE servId = ?', (sid,))
+            self._conn.commit()
+        self._set_meta('last_sync_at', time.time())
+        self._set_meta('total_count', total)
+        return changed, len(stale)
+
+    def sync_in_background(self, service_key):
+        """동기화가 필요하고 진행 중이 아니면 백그라운드 스레드로 시작합니다."""
+        if not self.sync_due():
+            return
+        with self._lock:
+            if self._sync_thread is not None and self._sync_thread.is_alive():
+                return
+
+            def _run():
+                try:
+                    changed, removed = self.sync(service_key)
+                    print(f'welfare_index sync: changed={changed} removed={removed}')
+                except Exception as e:
+                    print(f'welfare_index sync error: {e}')
+
+            self._sync_thread = threading.Thread(target=_run, name='welfare-sync', daemon=True)
+            self._sync_thread.start()
+
+    # ------------------------------------------------------------------ 검색
+    def search(self, ctpv='', targets=None, free_text='', rows=10, page=1):
+        """로컬 인덱스를 검색해 app_news 게시판 형식의 리스트를 반환합니다.
+
+        - ctpv: 시/도 이름 접두어(예: '인천')
+        - targets: 지원 대상 목록(예: ['노인', '임산부']) - 하나라도 포함되면 일치
+        - free_text: 자유 검색어 - 공백으로 나눈 모든 단어가 포함되어야 일치
+        """
+        where = []
+        args = []
+        if ctpv and ctpv.strip():
+            where.append('s.ctpvNm LIKE ?')
+            args.append(ctpv.strip() + '%')
+
+        def _term_clause(term):
+            # trigram FTS는 3글자 이상에서만 동작하므로 짧은 검색어는 LIKE로 찾습니다.
+            if len(term) >= 3:
+                return ('s.servId IN (SELECT servId FROM services_fts WHERE services_fts MATCH ?)',
+                        ['"' + term.replace('"', '""') + '"'])
+            like = '%' + term + '%'
+            # FTS 색인과 같은 컬럼(servNm, servDgst, bizChrDeptNm, targets)을 찾습니다.
+            columns = ['servNm', 'servDgst', 'bizChrDeptNm', 'trgterIndvdlNmArray', 'lifeNmArray', 'intrsThemaNmArray']
+            return ('(' + ' OR '.join(f's.{c} LIKE ?' for c in columns) + ')', [like] * len(columns))
+
+        target_terms = [t.strip() for t in (targets or []) if t and t.strip()]
+        if target_terms:
+            clauses = [_term_clause(t) for t in target_terms]
+            where.append('(' + ' OR '.join(c for c, _ in clauses) + ')')
+            for _, a in clauses:
+                args.extend(a)
+        for term in (free_text or '').split():
+            clause, a = _term_clause(term)
+            where.append(clause)
+            args.extend(a)
+
+        sql = 'SELECT servNm, servDgst, servDtlLink, bizChrDeptNm, ctpvNm, lastModYmd FROM services s'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY s.lastModYmd DESC, s.servId LIMIT ? OFFSET ?'
+        args.extend([int(rows), (max(1, int(page)) - 1) * int(rows)])
+        with self._lock:
+            result = self._conn.execute(sql, args).fetchall()
+        keys = ['servNm', 'servDgst', 'servDtlLink', 'bizChrDeptNm', 'ctpvNm', 'lastModYmd']
+        return [dict(zip(keys, r)) for r in result]
+
+
+_WELFARE_INDEX = None
+_WELFARE_INDEX_LOCK = threading.Lock()
+
+
+def get_welfare_index():
+    global _WELFARE_INDEX
+    with _WELFARE_INDEX_LOCK:
+        if _WELFARE_INDEX is None:
+            _WELFARE_INDEX = WelfareIndex()
+        return _WELFARE_INDEX
+
+
+if __name__ == '__main__':
+    # 사용 예: NEWS_API_KEY=... python welfare_index.py
+    key = os.environ.get('NEWS_API_KEY')
+    if not key:
+        raise SystemExit('NEWS_API_KEY 환경변수를 설정하세요.')
+    index = WelfareIndex()
+    changed, removed = index.sync(key, force=True)
+    print(f'동기화 완료: 변경 {changed}건, 삭제 {removed}건, 전체 {index.count()}건')